@@ -0,0 +1,244 @@
+"""Latency and throughput of the hot endpoints, driven in-process through ASGI.
+
+    python benchmarks/bench_endpoints.py [--targets sqlite,postgres] [--concurrency 32]
+        [--requests 2000] [--scenarios run,position,ingest,create-player,admin,players]
+        [--output bench_output.json]
+
+Each target runs in a fresh process with the whole app, lifespan included,
+behind httpx's ASGITransport, so the numbers leave out the network and the
+ASGI server but keep everything the app itself does. SQLite uses a throwaway
+file; postgres uses ARSE_BENCH_POSTGRES_URL (a local server by default).
+Every table in the target database is dropped and recreated.
+
+The ingest scenario sends INGEST_BATCH position updates per request; its
+updates_per_sec is the number to compare with the one-update position scenario.
+
+The results are written as JSON, keyed by target and scenario, so two runs
+can be compared with `diff` or `jq`.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+POSTGRES_URL = os.getenv("ARSE_BENCH_POSTGRES_URL", "postgresql+asyncpg://postgres@localhost:5432/arse_bench")
+
+SCENARIOS = ["run", "position", "ingest", "create-player", "admin", "players"]
+
+# Updates per request in the ingest scenario
+INGEST_BATCH = 64
+
+# Most players one bulk request may create (see BULK_PLAYERS_LIMIT in arse.api)
+BULK_CHUNK = 1000
+
+
+def percentile(ordered: list, p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(int(round(p / 100 * len(ordered))) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def summarize(latencies: list, errors: int, elapsed: float) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "seconds": round(elapsed, 4),
+        "rps": round(len(ordered) / elapsed, 1),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        **{f"p{p}_ms": round(percentile(ordered, p) * 1000, 3) for p in (50, 95, 99)},
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+async def drive(client, requests: list, concurrency: int) -> dict:
+    """Send `requests` ((method, url, kwargs) tuples) with `concurrency` in flight at once."""
+    pending = iter(requests)
+    latencies = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for method, url, kwargs in pending:
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+async def add_players(client, game_id: str, count: int):
+    await client.post(f"/game/{game_id}/max-players", data={"max_players": count})
+    for offset in range(0, count, BULK_CHUNK):
+        response = await client.post(
+            f"/game/{game_id}/players/bulk", json={"count": min(BULK_CHUNK, count - offset)}
+        )
+        response.raise_for_status()
+
+
+async def scenario_run(client, requests: int) -> list:
+    # Round-robin over enough players that nobody reaches the winning step
+    players = requests // 2 + 1
+    await add_players(client, "bench-run", players)
+    return [("POST", f"/game/bench-run/player/{i % players + 1}/run", {}) for i in range(requests)]
+
+
+def position(i: int) -> tuple:
+    return 52.52 + (i % 997) * 1e-5, 13.405 + (i % 991) * 1e-5
+
+
+async def scenario_position(client, requests: int) -> list:
+    await add_players(client, "bench-position", 1000)
+    return [
+        ("POST", f"/game/bench-position/player/{i % 1000 + 1}/position", {"json": dict(zip(("lat", "lon"), position(i)))})
+        for i in range(requests)
+    ]
+
+
+async def scenario_ingest(client, requests: int) -> list:
+    from arse.ingest import POSITION, encode_batch
+    await add_players(client, "bench-ingest", 1000)
+    batches = []
+    for i in range(requests):
+        updates = range(i * INGEST_BATCH, (i + 1) * INGEST_BATCH)
+        body = encode_batch((POSITION, n % 1000 + 1, *position(n)) for n in updates)
+        batches.append(("POST", "/game/bench-ingest/ingest", {"content": body}))
+    return batches
+
+
+async def scenario_create_player(client, requests: int) -> list:
+    await client.post("/game/bench-create/max-players", data={"max_players": requests})
+    return [("POST", "/game/bench-create/create-player", {})] * requests
+
+
+async def scenario_admin(client, requests: int) -> list:
+    await add_players(client, "bench-admin", 50)
+    return [("GET", "/game/bench-admin/admin", {})] * requests
+
+
+async def scenario_players(client, requests: int) -> list:
+    await add_players(client, "bench-players", 5000)
+    return [("GET", "/players/", {"params": {"game_id": "bench-players", "limit": 100}})] * requests
+
+
+SETUP = {
+    "run": scenario_run,
+    "position": scenario_position,
+    "ingest": scenario_ingest,
+    "create-player": scenario_create_player,
+    "admin": scenario_admin,
+    "players": scenario_players,
+}
+
+
+async def child(args) -> dict:
+    """Benchmark every scenario against the database in DATABASE_URL."""
+    import httpx
+    from arse import db
+    from arse.api import app
+
+    await db.reset_game()
+    results = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name in args.scenarios:
+                requests = await SETUP[name](client, args.concurrency + args.requests)
+                # A short warm-up so the first connections and templates are not measured
+                await drive(client, requests[:args.concurrency], args.concurrency)
+                results[name] = await drive(client, requests[args.concurrency:], args.concurrency)
+                updates = INGEST_BATCH if name == "ingest" else 1
+                results[name]["updates_per_sec"] = round(results[name]["rps"] * updates, 1)
+    await db.async_engine.dispose()
+    return results
+
+
+def run_target(target: str, args, scratch: Path) -> dict:
+    url = POSTGRES_URL if target == "postgres" else f"sqlite+aiosqlite:///{scratch}/{target}.db"
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(ROOT / "src"),
+        "TEMPLATES_DIR": str(ROOT / "templates"),
+        "JINJA_CACHE_DIR": str(scratch / "jinja"),
+        "DATABASE_URL": url,
+        "ARSE_SNAPSHOT_INTERVAL": "3600",
+    }
+    command = [
+        sys.executable, __file__, "--child",
+        "--concurrency", str(args.concurrency),
+        "--requests", str(args.requests),
+        "--scenarios", ",".join(args.scenarios),
+    ]
+    output = subprocess.run(command, env=env, cwd=ROOT, capture_output=True, text=True)
+    if output.returncode != 0:
+        print(f"{target}: failed\n{output.stderr.strip().splitlines()[-1] if output.stderr else ''}", file=sys.stderr)
+        return {}
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main(args):
+    if args.child:
+        import logging
+        logging.disable(logging.CRITICAL)
+        print(json.dumps(asyncio.run(child(args))))
+        return
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        sys.exit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    scratch = Path(tempfile.mkdtemp(prefix="arse_bench_"))
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "targets": {},
+    }
+    for target in args.targets:
+        results = report["targets"][target] = run_target(target, args, scratch)
+        for name, stats in results.items():
+            print(
+                f"{target:8} {name:14} {stats['rps']:9.1f} req/s {stats['updates_per_sec']:10.1f} updates/s"
+                f"  p50 {stats['p50_ms']:7.2f} ms  p95 {stats['p95_ms']:7.2f} ms  p99 {stats['p99_ms']:7.2f} ms"
+                f"  errors {stats['errors']}"
+            )
+
+    Path(args.output).write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+    print(f"wrote {args.output}")
+
+
+def names(value: str) -> list:
+    return [name for name in value.split(",") if name]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--targets", type=names, default=["sqlite", "postgres"])
+    parser.add_argument("--scenarios", type=names, default=SCENARIOS)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000, help="per scenario, after the warm-up")
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    main(parser.parse_args())
@@ -0,0 +1,94 @@
+"""Memory per player and whole-game query time: one dict per player versus the PlayerTable columns.
+
+    python benchmarks/bench_players.py [--players 10000]
+
+Memory is measured with tracemalloc around building each representation.
+Zone counts run on the PlayerTable with NumPy if it is installed, and with
+the plain Python fallback either way. The table keeps its leaderboard up to
+date on every change of steps, so the last lines time a tap together with
+that upkeep and the leaderboard queries against sorting every player.
+"""
+import argparse
+import heapq
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from arse import players as players_module  # noqa: E402
+from arse.geofence import Zone  # noqa: E402
+from arse.players import PlayerTable  # noqa: E402
+
+
+def measure(build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def build_dicts(rows):
+    return {
+        player_id: {"id": player_id, "steps": steps, "lat": lat, "lon": lon}
+        for player_id, steps, lat, lon in rows
+    }
+
+
+def build_table(rows):
+    table = PlayerTable()
+    for player_id, steps, lat, lon in rows:
+        table.upsert({"id": player_id, "steps": steps, "lat": lat, "lon": lon})
+    return table
+
+
+def timed(function, repeat: int = 20) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main(args):
+    rng = random.Random(1)
+    rows = [
+        (player_id, rng.randrange(100), 52.52 + rng.uniform(-0.01, 0.01), 13.405 + rng.uniform(-0.01, 0.01))
+        for player_id in range(1, args.players + 1)
+    ]
+
+    dicts, dict_bytes = measure(lambda: build_dicts(rows))
+    table, table_bytes = measure(lambda: build_table(rows))
+    print(f"dict per player: {dict_bytes / args.players:7.1f} bytes/player")
+    print(f"PlayerTable:     {table_bytes / args.players:7.1f} bytes/player ({table.nbytes() / args.players:.0f} in columns)")
+
+    zones = [
+        Zone({"id": f"z{i}", "kind": "circle", "lat": 52.52 + i * 0.002, "lon": 13.405, "radius": 150})
+        for i in range(-4, 5)
+    ]
+    backends = [("python", None)]
+    if players_module.np is not None:
+        backends.insert(0, ("numpy", players_module.np))
+    for name, np in backends:
+        players_module.np = np
+        print(f"count_by_zone ({len(zones)} zones, {name}): {timed(lambda: table.count_by_zone(zones)):7.2f} ms")
+
+    def tap():
+        for player_id in range(1, args.players + 1, 97):
+            table[player_id]["steps"] += 1
+
+    taps = len(range(1, args.players + 1, 97))
+    print(f"tap on table, with leaderboard: {timed(tap) / taps * 1000:7.2f} us")
+    print(f"leaders(10) over dicts, sorted: {timed(lambda: heapq.nlargest(10, dicts.values(), key=lambda p: p['steps'])):7.2f} ms")
+    print(f"leaders(10) on table:           {timed(lambda: table.leaders(10)):7.2f} ms")
+    print(f"rank of one player over dicts:  {timed(lambda: 1 + sum(p['steps'] > 50 for p in dicts.values())):7.2f} ms")
+    print(f"rank of one player on table:    {timed(lambda: table.rank(args.players // 2)):7.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=10_000)
+    main(parser.parse_args())
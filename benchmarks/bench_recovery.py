@@ -0,0 +1,72 @@
+"""Restart time with a large event log, with and without a recent snapshot.
+
+    python benchmarks/bench_recovery.py [--events 100000] [--games 1000] [--tail 1000]
+
+Uses a throwaway SQLite file unless DATABASE_URL is set; every table in that
+database is dropped and recreated.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tempfile.mkdtemp(prefix='arse_bench_')}/bench.db"
+
+from arse import db  # noqa: E402
+from arse.eventlog import EventLog  # noqa: E402
+from arse.game import GameRegistry  # noqa: E402
+from arse.recovery import Snapshotter, recover  # noqa: E402
+
+
+async def generate(games: GameRegistry, log: EventLog, events: int, game_count: int):
+    """Play games round-robin until `events` events have been logged."""
+    target = log.written + log.pending + events
+    turn = 0
+    while log.written + log.pending < target:
+        game = games.get_or_create(f"game-{turn % game_count}")
+        if game.game_over:
+            game.reset()
+        while len(game.players) < 2:
+            game.add_player()
+        game.run(game.get_player(turn // game_count % 2 + 1))
+        turn += 1
+        if log.pending >= log.batch_size:
+            await log.flush()
+    await log.flush()
+
+
+async def timed_recover() -> tuple:
+    start = time.perf_counter()
+    replayed = await recover(GameRegistry())
+    return time.perf_counter() - start, replayed
+
+
+async def main(args):
+    await db.reset_game()
+    log = EventLog(batch_size=5000)
+    games = GameRegistry(on_event=log.append)
+
+    await generate(games, log, args.events, args.games)
+    full, replayed = await timed_recover()
+    print(f"no snapshot:   {full * 1000:8.1f} ms to replay {replayed} events")
+
+    # A snapshot followed by one interval's worth of new events
+    await Snapshotter(games, log).snapshot()
+    await generate(games, log, args.tail, args.games)
+    recent, replayed = await timed_recover()
+    print(f"with snapshot: {recent * 1000:8.1f} ms to restore {len(games)} games and replay {replayed} events")
+
+    await db.async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--tail", type=int, default=1000, help="events logged after the snapshot")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,96 @@
+"""Cost of settling a tap under compiled rules, against the old hard-coded check.
+
+    python benchmarks/bench_rules.py [--taps 1000000]
+
+"hard-coded" is the check Game.run made before rules existed
+(`steps += 1; steps >= WINNING_STEPS`). "interpreted" walks the rules
+spec and parses its conditions on every tap, which is what compiling them
+up front avoids. The last two lines time the whole Game.run, including
+publishing the event, with the old and the compiled check.
+"""
+import argparse
+import operator
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from arse.game import Game, MOVED, WON  # noqa: E402
+from arse.rules import CONDITION, DEFAULT_RULES, WIN, WINNING_STEPS, Rules  # noqa: E402
+
+OPERATORS = {">=": operator.ge, "<=": operator.le, ">": operator.gt, "<": operator.lt, "==": operator.eq, "!=": operator.ne}
+
+
+def hard_coded(taps: int):
+    for steps in range(taps):
+        steps += 1
+        steps >= WINNING_STEPS
+
+
+def compiled(taps: int):
+    rules = Rules(DEFAULT_RULES)
+    action, settle = rules.actions["run"], rules.settle
+    for steps in range(taps):
+        settle(steps + action.steps)
+
+
+def interpreted(taps: int):
+    spec = DEFAULT_RULES
+    for steps in range(taps):
+        steps += spec["actions"]["run"]["steps"]
+        for kind in ("win", "lose"):
+            for condition in spec.get(kind, []):
+                _, op, value = CONDITION.match(condition["when"]).groups()
+                if OPERATORS[op](steps, int(value)):
+                    break
+
+
+class HardCodedGame(Game):
+    """Game.run as it was before rules."""
+
+    def run(self, player):
+        player["steps"] += 1
+        won = self.wins_by_steps and player["steps"] >= WINNING_STEPS and self.claim_winner(player["id"])
+        self.bump()
+        self.publish("run", {"player": player.to_dict()})
+        if won:
+            self.publish("win", {"winner": self.winner})
+            return WON
+        return MOVED
+
+
+def play(game_class, taps: int) -> float:
+    game = game_class("bench")
+    # Out of reach of the win, so every tap takes the same path
+    player = game.add_player()
+    player["steps"] = -taps - 10
+    start = time.perf_counter()
+    for _ in range(taps):
+        game.run(player)
+    return time.perf_counter() - start
+
+
+def timed(function, taps: int) -> float:
+    start = time.perf_counter()
+    function(taps)
+    return time.perf_counter() - start
+
+
+def main(args):
+    baseline = timed(lambda taps: [None for _ in range(taps)], args.taps)
+    for name, function in (("hard-coded", hard_coded), ("compiled", compiled), ("interpreted", interpreted)):
+        elapsed = timed(function, args.taps) - baseline
+        print(f"{name:12} {elapsed / args.taps * 1e9:8.1f} ns/tap")
+    assert Rules(DEFAULT_RULES).settle(WINNING_STEPS) == WIN
+
+    taps = args.taps // 10
+    for name, game_class in (("hard-coded", HardCodedGame), ("compiled", Game)):
+        elapsed = play(game_class, taps)
+        print(f"Game.run, {name:11} {elapsed / taps * 1e6:6.2f} us/tap")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--taps", type=int, default=1_000_000)
+    main(parser.parse_args())
@@ -0,0 +1,65 @@
+"""Time from a fresh interpreter to the app accepting requests.
+
+    python benchmarks/bench_startup.py [--runs 5]
+
+Each run starts a new Python process, imports the app and runs its lifespan
+startup against a throwaway SQLite file (or DATABASE_URL if set). The first
+run starts with an empty Jinja bytecode cache; later runs reuse it.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+CHILD = """
+import asyncio, json, logging, time
+start = time.perf_counter()
+from arse.api import app
+imported = time.perf_counter()
+
+async def main():
+    async with app.router.lifespan_context(app):
+        ready = time.perf_counter()
+    return ready
+
+logging.disable(logging.CRITICAL)
+ready = asyncio.run(main())
+print(json.dumps({"import": imported - start, "ready": ready - start}))
+"""
+
+
+def run_once(env: dict) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD], env=env, cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(args):
+    scratch = Path(tempfile.mkdtemp(prefix="arse_bench_"))
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(ROOT / "src"),
+        "TEMPLATES_DIR": str(ROOT / "templates"),
+        "JINJA_CACHE_DIR": str(scratch / "jinja"),
+        "DATABASE_URL": os.environ.get("DATABASE_URL", f"sqlite+aiosqlite:///{scratch}/bench.db"),
+    }
+
+    runs = [run_once(env) for _ in range(args.runs)]
+    for i, run in enumerate(runs):
+        label = "cold cache" if i == 0 else "warm cache"
+        print(f"run {i + 1} ({label}): import {run['import'] * 1000:6.1f} ms, ready {run['ready'] * 1000:6.1f} ms")
+    if len(runs) > 1:
+        print(f"median warm ready: {statistics.median(run['ready'] for run in runs[1:]) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    main(parser.parse_args())
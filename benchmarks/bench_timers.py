@@ -0,0 +1,79 @@
+"""Scheduling, cancelling and firing many timers: the timer wheel against asyncio's call_later heap.
+
+    python benchmarks/bench_timers.py [--timers 1000000]
+
+Delays are spread between one second and a day. Half of the timers are
+cancelled before they fire, like cooldowns and idle timeouts that get
+reset. The wheel runs on a simulated clock, so firing measures the wheel
+itself, not waiting.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from arse.timers import TimerWheel  # noqa: E402
+
+
+def per_op(elapsed: float, count: int) -> str:
+    return f"{elapsed / count * 1e9:7.0f} ns/timer"
+
+
+def bench_wheel(delays):
+    now = [0.0]
+    wheel = TimerWheel(tick=0.01, clock=lambda: now[0])
+    fired = 0
+
+    def callback():
+        nonlocal fired
+        fired += 1
+
+    start = time.perf_counter()
+    timers = [wheel.schedule(delay, callback) for delay in delays]
+    scheduled = time.perf_counter()
+    for timer in timers[::2]:
+        timer.cancel()
+    cancelled = time.perf_counter()
+    # Advance in ten-second steps over the whole day
+    for second in range(10, 86_411, 10):
+        now[0] = float(second)
+        wheel.advance()
+    done = time.perf_counter()
+    assert fired == len(delays) - len(timers[::2])
+    return scheduled - start, cancelled - scheduled, done - cancelled
+
+
+async def bench_call_later(delays):
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    handles = [loop.call_later(delay, int) for delay in delays]
+    scheduled = time.perf_counter()
+    for handle in handles[::2]:
+        handle.cancel()
+    cancelled = time.perf_counter()
+    # Cancelled handles stay in the heap until asyncio sweeps them; drop the rest unfired
+    for handle in handles[1::2]:
+        handle.cancel()
+    return scheduled - start, cancelled - scheduled
+
+
+def main(args):
+    rng = random.Random(1)
+    delays = [rng.uniform(1, 86_400) for _ in range(args.timers)]
+    cancels = len(delays[::2])
+
+    schedule, cancel, fire = bench_wheel(delays)
+    print(f"wheel       schedule {per_op(schedule, len(delays))}  cancel {per_op(cancel, cancels)}  "
+          f"fire {per_op(fire, len(delays) - cancels)}")
+    schedule, cancel = asyncio.run(bench_call_later(delays))
+    print(f"call_later  schedule {per_op(schedule, len(delays))}  cancel {per_op(cancel, cancels)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--timers", type=int, default=1_000_000)
+    main(parser.parse_args())
@@ -30,6 +30,7 @@
         mkdir -p $out/static
         cp ${inputs.htmx} $out/static/htmx.min.js
         cp ${inputs.simple-css} $out/static/simple.min.css
+        cp ${./../src/arse/templates/static/player.js} $out/static/player.js
       '';
 
       # Create templates directory
@@ -47,6 +48,13 @@
         program = toString (pkgs.writeShellScript "serve" ''
           export STATIC_FILES_PATH=${config.static-files}/static
           export TEMPLATES_DIR=${config.templates}
+          
+          # Several workers must share game state through PostgreSQL
+          WORKERS="''${WEB_WORKERS:-1}"
+          if [ "$WORKERS" -gt 1 ]; then
+            export ARSE_STATE_STORE="''${ARSE_STATE_STORE:-postgres}"
+            exec ${config.pythonEnv}/bin/uvicorn src.arse:app --host 127.0.0.1 --port 8000 --workers "$WORKERS"
+          fi
           ${config.pythonEnv}/bin/uvicorn src.arse:app --host 127.0.0.1 --port 8000 --reload
         '');
       };
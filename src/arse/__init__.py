@@ -1,5 +1,6 @@
 from .api import app
 from .db import get_db, reset_game
-from .models import Player
+from .game import Game, GameRegistry
+from .models import GameEvent, Player
 
-__all__ = ["app", "get_db", "reset_game", "Player"]
+__all__ = ["app", "get_db", "reset_game", "Game", "GameRegistry", "GameEvent", "Player"]
@@ -1,20 +1,38 @@
-from fastapi import FastAPI, Depends, HTTPException, Request, Form
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, Depends, Header, HTTPException, Request, Response, Form, Query
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, RedirectResponse
-from sqlalchemy import select
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from fastapi.responses import HTMLResponse, PlainTextResponse, RedirectResponse, StreamingResponse
+from sqlalchemy import func, insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from pathlib import Path
 from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, List, Optional
 
+from .assets import StaticAssets
+from .broadcast import HEARTBEAT, encode_event, stream
+from .cache import RenderCache, etag_matches, make_etag
+from . import db as database
 from .db import get_db, create_db_and_tables, reset_game, DATABASE_URL
-from .models import Player, PlayerRead
+from .eventlog import EventLog
+from .game import Game, GameRegistry, COOLDOWN, DEFAULT_GAME_ID, GAME_OVER, LOST, WON
+from . import metrics
+from .profiler import ProfilerMiddleware, profiler
+from .geofence import Zone
+from . import ingest
+from .models import BulkPlayersCreate, LeaderboardEntry, NearbyPlayer, Player, PlayerLink, PlayerRead, PositionUpdate, Standings, ZoneSpec
+from .scenes import SceneAssets
+from .recovery import Snapshotter, recover
+from .store import create_store
+from .timers import wheel
 
 import os
+import json
 import logging
 import pathlib
 import tempfile
 import asyncio
+import secrets
+import time
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -27,22 +45,40 @@ async def lifespan(app: FastAPI):
     logger.info("Starting up application")
     
     try:
+        if TEMPLATE_WARMUP:
+            logger.info(f"Compiled {warm_templates()} templates")
+        logger.info(f"Loaded {assets.load()} static assets from {static_dir}")
+        
         # Wait for database to be available
         for i in range(5):
             try:
                 await create_db_and_tables()
-                logger.info("Database tables created")
+                logger.info("Database tables ready")
                 break
             except Exception as e:
                 if i < 4:  # Try 5 times
                     logger.warning(f"Database connection attempt {i+1} failed: {e}")
-                    await asyncio.sleep(2)  # Wait before retrying
+                    await asyncio.sleep(0.25 * 2 ** i)  # Back off before retrying
                 else:
                     raise
         
-        await create_db_and_tables()
-        logger.info("Database tables created")
-        yield
+        # Pick up where the previous process left off; shared state needs no recovery
+        if store.local:
+            await recover(games)
+            snapshotter.start()
+        await store.start()
+        event_log.start()
+        wheel.start()
+        try:
+            yield
+        finally:
+            await wheel.close()
+            # Make sure no buffered game event is lost on shutdown
+            await store.close()
+            if store.local:
+                await snapshotter.close()
+            await event_log.close()
+            profiler.stop()
     except Exception as e:
         logger.error(f"Database error: {e}")
         logger.error(f"Error during startup: {e}")
@@ -52,6 +88,8 @@ async def lifespan(app: FastAPI):
 
 # Create FastAPI app
 app = FastAPI(lifespan=lifespan)
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(ProfilerMiddleware)
 
 # Setup templates
 templates_dir = Path(os.getenv("TEMPLATES_DIR", "templates"))
@@ -62,148 +100,668 @@ if not templates_dir.exists():
 
 logger.info(f"Using templates directory: {templates_dir}")
 
+# Compiled templates are kept on disk so a restart skips the Jinja compiler. Without
+# JINJA_CACHE_DIR, Jinja uses its own per-user directory, which it checks it owns.
+def open_bytecode_cache(directory: Optional[str]) -> FileSystemBytecodeCache:
+    if directory is None:
+        return FileSystemBytecodeCache()
+    path = Path(directory)
+    path.mkdir(mode=0o700, parents=True, exist_ok=True)
+    # Never load bytecode another user could have written
+    info = path.stat()
+    if info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise RuntimeError(f"{path} must be owned by this user and not accessible to others")
+    return FileSystemBytecodeCache(str(path))
+
+try:
+    bytecode_cache = open_bytecode_cache(os.getenv("JINJA_CACHE_DIR"))
+except (OSError, RuntimeError) as e:
+    logger.warning(f"Not caching compiled templates: {e}")
+    bytecode_cache = None
+
 # Setup Jinja2 templates
-templates = Jinja2Templates(directory=str(templates_dir))
+templates = Jinja2Templates(env=Environment(
+    loader=FileSystemLoader(str(templates_dir)),
+    autoescape=True,
+    bytecode_cache=bytecode_cache,
+))
+
+# Compile every template during startup instead of on its first request
+TEMPLATE_WARMUP = os.getenv("TEMPLATE_WARMUP", "true").lower() == "true"
+
+def render_template(name: str, context: dict) -> str:
+    start = time.perf_counter()
+    html = templates.get_template(name).render(context)
+    metrics.render_seconds.observe(time.perf_counter() - start, name)
+    return html
 
-# Mount static files
-static_dir = templates_dir / "static"
+def warm_templates() -> int:
+    names = [name for name in templates.env.list_templates() if name.endswith(".html")]
+    for name in names:
+        templates.get_template(name)
+    return len(names)
+
+# Serve static files from memory, precompressed and under content-hashed URLs
+static_dir = Path(os.getenv("STATIC_FILES_PATH", str(templates_dir / "static")))
 try:
     if not static_dir.exists():
         static_dir.mkdir(parents=True, exist_ok=True)
-    app.mount("/static", StaticFiles(directory=str(static_dir)), name="static")
 except (PermissionError, OSError) as e:
     logger.warning(f"Could not create static directory: {e}")
     # Create a temporary directory for static files
-    temp_static = Path(tempfile.mkdtemp(prefix="arse_static_"))
-    logger.info(f"Using temporary static directory: {temp_static}")
-    static_dir = temp_static
-    static_dir.mkdir(exist_ok=True)
-    app.mount("/static", StaticFiles(directory=str(temp_static)), name="static")
-
-# Game state
-game_state = {
-    "players": [],
-    "winner": None,
-    "game_over": False
-}
+    static_dir = Path(tempfile.mkdtemp(prefix="arse_static_"))
+    logger.info(f"Using temporary static directory: {static_dir}")
+assets = StaticAssets(static_dir)
+templates.env.globals["static_url"] = lambda name: assets.url(name)
+
+@app.api_route("/static/{path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def static_file(request: Request, path: str):
+    return assets.response(request, path)
+
+# Durable history of every game action, written in batches
+event_log = EventLog()
+
+def record_event(game_id: str, kind: str, data: dict):
+    metrics.game_events.inc(game_id, kind)
+    event_log.append(game_id, kind, data)
+
+# Game state, one entry per running game
+games = GameRegistry(on_event=record_event)
+
+# Where the authoritative game state lives; shared between workers in postgres mode
+store = create_store(games)
+
+# Periodic snapshots bound how much of the event log a restart has to replay
+snapshotter = Snapshotter(games, event_log)
+
+# Rendered admin and player pages, reused until their game's version changes
+render_cache = RenderCache()
+
+def render_cached(name: str, game: Game, player_id: Optional[int], context: Callable[[], dict]) -> HTMLResponse:
+    """Serve a page from the render cache; `context` is only called to render on a miss."""
+    key = (name, game.id, player_id, game.epoch, game.version)
+    html = render_cache.get_or_render(key, lambda: render_template(name, context()))
+    return HTMLResponse(html, headers=cache_headers(game_etag(game)))
+
+def game_etag(game: Game) -> str:
+    return make_etag(game.epoch, game.version)
+
+def cache_headers(etag: str) -> dict:
+    # Clients may keep the page but must revalidate it on every use
+    return {"ETag": etag, "Cache-Control": "no-cache"}
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """A bodyless 304 if the client already holds `etag`, otherwise None."""
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+    return None
+
+async def existing_game(game_id: str) -> Game:
+    """The game for a read-only route; 404 instead of creating it."""
+    game = await store.find_game(game_id)
+    if game is None:
+        raise HTTPException(status_code=404, detail="Game not found")
+    return game
+
+def is_htmx(request: Request) -> bool:
+    return request.headers.get("HX-Request") == "true"
+
+def render_fragments(names: List[str], context: dict) -> HTMLResponse:
+    """Render partial templates back to back, without the page around them."""
+    return HTMLResponse("".join(render_template(name, context) for name in names))
 
 # Example route
 @app.get("/")
 async def root():
     return {"message": "Hello World"}
 
+# Players per page of /players/, and the most a client may ask for
+PLAYERS_PAGE_SIZE = 100
+PLAYERS_MAX_PAGE_SIZE = 1000
+
+# Players shown on the admin leaderboard, and the most a client may ask for
+LEADERBOARD_SIZE = int(os.getenv("ARSE_LEADERBOARD_SIZE", "10"))
+LEADERBOARD_MAX_SIZE = 1000
+
+# Rows fetched per round trip while exporting players
+PLAYERS_EXPORT_BATCH_SIZE = 1000
+
+# Plain columns only: rows skip the ORM identity map entirely
+PLAYER_COLUMNS = (Player.id, Player.game_id, Player.name, Player.email)
+
+async def stream_players(statement) -> AsyncIterator[str]:
+    """NDJSON lines for every row of `statement`, read in batches from a server-side cursor."""
+    async with database.async_engine.connect() as conn:
+        result = await conn.stream(statement.execution_options(yield_per=PLAYERS_EXPORT_BATCH_SIZE))
+        async for rows in result.partitions():
+            yield "".join(json.dumps(row._asdict()) + "\n" for row in rows)
+
 # Example route with database access
-@app.get("/players/")
-async def get_players(db: AsyncSession = Depends(get_db)):
-    statement = select(Player)
-    result = await db.execute(statement)
-    players = result.scalars().all()
+@app.get("/players/", response_model=List[PlayerRead])
+async def get_players(
+    request: Request,
+    response: Response,
+    game_id: Optional[str] = None,
+    after: Optional[int] = None,
+    limit: int = Query(PLAYERS_PAGE_SIZE, ge=1, le=PLAYERS_MAX_PAGE_SIZE),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    db: AsyncSession = Depends(get_db),
+):
+    # Through the store, so games created or changed on other workers are current here too
+    game = await store.find_game(game_id) if game_id is not None else None
+    if game is not None:
+        etag = game_etag(game)
+    elif store.local:
+        # The player table only changes through games in this registry
+        etag = make_etag("r", games.version)
+    else:
+        # Other workers add players too; ids are never reused, so the count and the highest id tell
+        count, last_id = (await db.execute(select(func.count(), func.max(Player.id)))).one()
+        etag = make_etag("p", count, last_id)
+    if (cached := not_modified(request, etag)) is not None:
+        return cached
+    
+    # Keyset pagination: continue after the last id the client saw
+    statement = select(*PLAYER_COLUMNS).order_by(Player.id)
+    if game_id is not None:
+        statement = statement.where(Player.game_id == game_id)
+    if after is not None:
+        statement = statement.where(Player.id > after)
+    
+    # Exports stream every remaining player without holding them in memory
+    if format == "ndjson":
+        return StreamingResponse(
+            stream_players(statement), media_type="application/x-ndjson", headers=cache_headers(etag)
+        )
+    
+    result = await db.execute(statement.limit(limit))
+    players = [PlayerRead(**row._mapping) for row in result]
+    response.headers.update(cache_headers(etag))
+    if len(players) == limit:
+        next_page = request.url.include_query_params(after=players[-1].id)
+        response.headers["Link"] = f'<{next_page}>; rel="next"'
     return players
 
+# Connection pool usage, to tell whether requests are waiting on the database
+@app.get("/admin/db-pool")
+async def db_pool_status():
+    return database.pool_stats.as_dict(database.async_engine.pool)
+
+def by_stat(stats: dict) -> dict:
+    return {(key,): value for key, value in stats.items()}
+
+# Read when /metrics is scraped, so keeping them current costs nothing
+metrics.registry.gauge("arse_active_games", "Games held by this worker", lambda: len(games))
+metrics.registry.gauge(
+    "arse_active_players",
+    "Players in the games held by this worker",
+    lambda: sum(len(game.players) for game in games),
+)
+metrics.registry.gauge(
+    "arse_render_cache", "Rendered page cache size and lookups", lambda: by_stat(render_cache.stats()), ["stat"]
+)
+metrics.registry.gauge(
+    "arse_db_pool",
+    "Database connection pool usage",
+    lambda: by_stat(database.pool_stats.as_dict(database.async_engine.pool)),
+    ["stat"],
+)
+metrics.registry.gauge("arse_event_log_pending", "Game events waiting to be written", lambda: event_log.pending)
+metrics.registry.gauge("arse_timers_pending", "Scheduled game timers", lambda: len(wheel))
+
+# Prometheus scrape endpoint
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+# Bearer token for the profiler endpoints; they do not exist while it is unset
+ADMIN_TOKEN = os.getenv("ARSE_ADMIN_TOKEN")
+
+def require_admin(authorization: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404)
+    if authorization is None or not secrets.compare_digest(authorization, f"Bearer {ADMIN_TOKEN}"):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+# Sample the running app for a while, e.g. while a live game slows down
+@app.post("/admin/profiler/start", dependencies=[Depends(require_admin)])
+async def start_profiler(
+    seconds: Optional[float] = Query(None, gt=0),
+    requests: Optional[int] = Query(None, ge=1),
+    interval_ms: float = Query(5, ge=1, le=1000),
+):
+    if profiler.running:
+        raise HTTPException(status_code=409, detail="The profiler is already running")
+    profiler.start(app.routes, seconds=seconds, requests=requests, interval_ms=interval_ms)
+    return profiler.status()
+
+@app.post("/admin/profiler/stop", dependencies=[Depends(require_admin)])
+async def stop_profiler():
+    profiler.stop()
+    return profiler.status()
+
+@app.get("/admin/profiler", dependencies=[Depends(require_admin)])
+async def profiler_status():
+    return profiler.status()
+
+# Collapsed stacks, one route per root frame; feed to flamegraph.pl or speedscope
+@app.get("/admin/profiler/profile.txt", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+async def download_profile(route: Optional[str] = None):
+    return PlainTextResponse(
+        profiler.collapsed(route),
+        headers={"Content-Disposition": 'attachment; filename="arse-profile.txt"'},
+    )
+
 # Admin page
 @app.get("/admin", response_class=HTMLResponse)
-async def admin_page(request: Request):
-    return templates.TemplateResponse(
-        request,
-        "admin.html", 
-        {"game_over": game_state["game_over"], "winner": game_state["winner"]}
+@app.get("/game/{game_id}/admin", response_class=HTMLResponse)
+async def admin_page(request: Request, game_id: str = DEFAULT_GAME_ID):
+    game = await store.find_game(game_id)
+    if game is None:
+        # Nothing to show yet; the game is created by its first player
+        return HTMLResponse(render_template("admin.html", {
+            "game_id": game_id,
+            "players": [],
+            "leaders": [],
+            "leaderboard_size": LEADERBOARD_SIZE,
+            "total": 0,
+            "game_over": False,
+            "winner": None
+        }))
+    if (cached := not_modified(request, game_etag(game))) is not None:
+        return cached
+    return render_cached(
+        "admin.html",
+        game,
+        None,
+        lambda: {
+            "game_id": game.id,
+            "players": list(game.players.values()),
+            "leaders": game.leaders(LEADERBOARD_SIZE),
+            "leaderboard_size": LEADERBOARD_SIZE,
+            "total": len(game.players),
+            "game_over": game.game_over,
+            "winner": game.winner
+        }
     )
 
+# Top players by steps; HTMX gets the admin page's leaderboard fragment instead of JSON
+@app.get("/game/{game_id}/leaderboard", response_model=Standings)
+async def get_leaderboard(
+    request: Request,
+    response: Response,
+    game_id: str,
+    k: int = Query(LEADERBOARD_SIZE, ge=1, le=LEADERBOARD_MAX_SIZE),
+):
+    game = await existing_game(game_id)
+    # JSON and the HTMX fragment share the URL, so each gets its own validator
+    htmx = is_htmx(request)
+    etag = make_etag(game.epoch, game.version, "html" if htmx else "json")
+    headers = {**cache_headers(etag), "Vary": "HX-Request"}
+    if (cached := not_modified(request, etag)) is not None:
+        cached.headers["Vary"] = "HX-Request"
+        return cached
+    leaders = game.leaders(k)
+    if htmx:
+        html = render_template(
+            "leaderboard.html", {"game_id": game.id, "leaders": leaders, "leaderboard_size": k, "total": len(game.players)}
+        )
+        return HTMLResponse(html, headers=headers)
+    response.headers.update(headers)
+    return {"players": leaders, "total": len(game.players)}
+
+@app.get("/game/{game_id}/leaderboard/{player_id}", response_model=LeaderboardEntry)
+async def player_rank(game_id: str, player_id: int):
+    game, player = await store.find_player(game_id, player_id)
+    if player is None:
+        raise HTTPException(status_code=404, detail="Player not found")
+    return {"id": player_id, "steps": player["steps"], "rank": game.rank(player_id)}
+
 # Create player
 @app.post("/create-player")
-async def create_player(request: Request, db: AsyncSession = Depends(get_db)):
-    # Check if game is over
-    if game_state["game_over"]:
-        return HTMLResponse("Game is over. Cannot create new players.", status_code=400)
+@app.post("/game/{game_id}/create-player")
+async def create_player(request: Request, game_id: str = DEFAULT_GAME_ID, db: AsyncSession = Depends(get_db)):
+    game = await store.load_game(game_id)
+    async with game.lock:
+        # Check if game is over
+        if game.game_over:
+            return HTMLResponse("Game is over. Cannot create new players.", status_code=400)
+        
+        # The store checks the player limit atomically with adding the player
+        state = await store.join(game)
+        if state is None:
+            return HTMLResponse("Maximum number of players reached.", status_code=400)
+        
+        # Create a new player
+        player = Player(game_id=game.id, name=f"Player {state['id']}")
+        db.add(player)
+        await db.commit()
+        await db.refresh(player)
+        await store.players_saved(game)
     
-    # Check if we already have 2 players
-    if len(game_state["players"]) >= 2:
-        return HTMLResponse("Maximum number of players reached.", status_code=400)
+    # HTMX appends the new link to the admin's #player-links list out of band
+    if is_htmx(request):
+        return render_fragments(["player_link.html"], {"game_id": game.id, "player_id": state["id"], "oob": True})
     
-    # Create a new player
-    player = Player(name=f"Player {len(game_state['players']) + 1}")
-    db.add(player)
-    await db.commit()
-    await db.refresh(player)
+    # Redirect to player page
+    return RedirectResponse(url=f"/game/{game.id}/player/{state['id']}", status_code=303)
+
+# Most players one bulk request may create
+BULK_PLAYERS_LIMIT = 1000
+
+# Create many players at once, e.g. at check-in
+@app.post("/game/{game_id}/players/bulk", response_model=List[PlayerLink])
+async def create_players(game_id: str, body: BulkPlayersCreate, db: AsyncSession = Depends(get_db)):
+    names = body.names
+    count = len(names) if names is not None else body.count
+    if not count or (body.count is not None and names is not None and body.count != len(names)):
+        raise HTTPException(status_code=422, detail="Give either count or a non-empty list of names")
+    if count > BULK_PLAYERS_LIMIT:
+        raise HTTPException(status_code=422, detail=f"At most {BULK_PLAYERS_LIMIT} players per request")
     
-    # Add player to game state
-    game_state["players"].append({"id": len(game_state["players"]) + 1, "steps": 0})
+    game = await store.load_game(game_id)
+    async with game.lock:
+        if game.game_over:
+            raise HTTPException(status_code=400, detail="Game is over. Cannot create new players.")
+        
+        # All slots are reserved together, or none are
+        states = await store.join_many(game, count)
+        if states is None:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Only {game.open_slots()} of {game.max_players} player slots left.",
+            )
+        
+        # One multi-row INSERT ... RETURNING, one commit; rows come back in the order given
+        rows = [
+            {"game_id": game.id, "name": names[i] if names is not None else f"Player {state['id']}"}
+            for i, state in enumerate(states)
+        ]
+        result = await db.execute(insert(Player).returning(Player.id, Player.name, sort_by_parameter_order=True), rows)
+        created = result.all()
+        await db.commit()
+        await store.players_saved(game)
     
-    # Redirect to player page
-    return RedirectResponse(url=f"/player/{len(game_state['players'])}", status_code=303)
+    return [
+        PlayerLink(id=row.id, player_id=state["id"], name=row.name, url=f"/game/{game.id}/player/{state['id']}")
+        for row, state in zip(created, states)
+    ]
+
+# Change how many players a game accepts
+@app.post("/game/{game_id}/max-players")
+async def set_max_players(game_id: str, max_players: int = Form(..., ge=1)):
+    game = await store.load_game(game_id)
+    async with game.lock:
+        await store.configure(game, max_players)
+    return {"game_id": game.id, "max_players": game.max_players, "open_slots": game.open_slots()}
 
 # Player page
 @app.get("/player/{player_id}", response_class=HTMLResponse)
-async def player_page(request: Request, player_id: int):
-    if player_id < 1 or player_id > len(game_state["players"]):
+@app.get("/game/{game_id}/player/{player_id}", response_class=HTMLResponse)
+async def player_page(request: Request, player_id: int, game_id: str = DEFAULT_GAME_ID):
+    game, player = await store.find_player(game_id, player_id)
+    if player is None:
         return HTMLResponse("Player not found", status_code=404)
+    if (cached := not_modified(request, game_etag(game))) is not None:
+        return cached
     
-    player = game_state["players"][player_id - 1]
-    
-    return templates.TemplateResponse(
-        request,
-        "player.html", 
-        {
+    return render_cached(
+        "player.html",
+        game,
+        player_id,
+        lambda: {
+            "game_id": game.id,
             "player": player,
-            "game_over": game_state["game_over"],
-            "winner": game_state["winner"]
+            "actions": game.rules.extra_actions(),
+            "game_over": game.game_over,
+            "winner": game.winner
         }
     )
 
 # Run action
 @app.post("/player/{player_id}/run", response_class=HTMLResponse)
-async def run_action(request: Request, player_id: int):
-    if player_id < 1 or player_id > len(game_state["players"]):
+@app.post("/game/{game_id}/player/{player_id}/run", response_class=HTMLResponse)
+async def run_action(request: Request, player_id: int, game_id: str = DEFAULT_GAME_ID):
+    return await take_action(request, game_id, player_id, "run")
+
+# Any other action the game's rules define, e.g. a sprint with a cooldown
+@app.post("/game/{game_id}/player/{player_id}/action/{action}", response_class=HTMLResponse)
+async def other_action(request: Request, game_id: str, player_id: int, action: str):
+    return await take_action(request, game_id, player_id, action)
+
+async def take_action(request: Request, game_id: str, player_id: int, action_name: str):
+    game, player = await store.find_player(game_id, player_id)
+    if player is None:
         return HTMLResponse("Player not found", status_code=404)
+    action = game.rules.action(action_name)
+    if action is None:
+        return HTMLResponse("Unknown action", status_code=404)
     
-    if game_state["game_over"]:
-        winner_id = game_state["winner"]
-        return templates.TemplateResponse(
-            request,
-            "player.html", 
-            {
-                "player": game_state["players"][player_id - 1],
-                "game_over": True,
-                "winner": winner_id,
-                "message": f"Game Over - Player {winner_id} won!"
-            }
-        )
+    # The step and the win check are one atomic operation, so taps need no lock
+    outcome = await store.act(game, player, action)
+    if outcome == GAME_OVER:
+        message = f"Game Over - Player {game.winner} won!" if game.winner is not None else "Game Over - nobody won."
+    elif outcome == WON:
+        message = "You won!"
+    elif outcome == LOST:
+        message = "You lost - the game is over for everyone."
+    elif outcome == COOLDOWN:
+        message = f"Wait a moment before you {action_name} again."
+    else:
+        message = None
     
-    player = game_state["players"][player_id - 1]
-    player["steps"] += 1
-    
-    # Check for winner
-    if player["steps"] >= 3:
-        game_state["game_over"] = True
-        game_state["winner"] = player_id
-        return templates.TemplateResponse(
-            request,
-            "player.html", 
-            {
-                "player": player,
-                "game_over": True,
-                "winner": player_id,
-                "message": "You won!"
-            }
-        )
+    # HTMX only needs the status block, plus the run form swapped out once the game ends
+    if is_htmx(request):
+        context = {"game_id": game.id, "player_id": player_id, "steps": player["steps"], "winner": game.winner}
+        fragments = ["player_status.html"]
+        if game.game_over:
+            fragments.append("game_over.html")
+        # Wins are shown by the status block itself
+        notice = message if outcome in (LOST, COOLDOWN) else None
+        return render_fragments(fragments, {**context, "message": notice, "oob": True})
     
     return templates.TemplateResponse(
         request,
         "player.html", 
         {
+            "game_id": game.id,
             "player": player,
-            "game_over": False,
-            "winner": None
+            "actions": game.rules.extra_actions(),
+            "game_over": game.game_over,
+            "winner": game.winner,
+            "message": message
         }
     )
 
+# The status block and controls on their own, for pages catching up after a reset or missed events
+@app.get("/game/{game_id}/player/{player_id}/status", response_class=HTMLResponse)
+async def player_status(game_id: str, player_id: int):
+    game, player = await store.find_player(game_id, player_id)
+    if player is None:
+        return HTMLResponse('<div id="player-status" class="status"><p>You are no longer in this game.</p></div>', status_code=404)
+    context = {
+        "game_id": game.id,
+        "player_id": player_id,
+        "steps": player["steps"],
+        "winner": game.winner,
+        "actions": game.rules.extra_actions(),
+        "message": None,
+        "oob": True,
+    }
+    return render_fragments(["player_status.html", "game_over.html" if game.game_over else "run_form.html"], context)
+
+# Players report where they are, e.g. from the phone's GPS
+@app.post("/game/{game_id}/player/{player_id}/position")
+async def update_position(game_id: str, player_id: int, position: PositionUpdate):
+    game, player = await store.find_player(game_id, player_id)
+    if player is None:
+        raise HTTPException(status_code=404, detail="Player not found")
+    outcome = await store.move(game, player, position.lat, position.lon)
+    return {
+        "id": player_id,
+        "lat": position.lat,
+        "lon": position.lon,
+        "zones": sorted(game.zones.inside(player_id)),
+        "won": outcome == WON,
+    }
+
+# Batched binary updates from AR clients; see arse.ingest for the format
+@app.post("/game/{game_id}/ingest")
+async def ingest_batch(request: Request, game_id: str):
+    try:
+        records = ingest.decode_batch(await read_body(request, ingest.MAX_BATCH_BYTES))
+    except ingest.BatchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    applied = skipped = over = 0
+    for kind, player_id, lat, lon in records:
+        game, player = await store.find_player(game_id, player_id)
+        if player is None:
+            skipped += 1
+            continue
+        if kind == ingest.POSITION:
+            await store.move(game, player, lat, lon)
+        elif await store.run(game, player) == GAME_OVER:
+            # Taps after the game ended change nothing
+            over += 1
+            continue
+        applied += 1
+    
+    game = games.get(game_id)
+    return {
+        "applied": applied,
+        "skipped": skipped,
+        "game_over": over,
+        "version": game.version if game else 0,
+        "winner": game.winner if game else None,
+    }
+
+async def read_body(request: Request, limit: int) -> bytes:
+    """The request body, or 413 as soon as it is known to exceed `limit` bytes."""
+    too_large = HTTPException(status_code=413, detail=f"Body larger than {limit} bytes")
+    length = request.headers.get("content-length")
+    if length is not None and length.isdigit() and int(length) > limit:
+        raise too_large
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > limit:
+            raise too_large
+    return bytes(body)
+
+# The rules this game is played by; edits to the file apply after the next reset
+@app.get("/game/{game_id}/rules")
+async def game_rules(game_id: str):
+    game = await existing_game(game_id)
+    return {"source": game.rules.source, **game.rules.spec}
+
+# Geofences; entering or leaving one sends "enter"/"exit" on the game's event stream
+@app.get("/game/{game_id}/zones")
+async def list_zones(game_id: str):
+    game = await existing_game(game_id)
+    return game.zones.specs()
+
+# Players in each zone right now
+@app.get("/game/{game_id}/zones/counts")
+async def zone_counts(game_id: str):
+    game = await existing_game(game_id)
+    return game.count_by_zone()
+
+@app.post("/game/{game_id}/zones")
+async def define_zone(game_id: str, zone: ZoneSpec):
+    spec = zone.model_dump(exclude_none=True)
+    try:
+        Zone(spec)
+    except (KeyError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=f"Invalid zone: {e}")
+    game = await store.load_game(game_id)
+    async with game.lock:
+        await store.define_zone(game, spec)
+    return spec
+
+@app.delete("/game/{game_id}/zones/{zone_id}")
+async def remove_zone(game_id: str, zone_id: str):
+    game = await existing_game(game_id)
+    async with game.lock:
+        if zone_id not in game.zones:
+            raise HTTPException(status_code=404, detail="Zone not found")
+        await store.remove_zone(game, zone_id)
+    return {"removed": zone_id}
+
+# Proximity queries for tagging and encounters
+@app.get("/game/{game_id}/players/within", response_model=List[NearbyPlayer])
+async def players_within(
+    game_id: str,
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius: float = Query(..., gt=0, description="meters"),
+):
+    game = await existing_game(game_id)
+    return game.within(lat, lon, radius)
+
+@app.get("/game/{game_id}/players/nearest", response_model=List[NearbyPlayer])
+async def players_nearest(
+    game_id: str,
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    k: int = Query(1, ge=1, le=100),
+):
+    game = await existing_game(game_id)
+    return game.nearest(lat, lon, k)
+
+# Large per-game AR assets (models, anchors, audio); see arse.scenes
+scene_assets = SceneAssets()
+
+# Sizes and chunk hashes of a game's assets, so clients fetch only what changed
+@app.get("/game/{game_id}/assets")
+async def scene_manifest(request: Request, game_id: str):
+    manifest = await asyncio.to_thread(scene_assets.manifest, game_id)
+    etag = '"' + manifest["version"] + '"'
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(json.dumps(manifest), media_type="application/json", headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+# One asset, whole or by Range for resumed and chunked downloads
+@app.api_route("/game/{game_id}/assets/{path:path}", methods=["GET", "HEAD"])
+async def scene_asset(request: Request, game_id: str, path: str):
+    file = scene_assets.resolve(game_id, path)
+    if file is None:
+        raise HTTPException(status_code=404, detail="Asset not found")
+    return scene_assets.response(request, file)
+
+# Stream game changes to the browser as server-sent events
+@app.get("/events")
+@app.get("/game/{game_id}/events")
+async def game_events(request: Request, game_id: str = DEFAULT_GAME_ID, events: Optional[str] = None):
+    # Through the store, so a worker that has not seen the game yet loads it
+    game = await store.find_game(game_id)
+    if game is None:
+        return HTMLResponse("Game not found", status_code=404)
+    
+    # ?events=win,lose,reset subscribes to just those kinds, e.g. for player pages that
+    # only react to the end of the game; busy games then do not overflow slow clients
+    kinds = {kind for kind in events.split(",") if kind} if events is not None else None
+    
+    # New subscribers start from the full state, then receive deltas
+    def first():
+        if kinds is not None and "snapshot" not in kinds:
+            return HEARTBEAT
+        return encode_event("snapshot", game.snapshot(), game.version)
+    
+    return StreamingResponse(
+        stream(game.events, first, request.is_disconnected, kinds),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # Reset game
 @app.post("/reset-game")
-async def reset_game_route():
-    await reset_game()
-    game_state["players"] = []
-    game_state["winner"] = None
-    game_state["game_over"] = False
-    return RedirectResponse(url="/admin", status_code=303)
-
-# Add more routes as needed 
\ No newline at end of file
+@app.post("/game/{game_id}/reset-game")
+async def reset_game_route(game_id: str = DEFAULT_GAME_ID):
+    game = await store.load_game(game_id)
+    async with game.lock:
+        await reset_game(game.id)
+        await store.reset(game)
+    return RedirectResponse(url=f"/game/{game.id}/admin", status_code=303)
+
+# Add more routes as needed 
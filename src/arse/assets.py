@@ -0,0 +1,163 @@
+from pathlib import Path
+from typing import Dict, List, Optional
+import gzip
+import hashlib
+import logging
+import mimetypes
+
+try:
+    import brotli
+except ImportError:  # Optional; gzip alone still covers every browser
+    brotli = None
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from .cache import etag_matches
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Hashed URLs change whenever the content does, so browsers may keep them forever
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+# Media types worth compressing; images and fonts already are
+COMPRESSIBLE = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+# Encodings we precompress, best first
+ENCODINGS = ("br", "gzip")
+
+
+class Asset:
+    """One static file, with its content hash and precompressed variants."""
+
+    __slots__ = ("name", "hashed_name", "media_type", "digest", "body", "encoded")
+
+    def __init__(self, name: str, body: bytes, media_type: str):
+        self.name = name
+        self.body = body
+        self.media_type = media_type
+        self.digest = hashlib.sha256(body).hexdigest()[:12]
+        stem, dot, suffix = name.rpartition(".")
+        self.hashed_name = f"{stem}.{self.digest}.{suffix}" if dot else f"{name}.{self.digest}"
+        # encoding -> compressed body, only where it is actually smaller
+        self.encoded: Dict[str, bytes] = {}
+
+    def etag(self, encoding: Optional[str] = None) -> str:
+        # Each representation needs its own strong validator
+        return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+
+    def etags(self) -> List[str]:
+        return [self.etag(), *(self.etag(encoding) for encoding in self.encoded)]
+
+
+def compress(body: bytes, encoding: str) -> Optional[bytes]:
+    if encoding == "gzip":
+        # mtime=0 keeps the output identical from one start to the next
+        return gzip.compress(body, compresslevel=9, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(body, quality=11)
+    return None
+
+
+def negotiate(accept_encoding: str, available) -> Optional[str]:
+    """Best precompressed encoding the client accepts, or None for the plain file."""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    best = None
+    for encoding in ENCODINGS:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if encoding in available and quality > 0 and (best is None or quality > best[1]):
+            best = (encoding, quality)
+    return best[0] if best else None
+
+
+class StaticAssets:
+    """Static files held in memory, precompressed, and addressed by content hash.
+
+    Templates link to `url(name)`, which names the file by the hash of its
+    content, and those URLs are served with an immutable Cache-Control. A
+    browser that has been to a page once makes no static requests on the
+    next visit until a file changes. Plain names still work, but must be
+    revalidated on every use.
+
+    Compressed variants are built once when the files are loaded. A
+    `name.gz` or `name.br` file next to an asset, e.g. made at build time,
+    is used instead of compressing it again.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self._by_name: Dict[str, Asset] = {}
+        self._by_hashed: Dict[str, Asset] = {}
+        self.loaded = False
+
+    def load(self) -> int:
+        """Read, hash and compress every file in the directory. Returns how many were loaded."""
+        by_name = {}
+        if self.directory.is_dir():
+            for path in sorted(self.directory.rglob("*")):
+                if not path.is_file() or path.suffix in (".gz", ".br"):
+                    continue
+                name = path.relative_to(self.directory).as_posix()
+                media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                asset = by_name[name] = Asset(name, path.read_bytes(), media_type)
+                if media_type.startswith(COMPRESSIBLE):
+                    self._precompress(asset, path)
+        self._by_name = by_name
+        self._by_hashed = {asset.hashed_name: asset for asset in by_name.values()}
+        self.loaded = True
+        return len(by_name)
+
+    def _precompress(self, asset: Asset, path: Path):
+        for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+            prebuilt = path.with_name(path.name + suffix)
+            body = prebuilt.read_bytes() if prebuilt.is_file() else compress(asset.body, encoding)
+            if body is not None and len(body) < len(asset.body):
+                asset.encoded[encoding] = body
+
+    def _ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+
+    def url(self, name: str) -> str:
+        """Content-hashed URL of a static file, for templates."""
+        self._ensure_loaded()
+        asset = self._by_name.get(name)
+        if asset is None:
+            logger.warning(f"Unknown static asset: {name}")
+            return f"/static/{name}"
+        return f"/static/{asset.hashed_name}"
+
+    def response(self, request: Request, path: str) -> Response:
+        self._ensure_loaded()
+        asset = self._by_hashed.get(path)
+        cache_control = IMMUTABLE
+        if asset is None:
+            asset = self._by_name.get(path)
+            cache_control = "no-cache"
+        if asset is None:
+            return Response("Not found", status_code=404, media_type="text/plain")
+
+        encoding = negotiate(request.headers.get("accept-encoding", ""), asset.encoded)
+        headers = {"ETag": asset.etag(encoding), "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        if_none_match = request.headers.get("if-none-match")
+        if any(etag_matches(if_none_match, etag) for etag in asset.etags()):
+            return Response(status_code=304, headers=headers)
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+            return Response(asset.encoded[encoding], media_type=asset.media_type, headers=headers)
+        return Response(asset.body, media_type=asset.media_type, headers=headers)
+
+    def __len__(self) -> int:
+        self._ensure_loaded()
+        return len(self._by_name)
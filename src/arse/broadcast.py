@@ -0,0 +1,110 @@
+from typing import AsyncIterator, Awaitable, Callable, Collection, FrozenSet, Optional, Set
+import asyncio
+import json
+import logging
+import os
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Events a subscriber may have queued before it counts as a slow consumer
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("ARSE_SSE_QUEUE_SIZE", "32"))
+
+# Seconds between keep-alive comments on an idle stream
+HEARTBEAT_INTERVAL = float(os.getenv("ARSE_SSE_HEARTBEAT", "15"))
+
+HEARTBEAT = b": ping\n\n"
+
+
+def encode_event(event: str, data: dict, event_id: Optional[int] = None) -> bytes:
+    """Serialize one server-sent event."""
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return ("\n".join(lines) + "\n\n").encode()
+
+
+class Subscriber:
+    """One connected client and the events waiting to be written to it."""
+
+    def __init__(self, maxsize: int = SUBSCRIBER_QUEUE_SIZE, kinds: Optional[Collection[str]] = None):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        # Event kinds this client wants, or None for all; resync is always sent
+        self.kinds: Optional[FrozenSet[str]] = frozenset(kinds) if kinds is not None else None
+        # Number of times this client fell behind and had its backlog replaced
+        self.lagged = 0
+
+    def offer(self, payload: bytes, resync: bytes):
+        """Queue a payload without ever blocking the publisher.
+
+        A client that cannot keep up loses its backlog and gets a single
+        resync event instead, telling it to fetch the full state again.
+        """
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(resync)
+            self.lagged += 1
+
+
+class Broadcaster:
+    """Fan-out of one game's events to every subscribed client."""
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self._subscribers: Set[Subscriber] = set()
+
+    def subscribe(self, kinds: Optional[Collection[str]] = None) -> Subscriber:
+        subscriber = Subscriber(kinds=kinds)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+
+    def publish(self, event: str, data: dict, event_id: Optional[int] = None):
+        if not self._subscribers:
+            return
+        # Serialize once, however many clients are listening, and not at all if none want it
+        payload = resync = None
+        for subscriber in self._subscribers:
+            if subscriber.kinds is not None and event not in subscriber.kinds:
+                continue
+            if payload is None:
+                payload = encode_event(event, data, event_id)
+                resync = encode_event("resync", {"version": event_id}, event_id)
+            subscriber.offer(payload, resync)
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+
+async def stream(
+    broadcaster: Broadcaster,
+    first: Callable[[], bytes],
+    is_disconnected: Callable[[], Awaitable[bool]],
+    kinds: Optional[Collection[str]] = None,
+) -> AsyncIterator[bytes]:
+    """Yield `first()`, then every event published until the client goes away.
+
+    `first` is called right after subscribing, so nothing published in
+    between can be missed. With `kinds`, only events of those kinds are sent.
+    """
+    subscriber = broadcaster.subscribe(kinds)
+    try:
+        yield first()
+        while True:
+            try:
+                payload = await asyncio.wait_for(subscriber.queue.get(), HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                if await is_disconnected():
+                    break
+                payload = HEARTBEAT
+            yield payload
+    finally:
+        broadcaster.unsubscribe(subscriber)
+        if subscriber.lagged:
+            logger.info(f"Subscriber to {broadcaster.name} lagged {subscriber.lagged} times")
@@ -0,0 +1,67 @@
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+import logging
+import os
+import uuid
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Rendered pages kept before the least recently used one is dropped
+RENDER_CACHE_SIZE = int(os.getenv("ARSE_RENDER_CACHE_SIZE", "1024"))
+
+
+class RenderCache:
+    """Bounded LRU cache of rendered templates.
+
+    Keys carry the game's state version, so an entry can never be served
+    once the game has moved on; stale entries simply age out.
+    """
+
+    def __init__(self, maxsize: int = RENDER_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Hashable, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, key: Hashable, render: Callable[[], str]) -> str:
+        html = self._entries.get(key)
+        if html is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return html
+
+        self.misses += 1
+        html = self._entries[key] = render()
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return html
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Changes on every process start, so ETags never outlive the state they describe
+BOOT_ID = uuid.uuid4().hex[:8]
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag for the given state identifiers."""
+    return '"' + "-".join(str(part) for part in (BOOT_ID, *parts)) + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches `etag` (weak comparison, per RFC 9110)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
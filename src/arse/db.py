@@ -1,12 +1,17 @@
-from typing import AsyncGenerator, Optional
+from typing import AsyncGenerator, List, Optional
 import os
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy import delete, event, insert, inspect, literal, text
+from sqlalchemy.exc import TimeoutError as SQLAlchemyTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
 import logging
+import time
 import asyncio
-import asyncpg
+import json
 
-from .models import Base
+from . import metrics
+from .models import Base, GameEvent, Player
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -45,12 +50,110 @@ if "@" in DATABASE_URL:
     db_url_for_log += "@" + DATABASE_URL.split("@")[1]
 logger.info(f"Using database: {db_url_for_log}")
 
+# Connection pool settings; SQLite keeps its own single-connection pooling
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Seconds before a connection is replaced; -1 keeps connections forever
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "-1"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() == "true"
+# Prepared statements asyncpg keeps per connection
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+# Checkouts waiting longer than this are logged
+DB_SLOW_CHECKOUT_MS = float(os.getenv("DB_SLOW_CHECKOUT_MS", "100"))
+
+class PoolStats:
+    """Counters fed by the connection pool's event hooks."""
+
+    def __init__(self):
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.checkouts = 0
+        self.overflow_checkouts = 0
+        self.connects = 0
+        self.timeouts = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record_wait(self, seconds: float):
+        self.wait_count += 1
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+        metrics.db_wait_seconds.observe(seconds)
+        if seconds * 1000 > DB_SLOW_CHECKOUT_MS:
+            logger.warning(f"Waited {seconds * 1000:.0f} ms for a database connection ({self.in_use} in use)")
+
+    def as_dict(self, pool: Pool) -> dict:
+        stats = {
+            "in_use": self.in_use,
+            "peak_in_use": self.peak_in_use,
+            "checkouts": self.checkouts,
+            "overflow_checkouts": self.overflow_checkouts,
+            "connects": self.connects,
+            "timeouts": self.timeouts,
+            "wait_count": self.wait_count,
+            "wait_avg_ms": self.wait_total / self.wait_count * 1000 if self.wait_count else 0.0,
+            "wait_max_ms": self.wait_max * 1000,
+        }
+        if isinstance(pool, QueuePool):
+            stats.update(size=pool.size(), checked_out=pool.checkedout(), overflow=pool.overflow())
+        return stats
+
+pool_stats = PoolStats()
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that times how long each checkout waits for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except SQLAlchemyTimeoutError:
+            pool_stats.timeouts += 1
+            raise
+        finally:
+            pool_stats.record_wait(time.perf_counter() - start)
+
+def engine_options(url: str) -> dict:
+    if url.startswith("sqlite"):
+        # These connect_args are needed for SQLite
+        return {"connect_args": {"check_same_thread": False}}
+    options = {
+        "poolclass": InstrumentedPool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    if url.startswith("postgresql+asyncpg"):
+        options["connect_args"] = {"prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE}
+    return options
+
+def instrument_pool(engine: AsyncEngine):
+    """Track connections in use, overflow and new connections on `engine`'s pool."""
+    pool = engine.sync_engine.pool
+
+    @event.listens_for(pool, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        pool_stats.connects += 1
+
+    @event.listens_for(pool, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        pool_stats.checkouts += 1
+        pool_stats.in_use += 1
+        pool_stats.peak_in_use = max(pool_stats.peak_in_use, pool_stats.in_use)
+        if isinstance(pool, QueuePool) and pool.checkedout() > pool.size():
+            pool_stats.overflow_checkouts += 1
+
+    @event.listens_for(pool, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        pool_stats.in_use -= 1
+
 # Create async engine
-async_engine = create_async_engine(
-    DATABASE_URL,
-    # These connect_args are needed for SQLite
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
-)
+async_engine = create_async_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+instrument_pool(async_engine)
 
 # Create async session factory
 async_session = sessionmaker(
@@ -58,22 +161,42 @@ async_session = sessionmaker(
 )
 
 # Function to create tables
+def add_missing_columns(sync_conn, tables) -> List[str]:
+    """Add columns the models gained since a table was created, with their defaults and indexes."""
+    inspector = inspect(sync_conn)
+    dialect = sync_conn.dialect
+    added = []
+    for table in tables:
+        present = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in present:
+                continue
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect)}"
+            # Existing rows get the default, e.g. players from before games existed join the default game
+            if column.default is not None and column.default.is_scalar:
+                value = literal(column.default.arg, column.type).compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+                ddl += f" DEFAULT {value}"
+            sync_conn.execute(text(ddl))
+            for index in table.indexes:
+                if column.name in index.columns:
+                    index.create(sync_conn, checkfirst=True)
+            added.append(f"{table.name}.{column.name}")
+    return added
+
 async def create_db_and_tables():
+    """Make sure every table exists, creating missing tables and adding missing columns."""
     try:
-        # Debug: Print available roles in PostgreSQL
-        try:
-            # Connect using the same port as the main connection
-            conn_str = f"postgresql://postgres@localhost:{db_port}/postgres"
-            conn = await asyncpg.connect(conn_str)
-            roles = await conn.fetch("SELECT rolname FROM pg_roles")
-            logger.info(f"Available PostgreSQL roles: {[r['rolname'] for r in roles]}")
-            await conn.close()
-        except Exception as e:
-            logger.error(f"Could not connect to PostgreSQL for debugging: {e}")
-        
         async with async_engine.begin() as conn:
-            # Create tables if they don't exist
-            await conn.run_sync(Base.metadata.create_all)
+            # One round trip to list the tables; create only what is missing
+            existing = await conn.run_sync(lambda sync_conn: set(inspect(sync_conn).get_table_names()))
+            missing = [table for table in Base.metadata.sorted_tables if table.name not in existing]
+            if missing:
+                logger.info(f"Creating tables: {', '.join(table.name for table in missing)}")
+                await conn.run_sync(Base.metadata.create_all, tables=missing)
+            older = [table for table in Base.metadata.sorted_tables if table.name in existing]
+            added = await conn.run_sync(add_missing_columns, older)
+            if added:
+                logger.info(f"Added columns: {', '.join(added)}")
     except Exception as e:
         logger.error(f"Error creating database tables: {e}")
         
@@ -100,8 +223,31 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
     async with async_session() as session:
         yield session
 
-# Reset function for testing
-async def reset_game():
+# Append a batch of game events in one round trip
+async def write_events(rows: List[dict]):
+    async with async_engine.begin() as conn:
+        if conn.dialect.driver == "asyncpg":
+            # COPY is the cheapest way to load many rows into PostgreSQL
+            columns = ["game_id", "player_id", "kind", "data", "created_at"]
+            records = [
+                (row["game_id"], row["player_id"], row["kind"], json.dumps(row["data"]), row["created_at"])
+                for row in rows
+            ]
+            raw = await conn.get_raw_connection()
+            await raw.driver_connection.copy_records_to_table(
+                GameEvent.__tablename__, records=records, columns=columns
+            )
+        else:
+            # Executed as a multi-row INSERT
+            await conn.execute(insert(GameEvent), rows)
+
+# Reset function for testing; with a game id only that game's players are removed
+async def reset_game(game_id: Optional[str] = None):
+    if game_id is not None:
+        async with async_engine.begin() as conn:
+            await conn.execute(delete(Player).where(Player.game_id == game_id))
+        return
+
     async with async_engine.begin() as conn:
         # Drop and recreate tables
         await conn.run_sync(Base.metadata.drop_all)
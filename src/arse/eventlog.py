@@ -0,0 +1,107 @@
+from datetime import datetime, timezone
+from typing import List, Optional
+import asyncio
+import logging
+import os
+
+from . import db
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Flush as soon as this many events are waiting...
+EVENT_BATCH_SIZE = int(os.getenv("ARSE_EVENT_BATCH_SIZE", "500"))
+# ...or after this many seconds, whichever comes first
+EVENT_FLUSH_INTERVAL = float(os.getenv("ARSE_EVENT_FLUSH_INTERVAL", "1.0"))
+# Events held in memory while the database is unreachable before the oldest are dropped
+EVENT_BUFFER_LIMIT = int(os.getenv("ARSE_EVENT_BUFFER_LIMIT", "100000"))
+
+
+def event_player_id(kind: str, data: dict) -> Optional[int]:
+    # A round that ran out of time is lost by nobody in particular
+    if data.get("player") is not None:
+        return data["player"]["id"]
+    if kind == "win":
+        return data["winner"]
+    return None
+
+
+class EventLog:
+    """Write-behind queue that appends game events to the game_event table.
+
+    `append` only touches memory, so the request that caused an event never
+    waits on the database. A background task started in the app lifespan
+    writes pending events in batches.
+    """
+
+    def __init__(self, batch_size: int = EVENT_BATCH_SIZE, flush_interval: float = EVENT_FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending: List[dict] = []
+        self._flush_lock = asyncio.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.dropped = 0
+
+    def append(self, game_id: str, kind: str, data: dict):
+        self._pending.append({
+            "game_id": game_id,
+            "player_id": event_player_id(kind, data),
+            "kind": kind,
+            "data": data,
+            "created_at": datetime.now(timezone.utc),
+        })
+        if len(self._pending) > EVENT_BUFFER_LIMIT:
+            overflow = len(self._pending) - EVENT_BUFFER_LIMIT
+            del self._pending[:overflow]
+            self.dropped += overflow
+        if len(self._pending) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Could not write game events, will retry: {e}")
+
+    async def flush(self) -> int:
+        """Write every pending event. On failure the batch is kept for the next try."""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, []
+            try:
+                await db.write_events(batch)
+            except Exception:
+                self._pending[:0] = batch
+                raise
+            self.written += len(batch)
+            return len(batch)
+
+    async def close(self):
+        """Stop the background task and write whatever is still pending."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._wakeup = None
+        flushed = await self.flush()
+        logger.info(f"Flushed {flushed} game events on shutdown")
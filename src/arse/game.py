@@ -0,0 +1,411 @@
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+import asyncio
+import itertools
+import logging
+import os
+import time
+
+from .broadcast import Broadcaster
+from .geofence import Zone, ZoneIndex
+from .players import PlayerTable, PlayerView
+from .rules import LOSE, WIN, WINNING_STEPS, Action, load_rules
+from .spatial import GridIndex
+from .timers import Timer, wheel
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Game used by the original, unscoped routes (/admin, /player/{id}, ...)
+DEFAULT_GAME_ID = "default"
+
+# Players a new game accepts until an admin changes it
+DEFAULT_MAX_PLAYERS = int(os.getenv("ARSE_MAX_PLAYERS", "2"))
+
+# Outcomes of an action
+MOVED = "moved"
+WON = "won"
+LOST = "lost"
+GAME_OVER = "over"
+COOLDOWN = "cooldown"
+
+# Tells apart games that reuse an id, e.g. after being removed and recreated
+_epochs = itertools.count(1)
+
+
+class Game:
+    """In-memory state of a single running game."""
+
+    def __init__(self, game_id: str, registry: Optional["GameRegistry"] = None):
+        self.id = game_id
+        self._registry = registry
+        self.epoch = next(_epochs)
+        # Guards multi-step changes to this game only; other games never wait on it
+        self.lock = asyncio.Lock()
+        # Bumped on every state change so callers can tell when a game moved on
+        self.version = 0
+        self.players = PlayerTable()
+        self.winner: Optional[int] = None
+        self.game_over = False
+        self.max_players = DEFAULT_MAX_PLAYERS
+        # Where players are, for proximity queries
+        self.positions = GridIndex()
+        # Zones players can enter and leave, and who is in which
+        self.zones = ZoneIndex()
+        # Clients streaming this game's changes
+        self.events = Broadcaster(game_id)
+        # Compiled from the game's rules file; see arse.rules
+        self.rules = load_rules(game_id)
+        # (player id, action) -> monotonic time the action may be used again
+        self._cooldowns: Dict[Tuple[int, str], float] = {}
+        # Pending timers by name, e.g. "round"; all are cancelled when the game ends
+        self._timers: Dict[str, Timer] = {}
+
+    def bump(self) -> int:
+        self.version += 1
+        if self._registry is not None:
+            self._registry.version += 1
+        return self.version
+
+    def publish(self, event: str, data: dict, log: bool = True):
+        data = {"version": self.version, **data}
+        self.events.publish(event, data, self.version)
+        if log and self._registry is not None and self._registry.on_event is not None:
+            self._registry.on_event(self.id, event, data)
+
+    def snapshot(self) -> dict:
+        return {
+            "version": self.version,
+            "game_over": self.game_over,
+            "winner": self.winner,
+            "max_players": self.max_players,
+            "zones": self.zones.specs(),
+            "players": self.players.to_list(),
+        }
+
+    def restore(self, state: dict):
+        """Load a state produced by `snapshot`."""
+        self.version = state["version"]
+        self.game_over = state["game_over"]
+        self.winner = state["winner"]
+        self.max_players = state.get("max_players", DEFAULT_MAX_PLAYERS)
+        self._load_zones(state.get("zones", []))
+        self._load_players(state["players"])
+
+    def _load_players(self, players: List[dict]):
+        self.players = PlayerTable()
+        for player in players:
+            self.players.upsert(player)
+        self.positions.clear()
+        for player_id, lat, lon in self.players.positions():
+            self.positions.update(player_id, lat, lon)
+        self._locate_all()
+
+    def _load_zones(self, specs: List[dict]):
+        self.zones = ZoneIndex()
+        for spec in specs:
+            self.zones.add(Zone(spec))
+
+    def _locate_all(self):
+        # Zone membership without enter/exit events, e.g. after zones changed
+        self.zones.refresh_members({player_id: (lat, lon) for player_id, lat, lon in self.players.positions()})
+
+    def _change(self, kind: str, data: dict):
+        """Apply one event to the state. A move returns the (entered, exited) zone ids."""
+        if kind in ("join", "run", "act", "move"):
+            record = self.players.upsert(data["player"])
+            if kind == "move":
+                self.positions.update(record["id"], record["lat"], record["lon"])
+                return self.zones.locate(record["id"], record["lat"], record["lon"])
+        elif kind == "win":
+            self.winner = data["winner"]
+            self.game_over = True
+            self.cancel_timers()
+        elif kind == "lose":
+            self.game_over = True
+            self.cancel_timers()
+        elif kind == "reset":
+            self.cancel_timers()
+            self.players.clear()
+            self.positions.clear()
+            self.zones.clear_players()
+            self.winner = None
+            self.game_over = False
+            self._cooldowns.clear()
+            # Edited rules take effect from the next round
+            self.rules = load_rules(self.id)
+        elif kind == "configure":
+            self.max_players = data["max_players"]
+        elif kind == "zone":
+            self.zones.add(Zone(data["zone"]))
+            self._locate_all()
+        elif kind == "unzone":
+            self.zones.remove(data["zone_id"])
+        return None
+
+    def apply(self, kind: str, data: dict):
+        """Replay a logged event onto this game without publishing it again."""
+        self._change(kind, data)
+        self.version = max(self.version, data["version"])
+
+    def record(self, kind: str, data: dict, log: bool = True):
+        """Apply a change decided by the shared store and announce it.
+
+        `log` is False for changes made by other workers, which log them themselves.
+        """
+        transitions = self._change(kind, data)
+        self.bump()
+        self.publish(kind, data, log)
+        if transitions is not None:
+            self._announce_zones(data["player"]["id"], *transitions)
+
+    def refresh(self, state: dict):
+        """Replace this game's state with a fresh copy from the shared store."""
+        self.game_over = state["game_over"]
+        self.winner = state["winner"]
+        self.max_players = state.get("max_players", DEFAULT_MAX_PLAYERS)
+        self._load_zones(state.get("zones", []))
+        self._load_players(state["players"])
+        self.bump()
+        self.publish("resync", {}, log=False)
+
+    def get_player(self, player_id: int) -> Optional[PlayerView]:
+        return self.players.get(player_id)
+
+    def add_player(self) -> PlayerView:
+        player = self.players.add()
+        self.bump()
+        self.publish("join", {"player": player.to_dict()})
+        return player
+
+    def open_slots(self) -> int:
+        return max(self.max_players - len(self.players), 0)
+
+    def add_players(self, count: int) -> Optional[List[PlayerView]]:
+        """Add `count` players at once, or none if that would overfill the game."""
+        if self.game_over or count > self.open_slots():
+            return None
+        return [self.add_player() for _ in range(count)]
+
+    def configure(self, max_players: int):
+        self.max_players = max_players
+        self.bump()
+        self.publish("configure", {"max_players": max_players})
+
+    @property
+    def wins_by_steps(self) -> bool:
+        """Whether taps decide the winner; games with a winning zone are won by location instead."""
+        return not self.zones.winning
+
+    def move(self, player: PlayerView, lat: float, lon: float) -> str:
+        """Record a player's reported position and fire its zone triggers.
+
+        Returns WON if this move took the player into a winning zone first, otherwise MOVED.
+        """
+        player["lat"] = lat
+        player["lon"] = lon
+        self.positions.update(player["id"], lat, lon)
+        entered, exited = self.zones.locate(player["id"], lat, lon)
+        won = bool(entered & self.zones.winning) and self.claim_winner(player["id"])
+        self.bump()
+        self.publish("move", {"player": {"id": player["id"], "lat": lat, "lon": lon}})
+        self._announce_zones(player["id"], entered, exited)
+        if won:
+            self.publish("win", {"winner": self.winner})
+            return WON
+        return MOVED
+
+    def _announce_zones(self, player_id: int, entered: Set[str], exited: Set[str]):
+        # Derived from the move, so replaying the move recreates them; never logged
+        for zone_id in sorted(exited):
+            self.publish("exit", {"player": player_id, "zone": zone_id}, log=False)
+        for zone_id in sorted(entered):
+            self.publish("enter", {"player": player_id, "zone": zone_id}, log=False)
+
+    def define_zone(self, spec: dict):
+        """Add a zone, or replace the zone with the same id."""
+        self._change("zone", {"zone": spec})
+        self.bump()
+        self.publish("zone", {"zone": spec})
+
+    def remove_zone(self, zone_id: str):
+        self._change("unzone", {"zone_id": zone_id})
+        self.bump()
+        self.publish("unzone", {"zone_id": zone_id})
+
+    def within(self, lat: float, lon: float, radius_meters: float) -> List[dict]:
+        """Players within `radius_meters` of a point, nearest first, with their distance."""
+        found = self.positions.within(lat, lon, radius_meters)
+        return [self._located(player_id, distance) for player_id, distance in found]
+
+    def nearest(self, lat: float, lon: float, k: int) -> List[dict]:
+        """The `k` players closest to a point, nearest first, with their distance."""
+        found = self.positions.nearest(lat, lon, k)
+        return [self._located(player_id, distance) for player_id, distance in found]
+
+    def _located(self, player_id: int, distance: float) -> dict:
+        return {**self.players[player_id].to_dict(), "distance": distance}
+
+    def leaders(self, k: int) -> List[dict]:
+        """The `k` players with the most steps, with their rank; tied players share a rank."""
+        leaders = []
+        for position, (player_id, steps) in enumerate(self.players.leaders(k)):
+            rank = leaders[-1]["rank"] if leaders and leaders[-1]["steps"] == steps else position + 1
+            leaders.append({"id": player_id, "steps": steps, "rank": rank})
+        return leaders
+
+    def rank(self, player_id: int) -> Optional[int]:
+        """A player's place on the leaderboard, or None if they are not in the game."""
+        if player_id not in self.players:
+            return None
+        return self.players.rank(player_id)
+
+    def count_by_zone(self) -> Dict[str, int]:
+        """How many players are in each zone right now."""
+        return self.players.count_by_zone(self.zones.get(spec["id"]) for spec in self.zones.specs())
+
+    def run(self, player: PlayerView) -> str:
+        """Take the run action; see `act`."""
+        return self.act(player, self.rules.run)
+
+    def act(self, player: PlayerView, action: Action) -> str:
+        """Apply an action to a player and settle the game in the same step.
+
+        Nothing here awaits, so no other tap can interleave between the step
+        and the win check; of several players crossing the line together,
+        exactly one claims the win. Returns MOVED, WON, LOST, COOLDOWN if the
+        player used the action too recently, or GAME_OVER if the game had
+        already ended. Only MOVED, WON and LOST change anything.
+        """
+        if self.game_over:
+            return GAME_OVER
+        if action.cooldown and not self.ready(player["id"], action):
+            return COOLDOWN
+        player["steps"] += action.steps
+        outcome = self.rules.settle(player["steps"])
+        won = lost = False
+        if outcome is not None:
+            won = outcome == WIN and self.wins_by_steps and self.claim_winner(player["id"])
+            lost = outcome == LOSE and self.end()
+        self.bump()
+        if action.name == "run":
+            self.publish("run", {"player": player.to_dict()})
+        else:
+            self.publish("act", {"player": player.to_dict(), "action": action.name})
+        if won:
+            self.publish("win", {"winner": self.winner})
+            return WON
+        if lost:
+            self.publish("lose", {"player": {"id": player["id"]}})
+            return LOST
+        return MOVED
+
+    def ready(self, player_id: int, action: Action) -> bool:
+        """Whether the action's cooldown is over for this player; if so, starts the next one."""
+        if not action.cooldown:
+            return True
+        now = time.monotonic()
+        key = (player_id, action.name)
+        if self._cooldowns.get(key, 0.0) > now:
+            return False
+        self._cooldowns[key] = now + action.cooldown
+        return True
+
+    def end(self) -> bool:
+        """End the game without a winner; only succeeds while it is still on."""
+        if self.game_over:
+            return False
+        self.game_over = True
+        self.cancel_timers()
+        return True
+
+    def after(self, name: str, delay: float, callback: Callable, *args) -> Timer:
+        """Call `callback(*args)` in `delay` seconds, replacing any pending timer of the same name.
+
+        Runs on the process's timer wheel; see arse.timers.
+        """
+        self.cancel_timer(name)
+        timer = self._timers[name] = wheel.schedule(delay, self._fire_timer, name, callback, args)
+        return timer
+
+    def _fire_timer(self, name: str, callback: Callable, args: tuple):
+        self._timers.pop(name, None)
+        return callback(*args)
+
+    def cancel_timer(self, name: str) -> bool:
+        timer = self._timers.pop(name, None)
+        return timer is not None and timer.cancel()
+
+    def cancel_timers(self):
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+
+    def start_clock(self, time_up: Callable):
+        """Start the round's time limit if the rules set one and it is not running yet."""
+        if self.rules.time_limit and not self.game_over and "round" not in self._timers:
+            self.after("round", self.rules.time_limit, time_up)
+
+    def time_up(self) -> bool:
+        """End the round because its time ran out; False if it had already ended."""
+        if not self.end():
+            return False
+        self.bump()
+        self.publish("lose", {"player": None})
+        return True
+
+    def claim_winner(self, player_id: int) -> bool:
+        """Compare-and-set the winner; only succeeds while the game is still on."""
+        if self.game_over:
+            return False
+        self.winner = player_id
+        self.game_over = True
+        self.cancel_timers()
+        return True
+
+    def reset(self):
+        self._change("reset", {})
+        self.bump()
+        self.publish("reset", {})
+
+
+class GameRegistry:
+    """All games in this process, keyed by game id."""
+
+    def __init__(self, on_event: Optional[Callable[[str, str, dict], None]] = None):
+        self._games: Dict[str, Game] = {}
+        # Called with (game id, event kind, data) for every event of every game
+        self.on_event = on_event
+        # Bumped whenever any game in the registry changes
+        self.version = 0
+
+    def get(self, game_id: str) -> Optional[Game]:
+        return self._games.get(game_id)
+
+    def get_or_create(self, game_id: str) -> Game:
+        game = self._games.get(game_id)
+        if game is None:
+            game = self._games[game_id] = Game(game_id, self)
+            logger.info(f"Created game {game_id}")
+        return game
+
+    def remove(self, game_id: str) -> Optional[Game]:
+        self.version += 1
+        game = self._games.pop(game_id, None)
+        if game is not None:
+            game.cancel_timers()
+        return game
+
+    def clear(self):
+        self.version += 1
+        for game in self._games.values():
+            game.cancel_timers()
+        self._games.clear()
+
+    def __contains__(self, game_id: str) -> bool:
+        return game_id in self._games
+
+    def __iter__(self) -> Iterator[Game]:
+        return iter(list(self._games.values()))
+
+    def __len__(self) -> int:
+        return len(self._games)
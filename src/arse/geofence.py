@@ -0,0 +1,178 @@
+from collections import defaultdict
+from typing import Dict, Iterator, List, Set, Tuple
+import math
+import os
+
+from .spatial import Cell, METERS_PER_DEGREE, Projection, distance_meters
+
+# Edge of one zone grid cell in meters; zones are registered in every cell their bounding box touches
+ZONE_CELL_METERS = float(os.getenv("ARSE_ZONE_CELL_METERS", "100"))
+# Zones spanning more cells than this are kept in a list that every position update checks instead
+ZONE_MAX_CELLS = int(os.getenv("ARSE_ZONE_MAX_CELLS", "1024"))
+
+CIRCLE = "circle"
+POLYGON = "polygon"
+
+
+class Zone:
+    """A circle or polygon players can enter and leave.
+
+    Built from a JSON-friendly spec, which is what events and snapshots store:
+    {"id", "kind": "circle", "lat", "lon", "radius"} with radius in meters, or
+    {"id", "kind": "polygon", "points": [[lat, lon], ...]}. A zone with
+    "wins": true ends the game for the first player to enter it.
+    """
+
+    def __init__(self, spec: dict):
+        self.spec = spec
+        self.id = spec["id"]
+        self.kind = spec["kind"]
+        self.wins = bool(spec.get("wins", False))
+        if self.kind == CIRCLE:
+            self.lat, self.lon, self.radius = spec["lat"], spec["lon"], spec["radius"]
+            if self.radius <= 0:
+                raise ValueError("A circle needs a positive radius")
+            dlat = self.radius / METERS_PER_DEGREE
+            dlon = dlat / max(math.cos(math.radians(self.lat)), 1e-6)
+            self.bbox = (self.lat - dlat, self.lon - dlon, self.lat + dlat, self.lon + dlon)
+        elif self.kind == POLYGON:
+            self.points: List[Tuple[float, float]] = [(lat, lon) for lat, lon in spec["points"]]
+            if len(self.points) < 3:
+                raise ValueError("A polygon needs at least three points")
+            lats = [lat for lat, _ in self.points]
+            lons = [lon for _, lon in self.points]
+            self.bbox = (min(lats), min(lons), max(lats), max(lons))
+        else:
+            raise ValueError(f"Unknown zone kind: {self.kind}")
+
+    def contains(self, lat: float, lon: float) -> bool:
+        min_lat, min_lon, max_lat, max_lon = self.bbox
+        if not (min_lat <= lat <= max_lat and min_lon <= lon <= max_lon):
+            return False
+        if self.kind == CIRCLE:
+            return distance_meters(self.lat, self.lon, lat, lon) <= self.radius
+        # Even-odd ray casting; zones are small enough to treat degrees as planar
+        inside = False
+        j = len(self.points) - 1
+        for i, (lat_i, lon_i) in enumerate(self.points):
+            lat_j, lon_j = self.points[j]
+            if (lat_i > lat) != (lat_j > lat):
+                if lon < (lon_j - lon_i) * (lat - lat_i) / (lat_j - lat_i) + lon_i:
+                    inside = not inside
+            j = i
+        return inside
+
+
+class ZoneIndex:
+    """One game's zones, bucketed in a grid, and which zones each player is in.
+
+    A position update only tests the zones registered in the player's cell,
+    and compares the result with the player's previous zones to find what
+    was entered and exited. Zones too large to register cell by cell are
+    tested on every update instead.
+    """
+
+    def __init__(self, cell_meters: float = ZONE_CELL_METERS, max_cells: int = ZONE_MAX_CELLS):
+        self.cell_meters = cell_meters
+        self.max_cells = max_cells
+        self._zones: Dict[str, Zone] = {}
+        self._cells: Dict[Cell, Set[str]] = defaultdict(set)
+        # Ids of zones spanning more than max_cells cells
+        self._large: Set[str] = set()
+        self._projection = Projection()
+        # player id -> ids of the zones the player is in
+        self._inside: Dict[int, Set[str]] = {}
+        # Ids of zones that win the game
+        self.winning: Set[str] = set()
+
+    def _span(self, zone: Zone) -> Tuple[int, int, int, int]:
+        min_lat, min_lon, max_lat, max_lon = zone.bbox
+        x0, y0 = self._projection.cell(min_lat, min_lon, self.cell_meters)
+        x1, y1 = self._projection.cell(max_lat, max_lon, self.cell_meters)
+        return x0, y0, x1, y1
+
+    def _is_large(self, zone: Zone) -> bool:
+        x0, y0, x1, y1 = self._span(zone)
+        return (x1 - x0 + 1) * (y1 - y0 + 1) > self.max_cells
+
+    def _zone_cells(self, zone: Zone) -> Iterator[Cell]:
+        x0, y0, x1, y1 = self._span(zone)
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                yield x, y
+
+    def add(self, zone: Zone):
+        """Add a zone, replacing any zone with the same id.
+
+        Players already inside count as inside from now on, without an enter.
+        """
+        self.remove(zone.id)
+        self._zones[zone.id] = zone
+        if self._is_large(zone):
+            self._large.add(zone.id)
+        else:
+            for cell in self._zone_cells(zone):
+                self._cells[cell].add(zone.id)
+        if zone.wins:
+            self.winning.add(zone.id)
+
+    def remove(self, zone_id: str):
+        zone = self._zones.pop(zone_id, None)
+        if zone is None:
+            return
+        if zone_id in self._large:
+            self._large.discard(zone_id)
+        else:
+            for cell in self._zone_cells(zone):
+                members = self._cells[cell]
+                members.discard(zone_id)
+                if not members:
+                    del self._cells[cell]
+        self.winning.discard(zone_id)
+        for inside in self._inside.values():
+            inside.discard(zone_id)
+
+    def get(self, zone_id: str):
+        return self._zones.get(zone_id)
+
+    def specs(self) -> List[dict]:
+        return [zone.spec for zone in self._zones.values()]
+
+    def zones_at(self, lat: float, lon: float) -> Set[str]:
+        cell = self._projection.cell(lat, lon, self.cell_meters)
+        found = {zone_id for zone_id in self._cells.get(cell, ()) if self._zones[zone_id].contains(lat, lon)}
+        if self._large:
+            found.update(zone_id for zone_id in self._large if self._zones[zone_id].contains(lat, lon))
+        return found
+
+    def preview(self, player_id: int, lat: float, lon: float) -> Tuple[Set[str], Set[str]]:
+        """(entered, exited) zone ids if the player moved here, without recording the move."""
+        now = self.zones_at(lat, lon) if self._zones else set()
+        before = self._inside.get(player_id, set())
+        return now - before, before - now
+
+    def locate(self, player_id: int, lat: float, lon: float) -> Tuple[Set[str], Set[str]]:
+        """Record a player's position; returns the (entered, exited) zone ids."""
+        now = self.zones_at(lat, lon) if self._zones else set()
+        before = self._inside.get(player_id, set())
+        self._inside[player_id] = now
+        return now - before, before - now
+
+    def inside(self, player_id: int) -> Set[str]:
+        return self._inside.get(player_id, set())
+
+    def refresh_members(self, positions: Dict[int, Tuple[float, float]]):
+        """Recompute every player's zones silently, e.g. after zones changed."""
+        self._inside = {
+            player_id: self.zones_at(lat, lon) if self._zones else set()
+            for player_id, (lat, lon) in positions.items()
+        }
+
+    def clear_players(self):
+        self._inside = {}
+
+    def __contains__(self, zone_id: str) -> bool:
+        return zone_id in self._zones
+
+    def __len__(self) -> int:
+        return len(self._zones)
@@ -0,0 +1,57 @@
+from typing import Iterable, List, Tuple
+import os
+import struct
+
+# Every batch starts with this header: magic, format version, three reserved bytes
+HEADER = struct.Struct("<4sB3x")
+MAGIC = b"ARSE"
+VERSION = 1
+
+# Followed by fixed-size records: kind, three reserved bytes, player id, latitude, longitude
+RECORD = struct.Struct("<B3xIdd")
+
+# Record kinds
+POSITION = 1
+RUN = 2
+KINDS = (POSITION, RUN)
+
+# Most records accepted in one batch
+INGEST_MAX_RECORDS = int(os.getenv("ARSE_INGEST_MAX_RECORDS", "4096"))
+
+# Largest body a batch of INGEST_MAX_RECORDS can have; anything longer is refused unread
+MAX_BATCH_BYTES = HEADER.size + INGEST_MAX_RECORDS * RECORD.size
+
+CONTENT_TYPE = "application/vnd.arse.batch"
+
+Record = Tuple[int, int, float, float]
+
+
+class BatchError(ValueError):
+    """The body is not a well-formed batch."""
+
+
+def encode_batch(records: Iterable[Record]) -> bytes:
+    """Pack (kind, player id, lat, lon) records into a batch; lat/lon are ignored for RUN."""
+    return HEADER.pack(MAGIC, VERSION) + b"".join(RECORD.pack(*record) for record in records)
+
+
+def decode_batch(body: bytes, max_records: int = INGEST_MAX_RECORDS) -> List[Record]:
+    """Unpack and validate a whole batch before any of it is applied."""
+    if len(body) < HEADER.size:
+        raise BatchError("Batch is shorter than its header")
+    magic, version = HEADER.unpack_from(body)
+    if magic != MAGIC or version != VERSION:
+        raise BatchError("Not a version 1 ARSE batch")
+    payload = memoryview(body)[HEADER.size:]
+    if len(payload) % RECORD.size:
+        raise BatchError(f"Batch length is not a whole number of {RECORD.size}-byte records")
+    if len(payload) // RECORD.size > max_records:
+        raise BatchError(f"At most {max_records} records per batch")
+
+    records = list(RECORD.iter_unpack(payload))
+    for kind, _, lat, lon in records:
+        if kind not in KINDS:
+            raise BatchError(f"Unknown record kind {kind}")
+        if kind == POSITION and not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise BatchError("Position out of range")
+    return records
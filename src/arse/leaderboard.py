@@ -0,0 +1,183 @@
+from array import array
+from bisect import bisect_left, insort
+from typing import Dict, Iterator, List, Tuple
+
+# Ids per block of a bucket; blocks split in two when they reach twice this
+BLOCK_SIZE = 512
+
+
+class SortedIds:
+    """Player ids in ascending order, as a list of short sorted int arrays.
+
+    Finding an id's block is a bisect over the blocks' largest ids, and
+    inserting or removing it shifts at most 2 * BLOCK_SIZE ids, so both stay
+    cheap however many players share a score. Ids cost 4 bytes each.
+    """
+
+    __slots__ = ("_blocks", "_maxes", "_count")
+
+    def __init__(self):
+        self._blocks: List[array] = []
+        self._maxes: List[int] = []
+        self._count = 0
+
+    def add(self, player_id: int):
+        blocks, maxes = self._blocks, self._maxes
+        if not blocks:
+            blocks.append(array("i", [player_id]))
+            maxes.append(player_id)
+        else:
+            index = min(bisect_left(maxes, player_id), len(blocks) - 1)
+            block = blocks[index]
+            insort(block, player_id)
+            maxes[index] = block[-1]
+            if len(block) >= 2 * BLOCK_SIZE:
+                blocks.insert(index + 1, block[BLOCK_SIZE:])
+                del block[BLOCK_SIZE:]
+                maxes.insert(index, block[-1])
+        self._count += 1
+
+    def remove(self, player_id: int):
+        index = bisect_left(self._maxes, player_id)
+        block = self._blocks[index]
+        del block[bisect_left(block, player_id)]
+        if block:
+            self._maxes[index] = block[-1]
+        else:
+            del self._blocks[index]
+            del self._maxes[index]
+        self._count -= 1
+
+    def smallest(self, k: int) -> Iterator[int]:
+        for block in self._blocks:
+            for player_id in block:
+                if k <= 0:
+                    return
+                yield player_id
+                k -= 1
+
+    def __len__(self) -> int:
+        return self._count
+
+
+class Leaderboard:
+    """Players ranked by steps, kept up to date one change at a time.
+
+    Player ids are kept in one bucket per step count, and a Fenwick tree
+    over the step counts holds how many players each bucket has, highest
+    step count first. A player's rank (1 plus the number of players with
+    more steps, so ties share a rank) is one prefix sum, and finding the
+    next non-empty bucket below a given one is one descent of the tree;
+    both are O(log R) for R distinct step counts the tree spans. Moving a
+    player is two tree updates. The tree grows by doubling when a step
+    count falls outside it. Buckets keep their ids sorted, so the top k
+    cost O(k + log R) even when every player is tied.
+    """
+
+    def __init__(self, size: int = 64):
+        # Index i of the tree stands for `_high - i` steps
+        self._high = 0
+        self._size = size
+        self._tree = [0] * (size + 1)
+        self._buckets: Dict[int, SortedIds] = {}
+        self._count = 0
+
+    def _index(self, steps: int) -> int:
+        index = self._high - steps
+        if not 0 <= index < self._size:
+            self._grow(steps)
+            index = self._high - steps
+        return index
+
+    def _grow(self, steps: int):
+        low = min(self._high - self._size + 1, steps)
+        # Headroom above, as step counts mostly go up
+        high = max(self._high, steps) + self._size // 2
+        size = self._size
+        while size < high - low + 1:
+            size *= 2
+        self._high, self._size = high, size
+        self._tree = [0] * (size + 1)
+        for bucket_steps, bucket in self._buckets.items():
+            self._add(self._high - bucket_steps, len(bucket))
+
+    def _add(self, index: int, delta: int):
+        index += 1
+        tree = self._tree
+        while index <= self._size:
+            tree[index] += delta
+            index += index & -index
+
+    def _before(self, index: int) -> int:
+        """Players in tree positions below `index`, i.e. with more steps."""
+        total = 0
+        tree = self._tree
+        while index > 0:
+            total += tree[index]
+            index -= index & -index
+        return total
+
+    def _nth(self, n: int) -> int:
+        """Tree position of the bucket holding the n-th ranked player (0-based)."""
+        position = 0
+        step = 1 << (self._size.bit_length() - 1)
+        tree = self._tree
+        while step:
+            nxt = position + step
+            if nxt <= self._size and tree[nxt] <= n:
+                position = nxt
+                n -= tree[nxt]
+            step >>= 1
+        return position
+
+    def _insert(self, player_id: int, steps: int):
+        bucket = self._buckets.get(steps)
+        if bucket is None:
+            bucket = self._buckets[steps] = SortedIds()
+        bucket.add(player_id)
+
+    def add(self, player_id: int, steps: int):
+        # Index first: growing rebuilds the tree from the buckets
+        index = self._index(steps)
+        self._insert(player_id, steps)
+        self._add(index, 1)
+        self._count += 1
+
+    def move(self, player_id: int, old: int, new: int):
+        """Record that a player's steps changed from `old` to `new`."""
+        if old == new:
+            return
+        bucket = self._buckets[old]
+        bucket.remove(player_id)
+        if not bucket:
+            del self._buckets[old]
+        self._add(self._high - old, -1)
+        index = self._index(new)
+        self._insert(player_id, new)
+        self._add(index, 1)
+
+    def rank(self, steps: int) -> int:
+        """Rank of a player with `steps` steps: 1 plus how many players have more."""
+        index = self._high - steps
+        if index < 0:
+            return 1
+        return self._before(min(index, self._size)) + 1
+
+    def top(self, k: int) -> List[Tuple[int, int]]:
+        """(player id, steps) of the `k` players with the most steps, most first; ties by lower id."""
+        return list(self._iter_top(k))
+
+    def _iter_top(self, k: int) -> Iterator[Tuple[int, int]]:
+        taken = 0
+        while taken < min(k, self._count):
+            steps = self._high - self._nth(taken)
+            bucket = self._buckets[steps]
+            for player_id in bucket.smallest(k - taken):
+                yield player_id, steps
+            taken += len(bucket)
+
+    def clear(self):
+        self.__init__()
+
+    def __len__(self) -> int:
+        return self._count
@@ -0,0 +1,204 @@
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+import time
+
+# Seconds; wide enough for a template render and a slow database round trip alike
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _labels(names: Sequence[str], values: Sequence) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count per label set.
+
+    Everything here runs on the event loop thread, so plain integer updates
+    need no lock.
+    """
+
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in self._values.items():
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Histogram:
+    """Bucketed observations per label set.
+
+    Each label set gets one preallocated list of bucket counts; an
+    observation is a binary search and two additions. Counts are kept per
+    bucket and only made cumulative when the metrics are scraped.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket..., count above the last bucket, sum]
+        self._series: Dict[Tuple, List[float]] = {}
+
+    def observe(self, value: float, *labels):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def count(self, *labels) -> int:
+        series = self._series.get(labels)
+        return sum(series[:-1]) if series else 0
+
+    def samples(self) -> Iterable[str]:
+        bucket_names = self.labelnames + ("le",)
+        for labels, series in self._series.items():
+            total = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                total += count
+                yield f"{self.name}_bucket{_labels(bucket_names, labels + (_number(bound),))} {total}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(series[-1])}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {total}"
+
+
+class Gauge:
+    """Value read from the app when the metrics are scraped, never stored."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, read: Callable[[], float], labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.read = read
+
+    def samples(self) -> Iterable[str]:
+        value = self.read()
+        if not self.labelnames:
+            yield f"{self.name} {_number(value)}"
+            return
+        # With labels, read() returns {label values: value}
+        for labels, sample in value.items():
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(sample)}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name: str, help: str, read: Callable[[], float], labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help, read, labelnames))
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+request_seconds = registry.histogram(
+    "arse_http_request_duration_seconds",
+    "Time from receiving a request until its response starts, by route",
+    ["method", "route", "status"],
+)
+
+render_seconds = registry.histogram(
+    "arse_template_render_seconds",
+    "Time spent rendering a template (render cache misses only)",
+    ["template"],
+)
+
+db_wait_seconds = registry.histogram(
+    "arse_db_connection_wait_seconds",
+    "Time a session waited for a pooled database connection",
+)
+
+game_events = registry.counter(
+    "arse_game_events_total",
+    "Game events recorded by this worker, by game and kind",
+    ["game_id", "kind"],
+)
+
+
+class MetricsMiddleware:
+    """Times every request by its route template, so paths with ids share one series.
+
+    Streaming responses are timed until their headers are sent, which keeps
+    event streams that stay open for minutes out of the latency buckets.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        observed = False
+
+        async def timed_send(message):
+            nonlocal observed
+            if message["type"] == "http.response.start" and not observed:
+                observed = True
+                request_seconds.observe(
+                    time.perf_counter() - start, scope["method"], route_name(scope), message["status"]
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            if not observed:
+                request_seconds.observe(time.perf_counter() - start, scope["method"], route_name(scope), 500)
+
+
+def route_name(scope) -> str:
+    # Set by the router once a route matched
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
@@ -1,7 +1,7 @@
-from typing import Optional, List
+from typing import Literal, Optional, List, Tuple
 from sqlalchemy.orm import declarative_base
-from sqlalchemy import Column, Integer, String
-from pydantic import BaseModel, ConfigDict
+from sqlalchemy import Boolean, Column, DateTime, Float, Integer, JSON, String
+from pydantic import BaseModel, ConfigDict, Field
 
 Base = declarative_base()
 
@@ -9,12 +9,63 @@ class Player(Base):
     __tablename__ = "player"
     
     id = Column(Integer, primary_key=True)
+    game_id = Column(String, index=True, default="default")
     name = Column(String)
     email = Column(String, nullable=True)
     
     # Relationships could be added here
     # games: List["Game"] = Relationship(back_populates="player")
 
+class GameEvent(Base):
+    """One action in a game, appended in order and never updated."""
+    __tablename__ = "game_event"
+    
+    id = Column(Integer, primary_key=True)
+    game_id = Column(String, index=True, nullable=False)
+    player_id = Column(Integer, nullable=True)
+    kind = Column(String, nullable=False)
+    data = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+
+class GameSnapshot(Base):
+    """Latest compact state of a game, so recovery only replays newer events."""
+    __tablename__ = "game_snapshot"
+    
+    game_id = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False)
+    # Every event up to this id is already reflected in `state`
+    last_event_id = Column(Integer, nullable=False)
+    state = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+
+class GameProgress(Base):
+    """Authoritative state of a game shared between webserver workers."""
+    __tablename__ = "game_progress"
+    
+    game_id = Column(String, primary_key=True)
+    players = Column(Integer, nullable=False, default=0)
+    max_players = Column(Integer, nullable=False)
+    winner = Column(Integer, nullable=True)
+    game_over = Column(Boolean, nullable=False, default=False)
+
+class PlayerProgress(Base):
+    """Steps and last reported position of one player, updated in place by conditional UPDATEs."""
+    __tablename__ = "player_progress"
+    
+    game_id = Column(String, primary_key=True)
+    player_id = Column(Integer, primary_key=True)
+    steps = Column(Integer, nullable=False, default=0)
+    lat = Column(Float, nullable=True)
+    lon = Column(Float, nullable=True)
+
+class GameZone(Base):
+    """A geofence of a game shared between webserver workers."""
+    __tablename__ = "game_zone"
+    
+    game_id = Column(String, primary_key=True)
+    zone_id = Column(String, primary_key=True)
+    spec = Column(JSON, nullable=False)
+
 # Add more models as needed, for example:
 # class Game(SQLModel, table=True):
 #     id: Optional[int] = Field(default=None, primary_key=True)
@@ -24,7 +75,49 @@ class Player(Base):
 
 class PlayerRead(BaseModel):
     id: int
+    game_id: str | None = None
     name: str
     email: str | None = None
     
-    model_config = ConfigDict(from_attributes=True) 
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+class BulkPlayersCreate(BaseModel):
+    """Either a number of players to create, or their names."""
+    count: int | None = Field(default=None, ge=1)
+    names: List[str] | None = None
+
+class PlayerLink(BaseModel):
+    id: int
+    player_id: int
+    name: str
+    url: str
+
+class PositionUpdate(BaseModel):
+    lat: float = Field(ge=-90, le=90)
+    lon: float = Field(ge=-180, le=180)
+
+class NearbyPlayer(BaseModel):
+    id: int
+    steps: int
+    lat: float
+    lon: float
+    distance: float
+
+class LeaderboardEntry(BaseModel):
+    id: int
+    steps: int
+    rank: int
+
+class Standings(BaseModel):
+    players: List[LeaderboardEntry]
+    total: int
+
+class ZoneSpec(BaseModel):
+    """A circle (lat, lon, radius in meters) or a polygon ([lat, lon] points)."""
+    id: str = Field(min_length=1)
+    kind: Literal["circle", "polygon"]
+    lat: float | None = Field(default=None, ge=-90, le=90)
+    lon: float | None = Field(default=None, ge=-180, le=180)
+    radius: float | None = Field(default=None, gt=0)
+    points: List[Tuple[float, float]] | None = Field(default=None, max_length=1000)
+    wins: bool = False
@@ -0,0 +1,181 @@
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+import logging
+import os
+import sys
+import threading
+import time
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Milliseconds between samples while profiling
+PROFILER_INTERVAL_MS = float(os.getenv("ARSE_PROFILER_INTERVAL_MS", "5"))
+
+# Longest a single profiling session may run, whatever was asked for
+PROFILER_MAX_SECONDS = float(os.getenv("ARSE_PROFILER_MAX_SECONDS", "600"))
+
+# Frames kept per sample, counted from the route's endpoint
+MAX_DEPTH = 64
+
+# Label of samples taken while no endpoint was running: middleware, background tasks, idle loop
+OUTSIDE_ROUTES = "(outside routes)"
+
+
+def frame_name(code) -> str:
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Samples the event loop thread's stack from a helper thread.
+
+    Nothing runs until `start`: no thread, no hooks. While running, a daemon
+    thread reads the loop thread's current frame every `interval` and counts
+    the stack. Samples are attributed to the route whose endpoint is on the
+    stack, by matching frames against the endpoints' code objects.
+    """
+
+    def __init__(self):
+        self._routes: Dict[object, str] = {}
+        self._samples: Counter = Counter()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._target: Optional[int] = None
+        self.running = False
+        self.deadline: Optional[float] = None
+        self.request_limit: Optional[int] = None
+        self.requests = 0
+        self.interval = PROFILER_INTERVAL_MS / 1000
+        self.started_at: Optional[float] = None
+        self.stopped_at: Optional[float] = None
+
+    def start(self, routes: Iterable, seconds: Optional[float] = None, requests: Optional[int] = None,
+              interval_ms: float = PROFILER_INTERVAL_MS):
+        """Profile the calling thread for `seconds`, or until `requests` more requests finished.
+
+        Clears the previous profile. Must be called from the event loop thread.
+        """
+        if self.running:
+            raise RuntimeError("The profiler is already running")
+        self._routes = {
+            route.endpoint.__code__: route.path for route in routes if hasattr(route, "endpoint")
+        }
+        with self._lock:
+            self._samples = Counter()
+        seconds = min(seconds or PROFILER_MAX_SECONDS, PROFILER_MAX_SECONDS)
+        self.deadline = time.monotonic() + seconds
+        self.request_limit = requests
+        self.requests = 0
+        self.interval = interval_ms / 1000
+        self.started_at = time.time()
+        self.stopped_at = None
+        self._target = threading.get_ident()
+        self._stop.clear()
+        self.running = True
+        self._thread = threading.Thread(target=self._sample_loop, name="arse-profiler", daemon=True)
+        self._thread.start()
+        logger.info(f"Profiling for up to {seconds:.0f} s" + (f" or {requests} requests" if requests else ""))
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+        self.stopped_at = time.time()
+        logger.info(f"Profiler stopped after {self.sample_count} samples")
+
+    def request_finished(self):
+        self.requests += 1
+        if self.request_limit is not None and self.requests >= self.request_limit:
+            self.stop()
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            if time.monotonic() >= self.deadline:
+                # Leave joining to whoever looks next; this thread just ends
+                self.running = False
+                self.stopped_at = time.time()
+                return
+            frame = sys._current_frames().get(self._target)
+            if frame is not None:
+                stack = self._collapse(frame)
+                with self._lock:
+                    self._samples[stack] += 1
+
+    def _collapse(self, frame) -> str:
+        names = []
+        route = None
+        while frame is not None:
+            route = self._routes.get(frame.f_code)
+            names.append(frame_name(frame.f_code))
+            if route is not None:
+                break
+            frame = frame.f_back
+        if route is None:
+            # Keep the innermost frames only; the outer ones are the event loop itself
+            return ";".join([OUTSIDE_ROUTES, *reversed(names[:MAX_DEPTH])])
+        return ";".join([route, *reversed(names[-MAX_DEPTH:])])
+
+    @property
+    def sample_count(self) -> int:
+        with self._lock:
+            return sum(self._samples.values())
+
+    def collapsed(self, route: Optional[str] = None) -> str:
+        """Samples in collapsed-stack format, as read by flamegraph.pl and speedscope."""
+        with self._lock:
+            samples = sorted(self._samples.items())
+        return "".join(
+            f"{stack} {count}\n"
+            for stack, count in samples
+            if route is None or stack.split(";", 1)[0] == route
+        )
+
+    def by_route(self) -> Dict[str, int]:
+        totals: Counter = Counter()
+        with self._lock:
+            for stack, count in self._samples.items():
+                totals[stack.split(";", 1)[0]] += count
+        return dict(totals.most_common())
+
+    def status(self) -> dict:
+        return {
+            "running": self.running,
+            "samples": self.sample_count,
+            "requests": self.requests,
+            "request_limit": self.request_limit,
+            "interval_ms": self.interval * 1000,
+            "seconds_left": max(self.deadline - time.monotonic(), 0) if self.running else 0,
+            "started_at": self.started_at,
+            "stopped_at": self.stopped_at,
+            "routes": self.by_route(),
+        }
+
+
+profiler = SamplingProfiler()
+
+
+class ProfilerMiddleware:
+    """Counts finished requests for a profile limited to the next N requests.
+
+    While the profiler is off this is a single attribute check.
+    """
+
+    def __init__(self, app, profiler: SamplingProfiler = profiler, exclude: str = "/admin/profiler"):
+        self.app = app
+        self.profiler = profiler
+        self.exclude = exclude
+
+    async def __call__(self, scope, receive, send):
+        if not self.profiler.running or scope["type"] != "http" or scope["path"].startswith(self.exclude):
+            return await self.app(scope, receive, send)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if self.profiler.running:
+                self.profiler.request_finished()
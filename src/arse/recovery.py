@@ -0,0 +1,121 @@
+from datetime import datetime, timezone
+from typing import Dict, Optional
+import asyncio
+import logging
+import os
+
+from sqlalchemy import delete, func, insert, select, update
+
+from . import db
+from .eventlog import EventLog
+from .game import GameRegistry
+from .models import GameEvent, GameSnapshot
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Seconds between snapshots; recovery replays at most this much history
+SNAPSHOT_INTERVAL = float(os.getenv("ARSE_SNAPSHOT_INTERVAL", "30"))
+
+# Events fetched per round trip while replaying
+REPLAY_BATCH_SIZE = 1000
+
+
+class Snapshotter:
+    """Periodically stores a compact snapshot of every game that changed."""
+
+    def __init__(self, registry: GameRegistry, event_log: EventLog, interval: float = SNAPSHOT_INTERVAL):
+        self.registry = registry
+        self.event_log = event_log
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        # Version of each game at its last stored snapshot
+        self._stored: Dict[str, int] = {}
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.snapshot()
+            except Exception as e:
+                logger.error(f"Could not snapshot games: {e}")
+
+    async def snapshot(self) -> int:
+        """Store every game that changed since the last snapshot. Returns how many were stored."""
+        # Every event logged so far must be on disk before we read the high-water mark
+        await self.event_log.flush()
+        async with db.async_engine.begin() as conn:
+            last_event_id = (await conn.execute(select(func.max(GameEvent.id)))).scalar() or 0
+
+            # Captured without awaiting, so each state reflects every event up to
+            # last_event_id; later events are filtered out by version on replay
+            now = datetime.now(timezone.utc)
+            rows = [
+                {
+                    "game_id": game.id,
+                    "version": game.version,
+                    "last_event_id": last_event_id,
+                    "state": game.snapshot(),
+                    "created_at": now,
+                }
+                for game in self.registry
+                if self._stored.get(game.id) != game.version
+            ]
+
+            if rows:
+                await conn.execute(delete(GameSnapshot).where(GameSnapshot.game_id.in_([row["game_id"] for row in rows])))
+                await conn.execute(insert(GameSnapshot), rows)
+            # Unchanged games are current as of this high-water mark too
+            await conn.execute(update(GameSnapshot).values(last_event_id=last_event_id))
+
+        for row in rows:
+            self._stored[row["game_id"]] = row["version"]
+        return len(rows)
+
+    async def close(self):
+        """Stop snapshotting, taking a final snapshot first."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.snapshot()
+
+
+async def recover(registry: GameRegistry) -> int:
+    """Rebuild games from their snapshots plus the events logged after them.
+
+    Returns the number of events replayed.
+    """
+    replayed = 0
+    async with db.async_engine.connect() as conn:
+        snapshots = (await conn.execute(select(
+            GameSnapshot.game_id, GameSnapshot.version, GameSnapshot.last_event_id, GameSnapshot.state
+        ))).all()
+        restored: Dict[str, int] = {}
+        for snapshot in snapshots:
+            registry.get_or_create(snapshot.game_id).restore(snapshot.state)
+            restored[snapshot.game_id] = snapshot.version
+        since = min((snapshot.last_event_id for snapshot in snapshots), default=0)
+
+        statement = (
+            select(GameEvent.game_id, GameEvent.kind, GameEvent.data)
+            .where(GameEvent.id > since)
+            .order_by(GameEvent.id)
+            .execution_options(yield_per=REPLAY_BATCH_SIZE)
+        )
+        result = await conn.stream(statement)
+        async for game_id, kind, data in result:
+            # Skip events the snapshot already contains
+            if data["version"] <= restored.get(game_id, 0):
+                continue
+            registry.get_or_create(game_id).apply(kind, data)
+            replayed += 1
+
+    logger.info(f"Recovered {len(registry)} games ({len(snapshots)} snapshots, {replayed} events replayed)")
+    return replayed
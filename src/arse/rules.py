@@ -0,0 +1,165 @@
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+import logging
+import os
+import re
+import tomllib
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Rules for game <id> are read from <dir>/<id>.toml, else <dir>/default.toml
+RULES_DIR = Path(os.getenv("ARSE_RULES_DIR", "rules"))
+
+# Steps a player needs to win under the built-in rules
+WINNING_STEPS = 3
+
+# Built-in rules, used when a game has no rules file: one step per tap, first to 3 wins
+DEFAULT_RULES = {
+    "actions": {"run": {"steps": 1}},
+    "win": [{"when": f"steps >= {WINNING_STEPS}"}],
+}
+
+# Kinds of end condition, checked in this order after every action
+WIN = "win"
+LOSE = "lose"
+
+# The counters a condition can test; players store nothing else
+COUNTERS = ("steps",)
+
+CONDITION = re.compile(r"^\s*(\w+)\s*(>=|<=|==|!=|>|<)\s*(-?\d+)\s*$")
+
+# One factory per operator, so a compiled condition is a single comparison
+COMPARISONS: Dict[str, Callable[[str, int], Callable[[int], Optional[str]]]] = {
+    ">=": lambda outcome, value: lambda steps: outcome if steps >= value else None,
+    "<=": lambda outcome, value: lambda steps: outcome if steps <= value else None,
+    ">": lambda outcome, value: lambda steps: outcome if steps > value else None,
+    "<": lambda outcome, value: lambda steps: outcome if steps < value else None,
+    "==": lambda outcome, value: lambda steps: outcome if steps == value else None,
+    "!=": lambda outcome, value: lambda steps: outcome if steps != value else None,
+}
+
+
+class RulesError(ValueError):
+    """A rules file is not valid."""
+
+
+class Action:
+    """One compiled action: how it changes a player's steps and how often it may be used."""
+
+    __slots__ = ("name", "steps", "cooldown")
+
+    def __init__(self, name: str, steps: int, cooldown: float):
+        self.name = name
+        self.steps = steps
+        self.cooldown = cooldown
+
+
+class Rules:
+    """A game's rules, compiled once so that settling an action is a few comparisons.
+
+    Rules are written in TOML:
+
+        time_limit = 300         # seconds from the first join until the game ends with no winner
+
+        [actions.run]            # every game has "run", the tap on the player page
+        steps = 1
+        [actions.sprint]
+        steps = 3
+        cooldown = 10            # seconds before the same player may sprint again
+
+        [[win]]
+        when = "steps >= 10"     # the first player to get there wins
+        [[lose]]
+        when = "steps < -5"      # ends the game with no winner
+
+    Nothing is parsed or looked up while a game is played: each action
+    becomes an `Action`, and all win and lose conditions become one
+    `settle(steps)` closure that returns WIN, LOSE or None.
+    """
+
+    def __init__(self, spec: dict, source: str = "built-in"):
+        self.spec = spec
+        self.source = source
+        actions = spec.get("actions", {})
+        if not isinstance(actions, dict) or "run" not in actions:
+            raise RulesError("Rules must define actions.run")
+        self.actions: Dict[str, Action] = {name: _compile_action(name, action) for name, action in actions.items()}
+        self.run = self.actions["run"]
+        self.time_limit: Optional[float] = spec.get("time_limit")
+        if self.time_limit is not None and (not isinstance(self.time_limit, (int, float)) or self.time_limit <= 0):
+            raise RulesError("time_limit must be a positive number of seconds")
+        self.settle = _compile_settle(
+            [_compile_condition(WIN, condition) for condition in _conditions(spec, WIN)]
+            + [_compile_condition(LOSE, condition) for condition in _conditions(spec, LOSE)]
+        )
+
+    def action(self, name: str) -> Optional[Action]:
+        return self.actions.get(name)
+
+    def extra_actions(self) -> List[str]:
+        """Actions besides run, for the player page."""
+        return [name for name in self.actions if name != "run"]
+
+
+def _compile_action(name: str, action: dict) -> Action:
+    if not isinstance(action, dict):
+        raise RulesError(f"actions.{name} must be a table")
+    steps = action.get("steps", 0)
+    cooldown = action.get("cooldown", 0)
+    if not isinstance(steps, int) or not isinstance(cooldown, (int, float)) or cooldown < 0:
+        raise RulesError(f"actions.{name} needs integer steps and a non-negative cooldown")
+    unknown = set(action) - {"steps", "cooldown"}
+    if unknown:
+        raise RulesError(f"actions.{name} has unknown keys: {', '.join(sorted(unknown))}")
+    return Action(name, steps, float(cooldown))
+
+
+def _conditions(spec: dict, kind: str) -> List[dict]:
+    conditions = spec.get(kind, [])
+    if isinstance(conditions, dict):
+        conditions = [conditions]
+    return conditions
+
+
+def _compile_condition(outcome: str, condition: dict) -> Callable[[int], Optional[str]]:
+    match = CONDITION.match(condition.get("when", "")) if isinstance(condition, dict) else None
+    if match is None:
+        raise RulesError(f"Invalid condition: {condition!r}; expected e.g. when = \"steps >= 3\"")
+    counter, operator, value = match.groups()
+    if counter not in COUNTERS:
+        raise RulesError(f"Unknown counter {counter!r}; conditions can test {', '.join(COUNTERS)}")
+    return COMPARISONS[operator](outcome, int(value))
+
+
+def _compile_settle(conditions: List[Callable[[int], Optional[str]]]) -> Callable[[int], Optional[str]]:
+    # The usual single win condition is the settle function itself
+    if not conditions:
+        return lambda steps: None
+    if len(conditions) == 1:
+        return conditions[0]
+    conditions = tuple(conditions)
+
+    def settle(steps: int) -> Optional[str]:
+        for condition in conditions:
+            outcome = condition(steps)
+            if outcome is not None:
+                return outcome
+        return None
+    return settle
+
+
+def load_rules(game_id: str, directory: Optional[Path] = None) -> Rules:
+    """Compile the rules for a game; invalid files are logged and replaced by the built-in rules."""
+    directory = RULES_DIR if directory is None else directory
+    for path in (directory / f"{game_id}.toml", directory / "default.toml"):
+        # Game ids come from URLs; never read outside the rules directory
+        if path.parent != directory or not path.is_file():
+            continue
+        try:
+            with open(path, "rb") as file:
+                return Rules(tomllib.load(file), str(path))
+        except (tomllib.TOMLDecodeError, RulesError) as e:
+            logger.error(f"Ignoring invalid rules {path}: {e}")
+            break
+    return Rules(DEFAULT_RULES)
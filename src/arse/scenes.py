@@ -0,0 +1,199 @@
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import hashlib
+import logging
+import mimetypes
+import mmap
+import os
+import re
+
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response, StreamingResponse
+
+from .cache import etag_matches
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Scene assets live in one subdirectory per game: <dir>/<game_id>/<path>
+SCENE_ASSETS_DIR = Path(os.getenv("ARSE_SCENE_ASSETS_DIR", "scenes"))
+
+# Size of the chunks hashed in the manifest, and of the slices sent while streaming
+SCENE_CHUNK_BYTES = int(os.getenv("ARSE_SCENE_CHUNK_BYTES", str(1024 * 1024)))
+
+# Sent per write while streaming a file or a range of it
+SEND_BYTES = 256 * 1024
+
+RANGE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+class MappedFile:
+    """A read-only memory map of one scene asset, shared by every request for it.
+
+    Files must be replaced by writing a new file and renaming it over the
+    old one; a download in progress keeps reading the old mapping. Files
+    truncated in place would fault the process.
+    """
+
+    __slots__ = ("path", "size", "mtime_ns", "inode", "_map")
+
+    def __init__(self, path: Path, stat: os.stat_result):
+        self.path = path
+        self.size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+        self.inode = stat.st_ino
+        self._map = None
+        if self.size:
+            with open(path, "rb") as file:
+                self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def is_current(self, stat: os.stat_result) -> bool:
+        return (stat.st_size, stat.st_mtime_ns, stat.st_ino) == (self.size, self.mtime_ns, self.inode)
+
+    @property
+    def etag(self) -> str:
+        # Cheap strong validator, so If-Range never waits for the content hash
+        return f'"{self.inode:x}-{self.mtime_ns:x}-{self.size:x}"'
+
+    def __getitem__(self, span: slice) -> bytes:
+        return self._map[span] if self._map is not None else b""
+
+    def chunk_hashes(self, chunk_size: int) -> List[str]:
+        view = memoryview(self._map) if self._map is not None else memoryview(b"")
+        try:
+            return [hashlib.sha256(view[start:start + chunk_size]).hexdigest() for start in range(0, self.size, chunk_size)]
+        finally:
+            view.release()
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """(start, end) inclusive of a single byte range, or None to send the whole file.
+
+    Raises ValueError when the range lies entirely past the end of the file.
+    Multiple ranges are not supported and get the whole file, as RFC 9110 allows.
+    """
+    match = RANGE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    elif last:
+        # Suffix range: the last N bytes
+        start, end = max(size - int(last), 0), size - 1
+        if int(last) == 0:
+            raise ValueError("Empty suffix range")
+    else:
+        return None
+    if start >= size:
+        raise ValueError("Range starts past the end of the file")
+    return start, end
+
+
+async def stream(mapped: MappedFile, start: int, end: int) -> AsyncIterator[bytes]:
+    for offset in range(start, end + 1, SEND_BYTES):
+        yield mapped[offset:min(offset + SEND_BYTES, end + 1)]
+
+
+class SceneAssets:
+    """Large per-game files (models, anchors, audio) served with Range support and a chunk manifest.
+
+    Files are memory mapped once and streamed straight from the mapping, so
+    concurrent downloads share the page cache and need no read calls or
+    thread hops per chunk. A full download uses the server's sendfile path
+    when it offers one (the ASGI pathsend extension).
+
+    The manifest lists every file with the SHA-256 of each fixed-size chunk,
+    so a client moving to a new scene can fetch only the chunks whose hash
+    changed, with Range requests. Hashes are cached until the file changes.
+    """
+
+    def __init__(self, directory: Path = SCENE_ASSETS_DIR, chunk_size: int = SCENE_CHUNK_BYTES):
+        self.directory = Path(directory)
+        self.chunk_size = chunk_size
+        self._mapped: Dict[Path, MappedFile] = {}
+        # path -> (mapping the entry was computed from, manifest entry)
+        self._manifest: Dict[Path, Tuple[MappedFile, dict]] = {}
+
+    def _game_dir(self, game_id: str) -> Optional[Path]:
+        root = self.directory.resolve()
+        game_dir = (root / game_id).resolve()
+        return game_dir if game_dir.parent == root else None
+
+    def resolve(self, game_id: str, path: str) -> Optional[Path]:
+        """The file for a game's asset path, or None if it does not exist or escapes the game's directory."""
+        game_dir = self._game_dir(game_id)
+        if game_dir is None:
+            return None
+        file = (game_dir / path).resolve()
+        if not file.is_relative_to(game_dir) or not file.is_file():
+            return None
+        return file
+
+    def open(self, file: Path) -> MappedFile:
+        stat = file.stat()
+        mapped = self._mapped.get(file)
+        if mapped is None or not mapped.is_current(stat):
+            # Readers of the old mapping keep it alive until they finish
+            mapped = self._mapped[file] = MappedFile(file, stat)
+        return mapped
+
+    def manifest(self, game_id: str) -> dict:
+        """Every asset of a game with its size and chunk hashes. Hashes large files; run it in a thread."""
+        game_dir = self._game_dir(game_id)
+        assets = []
+        if game_dir is not None and game_dir.is_dir():
+            for file in sorted(game_dir.rglob("*")):
+                name = file.relative_to(game_dir).as_posix()
+                if not file.is_file() or any(part.startswith(".") for part in name.split("/")):
+                    continue
+                assets.append(self._entry(file, name))
+        # Identifies this exact set of files; doubles as the manifest's ETag
+        version = hashlib.sha256("".join(f"{entry['path']}\0{entry['sha256']}\0" for entry in assets).encode()).hexdigest()[:16]
+        return {"game_id": game_id, "version": version, "chunk_size": self.chunk_size, "assets": assets}
+
+    def _entry(self, file: Path, name: str) -> dict:
+        mapped = self.open(file)
+        cached = self._manifest.get(file)
+        if cached is not None and cached[0] is mapped:
+            return cached[1]
+        chunks = mapped.chunk_hashes(self.chunk_size)
+        entry = {
+            "path": name,
+            "size": mapped.size,
+            # Hash of the chunk hashes: changes exactly when some chunk does
+            "sha256": hashlib.sha256("".join(chunks).encode()).hexdigest(),
+            "etag": mapped.etag,
+            "chunks": chunks,
+        }
+        self._manifest[file] = (mapped, entry)
+        return entry
+
+    def response(self, request: Request, file: Path) -> Response:
+        mapped = self.open(file)
+        media_type = mimetypes.guess_type(file.name)[0] or "application/octet-stream"
+        headers = {"ETag": mapped.etag, "Accept-Ranges": "bytes", "Cache-Control": "no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), mapped.etag):
+            return Response(status_code=304, headers=headers)
+
+        # A stale If-Range means the client's partial copy is of an older file
+        if_range = request.headers.get("if-range")
+        try:
+            span = parse_range(request.headers.get("range"), mapped.size) if if_range in (None, mapped.etag) else None
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{mapped.size}"})
+
+        if span is None:
+            start, end, status = 0, mapped.size - 1, 200
+            if "http.response.pathsend" in request.scope.get("extensions", {}):
+                return FileResponse(file, headers=headers, media_type=media_type)
+        else:
+            (start, end), status = span, 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{mapped.size}"
+        headers["Content-Length"] = str(end - start + 1)
+        if request.method == "HEAD":
+            return Response(status_code=status, headers=headers, media_type=media_type)
+        return StreamingResponse(stream(mapped, start, end), status_code=status, headers=headers, media_type=media_type)
@@ -0,0 +1,161 @@
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+import heapq
+import math
+import os
+
+# Edge of one grid cell in meters; about the radius of a typical proximity check
+GRID_CELL_METERS = float(os.getenv("ARSE_GRID_CELL_METERS", "50"))
+
+EARTH_RADIUS_METERS = 6_371_000.0
+
+# Meters per degree of latitude, and of longitude at the equator
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_METERS / 180
+
+Cell = Tuple[int, int]
+
+
+def distance_meters(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points (haversine)."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(min(1.0, math.sqrt(a)))
+
+
+class Projection:
+    """Flat x/y meters around the first latitude projected, for bucketing points into grid cells."""
+
+    def __init__(self):
+        self.lon_scale: Optional[float] = None
+
+    def cell(self, lat: float, lon: float, cell_meters: float) -> Cell:
+        if self.lon_scale is None:
+            self.lon_scale = math.cos(math.radians(lat))
+        x = lon * METERS_PER_DEGREE * self.lon_scale
+        y = lat * METERS_PER_DEGREE
+        return math.floor(x / cell_meters), math.floor(y / cell_meters)
+
+    def reset(self):
+        self.lon_scale = None
+
+
+class GridIndex:
+    """Uniform grid over one game's play area, mapping cells to the players in them.
+
+    Coordinates are projected onto a flat plane around the first position
+    seen, which is accurate to well under a percent across a scene a few
+    kilometers wide. Moving a player touches at most two cells; a query
+    only visits the cells its radius overlaps, so both stay independent of
+    how many players are elsewhere in the game. Distances in results are
+    exact great-circle distances.
+    """
+
+    def __init__(self, cell_meters: float = GRID_CELL_METERS):
+        self.cell_meters = cell_meters
+        self._cells: Dict[Cell, Set[int]] = defaultdict(set)
+        # player id -> (lat, lon, cell)
+        self._positions: Dict[int, Tuple[float, float, Cell]] = {}
+        self._projection = Projection()
+        # Bounding box of every cell ever occupied since the last clear
+        self._bounds: Optional[Tuple[int, int, int, int]] = None
+
+    def _cell(self, lat: float, lon: float) -> Cell:
+        return self._projection.cell(lat, lon, self.cell_meters)
+
+    def update(self, player_id: int, lat: float, lon: float):
+        cell = self._cell(lat, lon)
+        previous = self._positions.get(player_id)
+        if previous is not None and previous[2] != cell:
+            self._discard(player_id, previous[2])
+        self._cells[cell].add(player_id)
+        self._positions[player_id] = (lat, lon, cell)
+        x, y = cell
+        if self._bounds is None:
+            self._bounds = (x, y, x, y)
+        else:
+            min_x, min_y, max_x, max_y = self._bounds
+            if not (min_x <= x <= max_x and min_y <= y <= max_y):
+                self._bounds = (min(min_x, x), min(min_y, y), max(max_x, x), max(max_y, y))
+
+    def remove(self, player_id: int):
+        previous = self._positions.pop(player_id, None)
+        if previous is not None:
+            self._discard(player_id, previous[2])
+
+    def _discard(self, player_id: int, cell: Cell):
+        members = self._cells[cell]
+        members.discard(player_id)
+        if not members:
+            del self._cells[cell]
+
+    def clear(self):
+        self._cells.clear()
+        self._positions.clear()
+        self._projection.reset()
+        self._bounds = None
+
+    def position(self, player_id: int) -> Optional[Tuple[float, float]]:
+        entry = self._positions.get(player_id)
+        return entry[:2] if entry else None
+
+    def _ring(self, center: Cell, radius: int) -> List[Cell]:
+        """Cells exactly `radius` steps (Chebyshev) away from `center`."""
+        cx, cy = center
+        if radius == 0:
+            return [center]
+        cells = [(cx + dx, cy + dy) for dx in range(-radius, radius + 1) for dy in (-radius, radius)]
+        cells += [(cx + dx, cy + dy) for dx in (-radius, radius) for dy in range(-radius + 1, radius)]
+        return cells
+
+    def _candidates(self, cells: List[Cell], lat: float, lon: float):
+        for cell in cells:
+            for player_id in self._cells.get(cell, ()):
+                plat, plon, _ = self._positions[player_id]
+                yield distance_meters(lat, lon, plat, plon), player_id
+
+    def within(self, lat: float, lon: float, radius_meters: float) -> List[Tuple[int, float]]:
+        """(player id, meters) of every player within `radius_meters`, nearest first."""
+        if not self._positions:
+            return []
+        center = self._cell(lat, lon)
+        # One extra ring covers the projection error near the edge of the radius
+        reach = math.ceil(radius_meters / self.cell_meters) + 1
+        cx, cy = center
+        if (2 * reach + 1) ** 2 > len(self._cells):
+            # A huge radius would visit more empty cells than there are occupied ones
+            cells = list(self._cells)
+        else:
+            cells = [(cx + dx, cy + dy) for dx in range(-reach, reach + 1) for dy in range(-reach, reach + 1)]
+        found = [(distance, player_id) for distance, player_id in self._candidates(cells, lat, lon)
+                 if distance <= radius_meters]
+        found.sort()
+        return [(player_id, distance) for distance, player_id in found]
+
+    def nearest(self, lat: float, lon: float, k: int) -> List[Tuple[int, float]]:
+        """(player id, meters) of the `k` players closest to the point, nearest first."""
+        if k <= 0 or not self._positions:
+            return []
+        center = self._cell(lat, lon)
+        # No occupied cell is further away than this many rings
+        min_x, min_y, max_x, max_y = self._bounds
+        cx, cy = center
+        limit = max(cx - min_x, max_x - cx, cy - min_y, max_y - cy, 0)
+        best: List[Tuple[float, int]] = []  # max-heap of the k closest so far, negated
+        for radius in range(limit + 1):
+            for distance, player_id in self._candidates(self._ring(center, radius), lat, lon):
+                if len(best) < k:
+                    heapq.heappush(best, (-distance, player_id))
+                elif distance < -best[0][0]:
+                    heapq.heapreplace(best, (-distance, player_id))
+            # Anything in later rings is at least this far away (less one cell of slack)
+            if len(best) == k and -best[0][0] <= (radius - 1) * self.cell_meters:
+                break
+        return [(player_id, -negative) for negative, player_id in sorted(best, reverse=True)]
+
+    def __contains__(self, player_id: int) -> bool:
+        return player_id in self._positions
+
+    def __len__(self) -> int:
+        return len(self._positions)
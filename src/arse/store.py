@@ -0,0 +1,450 @@
+from typing import List, Optional, Tuple
+import asyncio
+import json
+import logging
+import os
+import uuid
+
+import asyncpg
+from sqlalchemy import delete, exists, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from . import db
+from .game import Game, GameRegistry, COOLDOWN, DEFAULT_MAX_PLAYERS, GAME_OVER, LOST, MOVED, WON
+from .rules import LOSE, WIN, Action
+from .models import GameProgress, GameZone, PlayerProgress
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# "memory" keeps games in this process only; "postgres" shares them between workers
+STATE_STORE = os.getenv("ARSE_STATE_STORE", "memory")
+
+# NOTIFY channel carrying game changes between workers
+CHANNEL = "arse_game"
+
+# Lets a worker recognise its own notifications
+WORKER_ID = uuid.uuid4().hex
+
+# Seconds between attempts to re-establish a dropped LISTEN connection
+RECONNECT_DELAY = 2.0
+
+
+class MemoryStore:
+    """Games live only in this process; the in-memory Game is authoritative."""
+
+    # Whether snapshots and event replay are needed to survive a restart
+    local = True
+
+    def __init__(self, registry: GameRegistry):
+        self.registry = registry
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def load_game(self, game_id: str) -> Game:
+        return self.registry.get_or_create(game_id)
+
+    async def find_game(self, game_id: str) -> Optional[Game]:
+        """The game if it exists; unlike load_game, never creates one."""
+        return self.registry.get(game_id)
+
+    async def find_player(self, game_id: str, player_id: int) -> Tuple[Optional[Game], Optional[dict]]:
+        game = self.registry.get(game_id)
+        return game, game.get_player(player_id) if game else None
+
+    async def join(self, game: Game) -> Optional[dict]:
+        players = await self.join_many(game, 1)
+        return players[0] if players else None
+
+    async def join_many(self, game: Game, count: int) -> Optional[List[dict]]:
+        players = game.add_players(count)
+        if players:
+            game.start_clock(game.time_up)
+        return players
+
+    async def players_saved(self, game: Game):
+        """The players' database rows are committed; /players/ ETags must change after that, not before."""
+        game.bump()
+
+    async def configure(self, game: Game, max_players: int):
+        game.configure(max_players)
+
+    async def run(self, game: Game, player: dict) -> str:
+        return game.run(player)
+
+    async def act(self, game: Game, player: dict, action: Action) -> str:
+        return game.act(player, action)
+
+    async def move(self, game: Game, player: dict, lat: float, lon: float) -> str:
+        return game.move(player, lat, lon)
+
+    async def define_zone(self, game: Game, spec: dict):
+        game.define_zone(spec)
+
+    async def remove_zone(self, game: Game, zone_id: str):
+        game.remove_zone(zone_id)
+
+    async def time_up(self, game: Game):
+        game.time_up()
+
+    async def reset(self, game: Game):
+        game.reset()
+
+
+class _LostRace(Exception):
+    """The game ended before this step could be taken; roll the step back."""
+
+
+class PostgresStore:
+    """Games live in the game_progress and player_progress tables.
+
+    Every write is a single conditional statement (or a short transaction of
+    them), so workers never need a lock of their own. Each worker keeps its
+    games in the registry as a read cache, kept current by NOTIFY messages
+    sent in the same transaction as the write.
+    """
+
+    local = False
+
+    def __init__(self, registry: GameRegistry, engine: Optional[AsyncEngine] = None):
+        self.registry = registry
+        self._engine = engine
+        self._listener: Optional[asyncpg.Connection] = None
+        self._reconnect: Optional[asyncio.Task] = None
+        self._closing = False
+
+    @property
+    def engine(self) -> AsyncEngine:
+        return self._engine or db.async_engine
+
+    # Writes
+
+    async def join(self, game: Game) -> Optional[dict]:
+        players = await self.join_many(game, 1)
+        return players[0] if players else None
+
+    async def join_many(self, game: Game, count: int) -> Optional[List[dict]]:
+        """Reserve `count` player slots in one conditional UPDATE, or none at all."""
+        async with self.engine.begin() as conn:
+            await self._ensure_game(conn, game.id)
+            last_id = (await conn.execute(
+                update(GameProgress)
+                .where(GameProgress.game_id == game.id)
+                .where(GameProgress.game_over.is_(False))
+                .where(GameProgress.players + count <= GameProgress.max_players)
+                .values(players=GameProgress.players + count)
+                .returning(GameProgress.players)
+            )).scalar()
+            if last_id is None:
+                return None
+            players = [{"id": player_id, "steps": 0} for player_id in range(last_id - count + 1, last_id + 1)]
+            await conn.execute(
+                insert(PlayerProgress),
+                [{"game_id": game.id, "player_id": player["id"], "steps": 0} for player in players],
+            )
+            for player in players:
+                await self._notify(conn, game.id, "join", {"player": player})
+
+        for player in players:
+            game.record("join", {"player": player})
+        # Every worker that saw a join keeps the clock; only the first to run out ends the game
+        game.start_clock(lambda: self.time_up(game))
+        return [game.get_player(player["id"]) for player in players]
+
+    async def players_saved(self, game: Game):
+        # Other workers bumped their version on the join, before the rows were committed
+        async with self.engine.begin() as conn:
+            await self._notify(conn, game.id, "roster", {})
+        game.bump()
+
+    async def configure(self, game: Game, max_players: int):
+        async with self.engine.begin() as conn:
+            await self._ensure_game(conn, game.id)
+            await conn.execute(
+                update(GameProgress).where(GameProgress.game_id == game.id).values(max_players=max_players)
+            )
+            await self._notify(conn, game.id, "configure", {"max_players": max_players})
+        game.record("configure", {"max_players": max_players})
+
+    async def run(self, game: Game, player: dict) -> str:
+        return await self.act(game, player, game.rules.run)
+
+    async def act(self, game: Game, player: dict, action: Action) -> str:
+        # Cooldowns are kept per worker; a player switching workers may act early
+        if not game.game_over and not game.ready(player["id"], action):
+            return COOLDOWN
+        try:
+            async with self.engine.begin() as conn:
+                # Step only while the game is still on
+                steps = (await conn.execute(
+                    update(PlayerProgress)
+                    .where(PlayerProgress.game_id == game.id)
+                    .where(PlayerProgress.player_id == player["id"])
+                    .where(~exists().where(
+                        GameProgress.game_id == game.id, GameProgress.game_over.is_(True)
+                    ))
+                    .values(steps=PlayerProgress.steps + action.steps)
+                    .returning(PlayerProgress.steps)
+                )).scalar()
+                if steps is None:
+                    raise _LostRace()
+
+                outcome = game.rules.settle(steps)
+                won = outcome == WIN and game.wins_by_steps
+                lost = outcome == LOSE
+                if won or lost:
+                    # Exactly one claim can find the game still on
+                    claimed = (await conn.execute(
+                        update(GameProgress)
+                        .where(GameProgress.game_id == game.id)
+                        .where(GameProgress.game_over.is_(False))
+                        .values(winner=player["id"] if won else None, game_over=True)
+                        .returning(GameProgress.game_id)
+                    )).scalar()
+                    if claimed is None:
+                        raise _LostRace()
+
+                kind, changed = "run", {"player": {"id": player["id"], "steps": steps}}
+                if action.name != "run":
+                    kind, changed["action"] = "act", action.name
+                await self._notify(conn, game.id, kind, changed)
+                if won:
+                    await self._notify(conn, game.id, "win", {"winner": player["id"]})
+                elif lost:
+                    await self._notify(conn, game.id, "lose", {"player": {"id": player["id"]}})
+        except _LostRace:
+            # Another worker ended the game; make sure this cache knows who won
+            if not game.game_over:
+                state = await self.load(game.id)
+                if state is not None:
+                    game.refresh(state)
+            return GAME_OVER
+
+        game.record(kind, changed)
+        if won:
+            game.record("win", {"winner": player["id"]})
+            return WON
+        if lost:
+            game.record("lose", {"player": {"id": player["id"]}})
+            return LOST
+        return MOVED
+
+    async def move(self, game: Game, player: dict, lat: float, lon: float) -> str:
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                update(PlayerProgress)
+                .where(PlayerProgress.game_id == game.id)
+                .where(PlayerProgress.player_id == player["id"])
+                .values(lat=lat, lon=lon)
+            )
+            changed = {"player": {"id": player["id"], "lat": lat, "lon": lon}}
+            await self._notify(conn, game.id, "move", changed)
+
+            won = False
+            entered, _ = game.zones.preview(player["id"], lat, lon)
+            if entered & game.zones.winning:
+                # Same claim as a winning step: only one worker finds the game still on
+                claimed = (await conn.execute(
+                    update(GameProgress)
+                    .where(GameProgress.game_id == game.id)
+                    .where(GameProgress.game_over.is_(False))
+                    .values(winner=player["id"], game_over=True)
+                    .returning(GameProgress.winner)
+                )).scalar()
+                if claimed is not None:
+                    await self._notify(conn, game.id, "win", {"winner": player["id"]})
+                    won = True
+
+        game.record("move", changed)
+        if won:
+            game.record("win", {"winner": player["id"]})
+            return WON
+        return MOVED
+
+    async def define_zone(self, game: Game, spec: dict):
+        async with self.engine.begin() as conn:
+            await self._ensure_game(conn, game.id)
+            await conn.execute(
+                delete(GameZone).where(GameZone.game_id == game.id).where(GameZone.zone_id == spec["id"])
+            )
+            await conn.execute(insert(GameZone).values(game_id=game.id, zone_id=spec["id"], spec=spec))
+            await self._notify(conn, game.id, "zone", {"zone": spec})
+        game.record("zone", {"zone": spec})
+
+    async def remove_zone(self, game: Game, zone_id: str):
+        async with self.engine.begin() as conn:
+            await conn.execute(delete(GameZone).where(GameZone.game_id == game.id).where(GameZone.zone_id == zone_id))
+            await self._notify(conn, game.id, "unzone", {"zone_id": zone_id})
+        game.record("unzone", {"zone_id": zone_id})
+
+    async def time_up(self, game: Game):
+        async with self.engine.begin() as conn:
+            ended = (await conn.execute(
+                update(GameProgress)
+                .where(GameProgress.game_id == game.id)
+                .where(GameProgress.game_over.is_(False))
+                .values(game_over=True)
+                .returning(GameProgress.game_id)
+            )).scalar()
+            if ended is not None:
+                await self._notify(conn, game.id, "lose", {"player": None})
+        if ended is not None:
+            game.record("lose", {"player": None})
+
+    async def reset(self, game: Game):
+        async with self.engine.begin() as conn:
+            await conn.execute(delete(PlayerProgress).where(PlayerProgress.game_id == game.id))
+            await conn.execute(
+                update(GameProgress)
+                .where(GameProgress.game_id == game.id)
+                .values(players=0, winner=None, game_over=False)
+            )
+            await self._notify(conn, game.id, "reset", {})
+        game.record("reset", {})
+
+    async def _ensure_game(self, conn: AsyncConnection, game_id: str):
+        dialect = postgresql if conn.dialect.name == "postgresql" else sqlite
+        await conn.execute(
+            dialect.insert(GameProgress)
+            .values(game_id=game_id, players=0, max_players=DEFAULT_MAX_PLAYERS, game_over=False)
+            .on_conflict_do_nothing()
+        )
+
+    async def _notify(self, conn: AsyncConnection, game_id: str, kind: str, data: dict):
+        # Delivered to the other workers when the transaction commits
+        if conn.dialect.name != "postgresql":
+            return
+        payload = json.dumps({"origin": WORKER_ID, "game_id": game_id, "kind": kind, "data": data})
+        await conn.execute(select(func.pg_notify(CHANNEL, payload)))
+
+    # Reads
+
+    async def load(self, game_id: str) -> Optional[dict]:
+        """Current state of a game as stored, or None if it does not exist."""
+        async with self.engine.connect() as conn:
+            row = (await conn.execute(
+                select(GameProgress.winner, GameProgress.game_over, GameProgress.max_players)
+                .where(GameProgress.game_id == game_id)
+            )).first()
+            if row is None:
+                return None
+            players = (await conn.execute(
+                select(PlayerProgress.player_id, PlayerProgress.steps, PlayerProgress.lat, PlayerProgress.lon)
+                .where(PlayerProgress.game_id == game_id)
+                .order_by(PlayerProgress.player_id)
+            )).all()
+            zones = (await conn.execute(
+                select(GameZone.spec).where(GameZone.game_id == game_id).order_by(GameZone.zone_id)
+            )).scalars().all()
+        return {
+            "winner": row.winner,
+            "game_over": row.game_over,
+            "max_players": row.max_players,
+            "zones": list(zones),
+            "players": [player_state(*row) for row in players],
+        }
+
+    async def load_game(self, game_id: str) -> Game:
+        game = self.registry.get(game_id)
+        if game is None:
+            game = self.registry.get_or_create(game_id)
+            state = await self.load(game_id)
+            if state is not None:
+                game.refresh(state)
+        return game
+
+    async def find_game(self, game_id: str) -> Optional[Game]:
+        game = self.registry.get(game_id)
+        if game is None:
+            # Possibly created through another worker
+            state = await self.load(game_id)
+            if state is None:
+                return None
+            game = self.registry.get_or_create(game_id)
+            game.refresh(state)
+        return game
+
+    async def find_player(self, game_id: str, player_id: int) -> Tuple[Optional[Game], Optional[dict]]:
+        game = self.registry.get(game_id)
+        player = game.get_player(player_id) if game else None
+        if player is None:
+            # Possibly created through another worker; fill the local cache
+            state = await self.load(game_id)
+            # Refreshing resyncs every page on this worker; only worth it if the player turned up
+            if state is None or not any(row["id"] == player_id for row in state["players"]):
+                return game, None
+            game = self.registry.get_or_create(game_id)
+            game.refresh(state)
+            player = game.get_player(player_id)
+        return game, player
+
+    # Cache invalidation
+
+    async def start(self):
+        if self.engine.dialect.name != "postgresql":
+            logger.warning("Shared state needs PostgreSQL; other workers will not see changes")
+            return
+        await self._listen()
+
+    async def _listen(self):
+        url = self.engine.url.set(drivername="postgresql")
+        self._listener = await asyncpg.connect(url.render_as_string(hide_password=False))
+        self._listener.add_termination_listener(self._on_terminated)
+        await self._listener.add_listener(CHANNEL, self._on_notify)
+        logger.info(f"Listening for game changes on {CHANNEL}")
+
+    def _on_notify(self, connection, pid, channel, payload):
+        message = json.loads(payload)
+        if message["origin"] == WORKER_ID:
+            return
+        game = self.registry.get(message["game_id"])
+        if game is not None:
+            game.record(message["kind"], message["data"], log=False)
+
+    def _on_terminated(self, connection):
+        if not self._closing:
+            logger.warning("Lost the game change listener, reconnecting")
+            self._reconnect = asyncio.create_task(self._relisten())
+
+    async def _relisten(self):
+        while not self._closing:
+            try:
+                await self._listen()
+            except Exception as e:
+                logger.warning(f"Could not listen for game changes: {e}")
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+            # Changes made while disconnected were missed; reload every cached game
+            for game in self.registry:
+                state = await self.load(game.id)
+                if state is not None:
+                    game.refresh(state)
+            return
+
+    async def close(self):
+        self._closing = True
+        if self._reconnect is not None:
+            self._reconnect.cancel()
+        if self._listener is not None:
+            await self._listener.close()
+            self._listener = None
+
+
+def player_state(player_id: int, steps: int, lat: Optional[float], lon: Optional[float]) -> dict:
+    state = {"id": player_id, "steps": steps}
+    if lat is not None:
+        state.update(lat=lat, lon=lon)
+    return state
+
+
+def create_store(registry: GameRegistry, kind: str = STATE_STORE):
+    if kind == "postgres":
+        return PostgresStore(registry)
+    if kind != "memory":
+        raise ValueError(f"Unknown state store: {kind}")
+    return MemoryStore(registry)
@@ -0,0 +1,215 @@
+from typing import Callable, Dict, List, Optional, Set
+import asyncio
+import logging
+import math
+import os
+import time
+
+# Setup logging
+logger = logging.getLogger(__name__)
+
+# Resolution of the timer wheel; timers fire up to one tick late, never early
+TIMER_TICK_MS = float(os.getenv("ARSE_TIMER_TICK_MS", "10"))
+
+# Each level has 2**SLOT_BITS slots; four levels of 256 cover 2**32 ticks (about 500 days at 10 ms)
+SLOT_BITS = 8
+SLOTS = 1 << SLOT_BITS
+MASK = SLOTS - 1
+LEVELS = 4
+
+
+class Timer:
+    """Handle of a scheduled callback; cancel it with `cancel()`."""
+
+    __slots__ = ("deadline", "callback", "args", "_wheel", "_slot")
+
+    def __init__(self, wheel: "TimerWheel", deadline: int, callback: Callable, args: tuple):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self._wheel = wheel
+        # The slot holding this timer, or None once it fired or was cancelled
+        self._slot: Optional[Dict["Timer", None]] = None
+
+    @property
+    def pending(self) -> bool:
+        return self._slot is not None
+
+    def cancel(self) -> bool:
+        """Unschedule the timer. Returns False if it already fired or was cancelled."""
+        if self._slot is None:
+            return False
+        del self._slot[self]
+        self._slot = None
+        self._wheel._count -= 1
+        return True
+
+
+class TimerWheel:
+    """Hierarchical timing wheel: every timer in the process, driven by one task.
+
+    Level 0 has a slot per tick for the next 256 ticks; each level above
+    covers 256 times the span of the one below, with a slot per span of the
+    level below. Scheduling puts a timer in one slot and cancelling removes
+    it from that slot, both O(1). When level 0 wraps around, the next slot
+    of level 1 is spread over level 0 (and so on up), so each timer moves at
+    most once per level before it fires. Nothing sleeps per timer: one
+    driver task sleeps until the next non-empty slot, and while no timer is
+    pending it does not wake at all.
+
+    Callbacks run on the event loop and must not block. A callback that
+    returns a coroutine has it run as a task.
+    """
+
+    def __init__(self, tick: float = TIMER_TICK_MS / 1000, clock: Callable[[], float] = time.monotonic):
+        self.tick = tick
+        self._clock = clock
+        self._origin = clock()
+        # Next tick to process
+        self._current = 0
+        self._levels: List[List[Dict[Timer, None]]] = [[{} for _ in range(SLOTS)] for _ in range(LEVELS)]
+        # Timers beyond the top level's span, spread out again each time it wraps
+        self._overflow: Dict[Timer, None] = {}
+        self._count = 0
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        # Tick the driver is sleeping until, so only sooner timers need to wake it
+        self._sleeping_until = 0
+        # Coroutines started by callbacks, kept alive until they finish
+        self._running: Set[asyncio.Task] = set()
+        self.fired = 0
+
+    def schedule(self, delay: float, callback: Callable, *args) -> Timer:
+        """Call `callback(*args)` once `delay` seconds have passed."""
+        now = self._clock()
+        if not self._count:
+            # Nobody advanced the empty wheel while it was idle; catch up without walking the ticks
+            self._current = max(self._current, math.floor((now - self._origin) / self.tick) + 1)
+        deadline = math.ceil((now + delay - self._origin) / self.tick)
+        timer = Timer(self, deadline, callback, args)
+        self._place(timer)
+        self._count += 1
+        if self._wakeup is not None and (self._count == 1 or deadline < self._sleeping_until):
+            self._wakeup.set()
+        return timer
+
+    def _place(self, timer: Timer):
+        current = self._current
+        deadline = timer.deadline if timer.deadline > current else current
+        # The level whose slot bits hold the highest bit where the deadline differs from now
+        level = ((deadline ^ current).bit_length() - 1) // SLOT_BITS if deadline != current else 0
+        if level < LEVELS:
+            slot = self._levels[level][(deadline >> (SLOT_BITS * level)) & MASK]
+        else:
+            slot = self._overflow
+        slot[timer] = None
+        timer._slot = slot
+
+    def _cascade(self, tick: int):
+        # Highest level first, so its timers can fall through the levels below in this same tick
+        levels = 1
+        while levels < LEVELS and (tick >> (SLOT_BITS * levels)) & MASK == 0:
+            levels += 1
+        if levels == LEVELS:
+            self._respread(self._overflow)
+        for level in range(min(levels, LEVELS - 1), 0, -1):
+            self._respread(self._levels[level][(tick >> (SLOT_BITS * level)) & MASK])
+
+    def _respread(self, slot: Dict[Timer, None]):
+        timers = list(slot)
+        slot.clear()
+        for timer in timers:
+            self._place(timer)
+
+    def _next_due(self) -> int:
+        """First tick from the current one whose slot holds timers, on any level.
+
+        A non-empty slot of a higher level is always later than any on a
+        lower level, so the first one found is the answer.
+        """
+        tick = self._current
+        for level in range(LEVELS):
+            shift = SLOT_BITS * level
+            slots = self._levels[level]
+            for index in range((tick >> shift) & MASK, SLOTS):
+                if slots[index]:
+                    return max(tick, (tick >> (shift + SLOT_BITS) << (shift + SLOT_BITS)) | (index << shift))
+        # Only overflow timers are left; they are spread out when the top level wraps
+        return ((tick >> (SLOT_BITS * LEVELS)) + 1) << (SLOT_BITS * LEVELS)
+
+    def advance(self, now: Optional[float] = None) -> int:
+        """Fire every timer that is due by `now` (default: the clock). Returns how many fired."""
+        target = math.floor(((self._clock() if now is None else now) - self._origin) / self.tick)
+        fired = 0
+        # Jumps straight from one non-empty slot to the next, so idle stretches cost nothing
+        while self._count:
+            tick = self._next_due()
+            if tick > target:
+                break
+            self._current = tick
+            if tick & MASK == 0 and tick:
+                self._cascade(tick)
+            slot = self._levels[0][tick & MASK]
+            # Timers scheduled by these callbacks land in later ticks
+            self._current = tick + 1
+            if slot:
+                timers = list(slot)
+                slot.clear()
+                for timer in timers:
+                    timer._slot = None
+                self._count -= len(timers)
+                for timer in timers:
+                    self._fire(timer)
+                fired += len(timers)
+        if not self._count:
+            # Every slot is empty, so the clock can move on without walking the ticks
+            self._current = max(self._current, target + 1)
+        self.fired += fired
+        return fired
+
+    def _fire(self, timer: Timer):
+        try:
+            result = timer.callback(*timer.args)
+            if asyncio.iscoroutine(result):
+                task = asyncio.ensure_future(result)
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+        except Exception as e:
+            logger.error(f"Timer callback {timer.callback!r} failed: {e}")
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            if not self._count:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            # Sleep until the next slot with timers, but wake for sooner ones scheduled meanwhile
+            self._sleeping_until = self._next_due()
+            due = self._origin + self._sleeping_until * self.tick + 1e-6
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), max(due - self._clock(), 0))
+            except asyncio.TimeoutError:
+                pass
+            self._sleeping_until = 0
+            self.advance()
+
+    async def close(self):
+        """Stop the driver; pending timers never fire."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def __len__(self) -> int:
+        return self._count
+
+
+# The process's timers; started and stopped by the app's lifespan
+wheel = TimerWheel()
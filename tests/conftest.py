@@ -9,7 +9,6 @@ from fastapi.testclient import TestClient
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.pool import StaticPool
-from fastapi.staticfiles import StaticFiles
 from sqlalchemy.orm import sessionmaker
 
 # Set TEST_MODE environment variable
@@ -25,6 +24,7 @@ if src_path not in sys.path:
 # Now import from arse after setting up the environment
 from arse.models import Base
 from arse.db import reset_game
+from arse.assets import StaticAssets
 
 # Fixture for templates
 @pytest.fixture(scope="session")
@@ -45,12 +45,13 @@ def templates_dir():
         raise RuntimeError(f"Test templates directory not found: {templates_source}")
     
     # Copy template files
-    (temp_dir / "admin.html").write_text((templates_source / "admin.html").read_text())
-    (temp_dir / "player.html").write_text((templates_source / "player.html").read_text())
+    for template in templates_source.glob("*.html"):
+        (temp_dir / template.name).write_text(template.read_text())
     
     # Copy static files
     (static_dir / "htmx.min.js").write_text((templates_source / "static" / "htmx.min.js").read_text())
     (static_dir / "simple.min.css").write_text((templates_source / "static" / "simple.min.css").read_text())
+    (static_dir / "player.js").write_text((templates_source / "static" / "player.js").read_text())
     
     yield temp_dir
     
@@ -72,10 +73,11 @@ def app_with_templates(templates_dir):
     # Override app's templates
     import arse.api
     arse.api.templates = templates
-    arse.api.static_dir = str(static_dir)
+    arse.api.static_dir = static_dir
     
-    # Re-mount static files
-    app.mount("/static", StaticFiles(directory=str(static_dir)), name="static")
+    # Serve the test static files
+    arse.api.assets = StaticAssets(static_dir)
+    templates.env.globals["static_url"] = lambda name: arse.api.assets.url(name)
     
     # Ensure database is created for tests
     asyncio.run(arse.db.create_db_and_tables())
@@ -117,11 +119,7 @@ def reset_db_before_test():
     
     # Reset game state in the API
     import arse.api
-    arse.api.game_state = {
-        "players": [],
-        "winner": None,
-        "game_over": False
-    }
+    arse.api.games.clear()
 
 # Override the database connection for tests
 @pytest.fixture(scope="session", autouse=True)
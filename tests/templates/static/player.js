@@ -0,0 +1,41 @@
+// Keeps a player page current from its game's event stream.
+// The end of the game is applied from the event itself, so a finished game does not send every
+// player back for a full page; a reset or missed events refetch just the status block.
+(() => {
+    const script = document.currentScript;
+    const game = script.dataset.game;
+    const me = Number(script.dataset.player);
+    // Only the events this page acts on, so taps and moves elsewhere never fill its queue
+    const events = new EventSource(`/game/${game}/events?events=win,lose,reset`);
+
+    function gameOver(text, status) {
+        const form = document.getElementById("run-form");
+        // Already shown, e.g. by the response to this player's own winning tap
+        if (!form || form.classList.contains("game-over")) return;
+        const over = document.createElement("div");
+        over.id = "run-form";
+        over.className = "game-over";
+        over.append(document.createElement("p"));
+        over.firstChild.textContent = `Game Over - ${text}`;
+        form.replaceWith(over);
+        if (status) {
+            const line = document.createElement("p");
+            line.textContent = status;
+            document.getElementById("player-status").append(line);
+        }
+    }
+
+    events.addEventListener("win", (event) => {
+        const winner = JSON.parse(event.data).winner;
+        gameOver(`Player ${winner} won!`, winner === me ? "You won!" : `Player ${winner} won!`);
+    });
+    events.addEventListener("lose", () => gameOver("nobody won."));
+    for (const name of ["reset", "resync"]) {
+        events.addEventListener(name, () => htmx.ajax("GET", `/game/${game}/player/${me}/status`,
+                                                      {target: "#player-status", swap: "outerHTML"}));
+    }
+    // A reset may have removed this player; show that instead of keeping the old status
+    document.body.addEventListener("htmx:beforeSwap", (event) => {
+        if (event.detail.xhr.status === 404) event.detail.shouldSwap = true;
+    });
+})();
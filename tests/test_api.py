@@ -1,3 +1,4 @@
+import json
 import pytest
 import asyncio
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -46,4 +47,176 @@ def test_admin_page(client):
 def test_create_player(client):
     response = client.post("/create-player")
     assert response.status_code == 200
-    assert "/player/1" in response.text 
\ No newline at end of file
+    assert "/player/1" in response.text
+
+def create_players(client, count):
+    # Two players per game, so spread them over several scenes
+    for i in range(count):
+        client.post(f"/game/scene-{i // 2}/create-player")
+
+def test_players_keyset_pagination(client):
+    create_players(client, 5)
+
+    names = []
+    url = "/players/?limit=2"
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page) <= 2
+        names += [(player["game_id"], player["name"]) for player in page]
+        url = response.links.get("next", {}).get("url")
+
+    assert len(names) == 5
+    assert names[:2] == [("scene-0", "Player 1"), ("scene-0", "Player 2")]
+
+def test_players_after_cursor(client):
+    create_players(client, 3)
+    players = client.get("/players/").json()
+
+    response = client.get("/players/", params={"after": players[0]["id"]})
+    assert [player["id"] for player in response.json()] == [player["id"] for player in players[1:]]
+    assert "link" not in response.headers
+
+def test_players_ndjson_export(client):
+    create_players(client, 4)
+
+    response = client.get("/players/", params={"format": "ndjson", "game_id": "scene-1"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["name"] for row in rows] == ["Player 1", "Player 2"]
+    assert all(row["game_id"] == "scene-1" for row in rows)
+
+def test_players_rejects_bad_limit(client):
+    assert client.get("/players/", params={"limit": 0}).status_code == 422
+
+def test_bulk_create_players(client):
+    client.post("/game/checkin/max-players", data={"max_players": 50})
+
+    response = client.post("/game/checkin/players/bulk", json={"count": 40})
+    assert response.status_code == 200
+    links = response.json()
+    assert [link["url"] for link in links[:2]] == ["/game/checkin/player/1", "/game/checkin/player/2"]
+    assert len({link["id"] for link in links}) == 40
+
+    response = client.post("/game/checkin/players/bulk", json={"names": ["Ada", "Grace"]})
+    assert [(link["player_id"], link["name"]) for link in response.json()] == [(41, "Ada"), (42, "Grace")]
+    assert client.get(links[-1]["url"]).status_code == 200
+
+    players = client.get("/players/", params={"game_id": "checkin", "limit": 1000}).json()
+    assert len(players) == 42
+
+def test_bulk_create_rejects_overfilling(client):
+    client.post("/game/checkin/players/bulk", json={"count": 1})
+
+    response = client.post("/game/checkin/players/bulk", json={"count": 2})
+    assert response.status_code == 400
+    assert "1 of 2" in response.json()["detail"]
+    assert len(client.get("/players/", params={"game_id": "checkin"}).json()) == 1
+
+    assert client.post("/game/checkin/players/bulk", json={}).status_code == 422
+    assert client.post("/game/checkin/players/bulk", json={"count": 1001}).status_code == 422
+
+def test_max_players_applies_to_single_joins(client):
+    response = client.post("/game/small/max-players", data={"max_players": 1})
+    assert response.json() == {"game_id": "small", "max_players": 1, "open_slots": 1}
+
+    assert client.post("/game/small/create-player").status_code == 200
+    assert client.post("/game/small/create-player").status_code == 400
+
+def test_positions_and_proximity(client):
+    client.post("/game/park/max-players", data={"max_players": 3})
+    client.post("/game/park/players/bulk", json={"count": 3})
+    positions = {1: (52.5200, 13.4050), 2: (52.5201, 13.4050), 3: (52.5300, 13.4050)}
+    for player_id, (lat, lon) in positions.items():
+        response = client.post(f"/game/park/player/{player_id}/position", json={"lat": lat, "lon": lon})
+        assert response.status_code == 200
+
+    response = client.get("/game/park/players/within", params={"lat": 52.52, "lon": 13.405, "radius": 50})
+    assert [player["id"] for player in response.json()] == [1, 2]
+    assert 10 < response.json()[1]["distance"] < 12
+
+    response = client.get("/game/park/players/nearest", params={"lat": 52.53, "lon": 13.405, "k": 2})
+    assert [player["id"] for player in response.json()] == [3, 2]
+
+    assert client.post("/game/park/player/9/position", json={"lat": 0, "lon": 0}).status_code == 404
+    assert client.post("/game/park/player/1/position", json={"lat": 91, "lon": 0}).status_code == 422
+
+def test_zones_api(client):
+    client.post("/game/hunt/create-player")
+    castle = {
+        "id": "castle",
+        "kind": "polygon",
+        "points": [[52.5220, 13.4040], [52.5220, 13.4060], [52.5230, 13.4060], [52.5230, 13.4040]],
+        "wins": True,
+    }
+    assert client.post("/game/hunt/zones", json=castle).status_code == 200
+    assert client.post("/game/hunt/zones", json={"id": "bad", "kind": "circle", "lat": 1, "lon": 1}).status_code == 422
+    assert [zone["id"] for zone in client.get("/game/hunt/zones").json()] == ["castle"]
+
+    response = client.post("/game/hunt/player/1/position", json={"lat": 52.5225, "lon": 13.405})
+    assert response.json()["zones"] == ["castle"]
+    assert response.json()["won"]
+    assert client.get("/game/hunt/zones/counts").json() == {"castle": 1}
+    assert "Player 1 won" in client.get("/game/hunt/admin").text
+
+    assert client.delete("/game/hunt/zones/castle").status_code == 200
+    assert client.delete("/game/hunt/zones/castle").status_code == 404
+
+def test_ingest_batch(client):
+    from arse.ingest import POSITION, RUN, encode_batch
+    client.post("/game/batch/create-player")
+    client.post("/game/batch/create-player")
+
+    body = encode_batch([
+        (POSITION, 1, 52.52, 13.405),
+        (RUN, 1, 0, 0),
+        (POSITION, 2, 52.5201, 13.405),
+        (RUN, 9, 0, 0),
+    ])
+    response = client.post("/game/batch/ingest", content=body)
+    assert response.status_code == 200
+    assert response.json()["applied"] == 3
+    assert response.json()["skipped"] == 1
+
+    nearby = client.get("/game/batch/players/within", params={"lat": 52.52, "lon": 13.405, "radius": 50}).json()
+    assert [(player["id"], player["steps"]) for player in nearby] == [(1, 1), (2, 0)]
+
+    assert client.post("/game/batch/ingest", content=b"garbage").status_code == 400
+
+    # Runs after the game ended are counted apart from the applied ones
+    response = client.post("/game/batch/ingest", content=encode_batch([(RUN, 1, 0, 0)] * 4))
+    assert response.json()["applied"] == 2
+    assert response.json()["game_over"] == 2
+
+def test_ingest_rejects_oversized_bodies(client):
+    from arse.ingest import MAX_BATCH_BYTES
+    client.post("/game/big/create-player")
+    body = b"ARSE" + bytes(MAX_BATCH_BYTES)
+    assert client.post("/game/big/ingest", content=body).status_code == 413
+
+    def chunks():
+        # No Content-Length: the limit applies while reading
+        yield body[:1000]
+        yield body[1000:]
+
+    assert client.post("/game/big/ingest", content=chunks()).status_code == 413
+
+def test_read_only_routes_do_not_create_games(client):
+    from arse.api import games
+    for path in (
+        "/game/probe/leaderboard",
+        "/game/probe/rules",
+        "/game/probe/zones",
+        "/game/probe/zones/counts",
+        "/game/probe/players/within?lat=0&lon=0&radius=10",
+        "/game/probe/players/nearest?lat=0&lon=0",
+    ):
+        assert client.get(path).status_code == 404, path
+    assert client.delete("/game/probe/zones/castle").status_code == 404
+
+    response = client.get("/game/probe/admin")
+    assert response.status_code == 200
+    assert "No players yet" in response.text
+    assert games.get("probe") is None
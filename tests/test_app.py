@@ -66,3 +66,77 @@ def test_running_and_winning(client):
     # Player 2 tries to run after game is over
     response = client.post("/player/2/run")
     assert "Game Over - Player 1 won!" in response.text
+
+def test_games_are_isolated(client):
+    client.post("/game/scene-a/create-player")
+    client.post("/game/scene-b/create-player")
+
+    # Player 1 in scene A wins; scene B is untouched
+    for _ in range(3):
+        response = client.post("/game/scene-a/player/1/run")
+    assert "You won!" in response.text
+
+    response = client.post("/game/scene-b/player/1/run")
+    assert "Steps: 1" in response.text
+
+    # Resetting scene A leaves scene B's players in place
+    client.post("/game/scene-a/reset-game")
+    assert client.get("/game/scene-a/player/1").status_code == 404
+    assert client.get("/game/scene-b/player/1").status_code == 200
+
+    players = client.get("/players/", params={"game_id": "scene-b"}).json()
+    assert [p["name"] for p in players] == ["Player 1"]
+
+def test_unknown_game_returns_404(client):
+    response = client.post("/game/nope/player/1/run")
+    assert response.status_code == 404
+
+def test_htmx_run_returns_fragment(client):
+    headers = {"HX-Request": "true"}
+    client.post("/create-player")
+    client.post("/create-player")
+
+    response = client.post("/player/1/run", headers=headers)
+    assert response.status_code == 200
+    assert 'id="player-status"' in response.text
+    assert "Steps: 1" in response.text
+    assert "<html" not in response.text
+    assert "run-form" not in response.text
+
+    # The winning tap also swaps the run form out
+    client.post("/player/1/run", headers=headers)
+    response = client.post("/player/1/run", headers=headers)
+    assert "You won!" in response.text
+    assert 'hx-swap-oob="true"' in response.text
+
+    response = client.post("/player/2/run", headers=headers)
+    assert "Player 1 won!" in response.text
+
+def test_player_status_fragment(client):
+    client.post("/create-player")
+    page = client.get("/player/1").text
+    assert "location.reload" not in page
+    assert 'data-player="1"' in page
+
+    response = client.get("/game/default/player/1/status")
+    assert "Steps: 0" in response.text
+    assert 'id="run-form"' in response.text and 'hx-swap-oob="true"' in response.text
+
+    for _ in range(3):
+        client.post("/player/1/run")
+    response = client.get("/game/default/player/1/status")
+    assert "You won!" in response.text
+    assert 'class="game-over"' in response.text
+
+    client.post("/reset-game")
+    assert client.get("/game/default/player/1/status").status_code == 404
+
+def test_htmx_create_player_appends_link(client):
+    response = client.post("/create-player", headers={"HX-Request": "true"})
+    assert response.status_code == 200
+    assert 'hx-swap-oob="beforeend:#player-links"' in response.text
+    assert 'href="/game/default/player/1"' in response.text
+
+    # The full admin page lists the same link
+    response = client.get("/admin")
+    assert 'href="/game/default/player/1"' in response.text
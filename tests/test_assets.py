@@ -0,0 +1,67 @@
+import gzip
+
+from arse.assets import IMMUTABLE, StaticAssets, negotiate
+
+
+def test_negotiate_prefers_accepted_encodings():
+    assert negotiate("gzip, deflate, br", {"br", "gzip"}) == "br"
+    assert negotiate("gzip, br;q=0.5", {"br", "gzip"}) == "gzip"
+    assert negotiate("br;q=0, gzip", {"br", "gzip"}) == "gzip"
+    assert negotiate("gzip", {"br"}) is None
+    assert negotiate("", {"gzip"}) is None
+    assert negotiate("*", {"gzip"}) == "gzip"
+
+def test_hashed_url_follows_content(tmp_path):
+    (tmp_path / "app.js").write_text("let a = 1;")
+    assets = StaticAssets(tmp_path)
+    first = assets.url("app.js")
+    assert first.startswith("/static/app.") and first.endswith(".js")
+    assert assets.url("missing.css") == "/static/missing.css"
+
+    (tmp_path / "app.js").write_text("let a = 2;")
+    assets.load()
+    assert assets.url("app.js") != first
+
+def test_static_files_are_served_hashed_and_compressed(client, tmp_path, monkeypatch):
+    import arse.api
+
+    (tmp_path / "app.js").write_text("console.log('tap');\n" * 100)
+    monkeypatch.setattr(arse.api, "assets", StaticAssets(tmp_path))
+    url = arse.api.assets.url("app.js")
+
+    plain = client.get(url, headers={"Accept-Encoding": "identity"})
+    assert plain.status_code == 200
+    assert plain.headers["cache-control"] == IMMUTABLE
+    assert plain.headers["vary"] == "Accept-Encoding"
+    assert "content-encoding" not in plain.headers
+
+    compressed = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert int(compressed.headers["content-length"]) < int(plain.headers["content-length"])
+    assert compressed.content == plain.content  # Decoded by the client
+    assert compressed.headers["etag"] != plain.headers["etag"]
+
+    revalidated = client.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": compressed.headers["etag"]})
+    assert revalidated.status_code == 304
+
+def test_unhashed_names_must_revalidate(client):
+    response = client.get("/static/simple.min.css")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "no-cache"
+    assert client.get("/static/nope.css").status_code == 404
+
+def test_pages_link_hashed_assets(client):
+    from arse.api import assets
+
+    response = client.get("/admin")
+    assert assets.url("htmx.min.js") != "/static/htmx.min.js"
+    assert assets.url("htmx.min.js") in response.text
+
+def test_prebuilt_gzip_is_used(tmp_path):
+    body = "body { color: red; }\n" * 50
+    (tmp_path / "site.css").write_text(body)
+    prebuilt = gzip.compress(body.encode(), mtime=0)
+    (tmp_path / "site.css.gz").write_bytes(prebuilt)
+    assets = StaticAssets(tmp_path)
+    assert len(assets) == 1
+    assert assets._by_name["site.css"].encoded["gzip"] == prebuilt
@@ -0,0 +1,76 @@
+import json
+import pytest
+
+from arse.broadcast import SUBSCRIBER_QUEUE_SIZE, Broadcaster, encode_event, stream
+from arse.game import Game
+
+
+def parse(payload: bytes) -> dict:
+    fields = dict(line.split(": ", 1) for line in payload.decode().strip().split("\n"))
+    fields["data"] = json.loads(fields["data"])
+    return fields
+
+def test_encode_event():
+    event = parse(encode_event("step", {"steps": 2}, 7))
+    assert event == {"event": "step", "id": "7", "data": {"steps": 2}}
+
+@pytest.mark.asyncio
+async def test_publish_fans_out_one_payload():
+    broadcaster = Broadcaster("scene-a")
+    first = broadcaster.subscribe()
+    second = broadcaster.subscribe()
+
+    broadcaster.publish("step", {"steps": 1}, 1)
+
+    sent = first.queue.get_nowait()
+    assert sent is second.queue.get_nowait()
+    assert parse(sent)["event"] == "step"
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_gets_resync():
+    broadcaster = Broadcaster("scene-a")
+    subscriber = broadcaster.subscribe()
+
+    for version in range(subscriber.queue.maxsize + 1):
+        broadcaster.publish("step", {"steps": version}, version)
+
+    # The backlog is replaced by a single resync marker
+    assert subscriber.queue.qsize() == 1
+    assert parse(subscriber.queue.get_nowait())["event"] == "resync"
+    assert subscriber.lagged == 1
+
+def test_filtered_subscriber_skips_other_kinds():
+    broadcaster = Broadcaster()
+    subscriber = broadcaster.subscribe({"win", "reset"})
+    for step in range(SUBSCRIBER_QUEUE_SIZE * 2):
+        broadcaster.publish("run", {"steps": step}, step)
+    broadcaster.publish("win", {"player": 1}, 99)
+
+    assert subscriber.queue.qsize() == 1
+    assert parse(subscriber.queue.get_nowait())["event"] == "win"
+    assert subscriber.lagged == 0
+
+@pytest.mark.asyncio
+async def test_stream_delivers_game_events():
+    game = Game("scene-a")
+
+    async def connected():
+        return False
+
+    events = stream(game.events, lambda: encode_event("snapshot", game.snapshot()), connected)
+    assert parse(await anext(events))["event"] == "snapshot"
+    assert len(game.events) == 1
+
+    player = game.add_player()
+    game.run(player)
+    assert parse(await anext(events))["event"] == "join"
+    step = parse(await anext(events))
+    assert step["event"] == "run"
+    assert step["data"]["player"]["steps"] == 1
+
+    await events.aclose()
+    assert len(game.events) == 0
+
+def test_events_for_unknown_game(client):
+    response = client.get("/game/nope/events")
+    assert response.status_code == 404
@@ -0,0 +1,155 @@
+import pytest
+
+from arse.api import open_bytecode_cache, warm_templates
+from arse.cache import RenderCache, etag_matches, make_etag
+
+
+def test_hit_and_miss_counters():
+    cache = RenderCache(maxsize=4)
+    renders = []
+
+    def render():
+        renders.append(1)
+        return "<p>page</p>"
+
+    assert cache.get_or_render(("admin.html", "a", None, 1), render) == "<p>page</p>"
+    assert cache.get_or_render(("admin.html", "a", None, 1), render) == "<p>page</p>"
+    assert len(renders) == 1
+    assert cache.stats() == {"size": 1, "maxsize": 4, "hits": 1, "misses": 1}
+
+def test_new_version_misses():
+    cache = RenderCache(maxsize=4)
+    cache.get_or_render(("admin.html", "a", None, 1), lambda: "old")
+    assert cache.get_or_render(("admin.html", "a", None, 2), lambda: "new") == "new"
+    assert cache.misses == 2
+
+def test_lru_eviction():
+    cache = RenderCache(maxsize=2)
+    cache.get_or_render("first", lambda: "1")
+    cache.get_or_render("second", lambda: "2")
+    # Touch "first" so "second" becomes the oldest entry
+    cache.get_or_render("first", lambda: "1")
+    cache.get_or_render("third", lambda: "3")
+
+    assert len(cache) == 2
+    assert cache.get_or_render("second", lambda: "again") == "again"
+
+def test_pages_are_served_from_cache(client):
+    from arse.api import render_cache
+
+    # Creating the player renders its page once via the redirect
+    client.post("/create-player")
+    hits = render_cache.hits
+    first = client.get("/player/1")
+    second = client.get("/player/1")
+    assert first.text == second.text
+    assert render_cache.hits == hits + 2
+
+    # A step bumps the game version, so the next view is rendered fresh
+    client.post("/player/1/run")
+    misses = render_cache.misses
+    response = client.get("/player/1")
+    assert "Steps: 1" in response.text
+    assert render_cache.hits == hits + 2
+    assert render_cache.misses == misses + 1
+
+def test_cache_hits_skip_building_the_page(client, monkeypatch):
+    from arse.game import Game
+    client.post("/game/lazy/create-player")
+    calls = []
+    leaders = Game.leaders
+    monkeypatch.setattr(Game, "leaders", lambda game, k: calls.append(k) or leaders(game, k))
+
+    client.get("/game/lazy/admin")
+    client.get("/game/lazy/admin")
+    assert len(calls) == 1
+
+def test_etag_matches():
+    etag = make_etag(1, 2)
+    assert etag.startswith('"') and etag.endswith('"')
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches(make_etag(1, 3), etag)
+
+def test_conditional_get(client):
+    client.post("/create-player")
+
+    for url in ["/admin", "/player/1", "/players/"]:
+        response = client.get(url)
+        etag = response.headers["ETag"]
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 304, url
+        assert response.content == b""
+        assert response.headers["ETag"] == etag
+
+def test_state_change_refreshes_etag(client):
+    client.post("/create-player")
+    etag = client.get("/player/1").headers["ETag"]
+    players_etag = client.get("/players/").headers["ETag"]
+
+    client.post("/player/1/run")
+    response = client.get("/player/1", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert "Steps: 1" in response.text
+
+    client.post("/create-player")
+    response = client.get("/players/", headers={"If-None-Match": players_etag})
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+
+def test_players_etag_changes_after_the_rows_are_committed(client, monkeypatch):
+    import arse.api
+    seen = []
+    players_saved = arse.api.store.players_saved
+
+    async def capture(game):
+        # What a concurrent GET /players/ would have tagged the still-missing rows with
+        seen.append(arse.api.game_etag(game))
+        await players_saved(game)
+
+    monkeypatch.setattr(arse.api.store, "players_saved", capture)
+    client.post("/game/roster/create-player")
+    response = client.get("/players/?game_id=roster", headers={"If-None-Match": seen[0]})
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+
+def test_players_etag_sees_other_workers(client, monkeypatch):
+    import asyncio
+    import arse.api
+    import arse.db
+    from arse.game import GameRegistry
+    from arse.models import Player
+    from arse.store import PostgresStore
+    monkeypatch.setattr(arse.api, "store", PostgresStore(arse.api.games))
+    other = PostgresStore(GameRegistry())
+
+    async def join_elsewhere(game_id):
+        state = await other.join(await other.load_game(game_id))
+        async with arse.db.async_session() as session:
+            session.add(Player(game_id=game_id, name=f"Player {state['id']}"))
+            await session.commit()
+
+    # Games this worker has not seen yet; once loaded, NOTIFY keeps them current
+    for url, game_id in (("/players/", "elsewhere"), ("/players/?game_id=later", "later")):
+        etag = client.get(url).headers["ETag"]
+        asyncio.run(join_elsewhere(game_id))
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 200, url
+        assert len(response.json()) >= 1
+
+def test_bytecode_cache_directory_is_private(tmp_path):
+    private = tmp_path / "jinja"
+    open_bytecode_cache(str(private))
+    assert private.stat().st_mode & 0o777 == 0o700
+
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    shared.chmod(0o777)
+    with pytest.raises(RuntimeError):
+        open_bytecode_cache(str(shared))
+
+def test_warm_templates(app_with_templates):
+    assert warm_templates() >= 2
@@ -0,0 +1,29 @@
+import asyncio
+import random
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+import arse.api
+from arse.game import WINNING_STEPS
+
+TAPS = 2000
+
+
+@pytest.mark.asyncio
+async def test_concurrent_run_requests(app_with_templates):
+    transport = ASGITransport(app=app_with_templates)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.post("/game/race/create-player")
+        await client.post("/game/race/create-player")
+
+        urls = [f"/game/race/player/{random.choice([1, 2])}/run" for _ in range(TAPS)]
+        responses = await asyncio.gather(*(client.post(url) for url in urls))
+
+    assert all(response.status_code == 200 for response in responses)
+    assert sum("You won!" in response.text for response in responses) == 1
+
+    game = arse.api.games.get("race")
+    steps = sorted(player["steps"] for player in game.players.values())
+    assert steps[-1] == WINNING_STEPS
+    assert steps[0] < WINNING_STEPS
+    assert game.get_player(game.winner)["steps"] == WINNING_STEPS
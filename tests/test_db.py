@@ -127,3 +127,74 @@ async def test_reset_game(async_engine, async_session, monkeypatch):
     result = await async_session.execute(text("SELECT COUNT(*) FROM player"))
     count = result.scalar()
     assert count == 0
+
+def test_engine_options():
+    from arse.db import InstrumentedPool, engine_options
+
+    assert engine_options("sqlite+aiosqlite:///:memory:") == {"connect_args": {"check_same_thread": False}}
+    options = engine_options("postgresql+asyncpg://postgres@localhost/arse")
+    assert options["poolclass"] is InstrumentedPool
+    assert "pool_size" in options and "pool_recycle" in options
+    assert "prepared_statement_cache_size" in options["connect_args"]
+
+@pytest.mark.asyncio
+async def test_pool_instrumentation(tmp_path):
+    from arse.db import InstrumentedPool, instrument_pool, pool_stats
+
+    engine = create_async_engine(
+        f"sqlite+aiosqlite:///{tmp_path}/pool.db", poolclass=InstrumentedPool, pool_size=1, max_overflow=1
+    )
+    instrument_pool(engine)
+    checkouts = pool_stats.checkouts
+    overflow = pool_stats.overflow_checkouts
+    waits = pool_stats.wait_count
+
+    async with engine.connect() as first, engine.connect() as second:
+        await first.execute(text("SELECT 1"))
+        await second.execute(text("SELECT 1"))
+        stats = pool_stats.as_dict(engine.sync_engine.pool)
+        assert stats["checked_out"] == 2
+        assert stats["overflow"] == 1
+
+    assert pool_stats.checkouts == checkouts + 2
+    assert pool_stats.overflow_checkouts == overflow + 1
+    assert pool_stats.wait_count == waits + 2
+    await engine.dispose()
+
+def test_db_pool_endpoint(client):
+    response = client.get("/admin/db-pool")
+    assert response.status_code == 200
+    assert "wait_max_ms" in response.json()
+
+@pytest.mark.asyncio
+async def test_create_db_and_tables_only_adds_missing(async_engine, monkeypatch):
+    import arse.db
+    monkeypatch.setattr(arse.db, "async_engine", async_engine)
+    await create_db_and_tables()
+
+    async with async_engine.begin() as conn:
+        await conn.execute(text("DROP TABLE game_event"))
+        await conn.execute(text("INSERT INTO player (name) VALUES ('Kept')"))
+
+    await create_db_and_tables()
+
+    async with async_engine.begin() as conn:
+        tables = (await conn.execute(text("SELECT name FROM sqlite_master WHERE type='table'"))).scalars().all()
+        assert "game_event" in tables
+        assert (await conn.execute(text("SELECT name FROM player"))).scalar() == "Kept"
+
+@pytest.mark.asyncio
+async def test_create_db_and_tables_adds_missing_columns(async_engine, monkeypatch):
+    import arse.db
+    monkeypatch.setattr(arse.db, "async_engine", async_engine)
+    # The player table as it was before games
+    async with async_engine.begin() as conn:
+        await conn.execute(text("CREATE TABLE player (id INTEGER PRIMARY KEY, name VARCHAR, email VARCHAR)"))
+        await conn.execute(text("INSERT INTO player (name) VALUES ('Kept')"))
+
+    await create_db_and_tables()
+
+    async with async_engine.begin() as conn:
+        assert (await conn.execute(text("SELECT name, game_id FROM player"))).one() == ("Kept", "default")
+        await conn.execute(text("INSERT INTO player (name, game_id) VALUES ('New', 'scene-a')"))
+
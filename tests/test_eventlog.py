@@ -0,0 +1,101 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+import arse.db
+from arse.eventlog import EventLog
+from arse.game import GameRegistry
+from arse.models import GameEvent
+from arse.rules import Rules
+
+
+async def logged_events():
+    async with arse.db.async_session() as session:
+        result = await session.execute(select(GameEvent).order_by(GameEvent.id))
+        return result.scalars().all()
+
+@pytest.mark.asyncio
+async def test_game_actions_are_logged():
+    log = EventLog()
+    games = GameRegistry(on_event=log.append)
+    game = games.get_or_create("scene-a")
+
+    player = game.add_player()
+    for _ in range(3):
+        game.run(player)
+    game.reset()
+
+    # Nothing touches the database until a flush
+    assert log.pending == 6
+    assert await logged_events() == []
+
+    assert await log.flush() == 6
+    events = await logged_events()
+    assert [event.kind for event in events] == ["join", "run", "run", "run", "win", "reset"]
+    assert [event.player_id for event in events] == [1, 1, 1, 1, 1, None]
+    assert events[3].data == {"version": 4, "player": {"id": 1, "steps": 3}}
+    assert all(event.game_id == "scene-a" for event in events)
+
+@pytest.mark.asyncio
+async def test_lost_games_are_logged():
+    log = EventLog()
+    games = GameRegistry(on_event=log.append)
+    game = games.get_or_create("scene-a")
+    game.rules = Rules({"actions": {"run": {"steps": -1}}, "lose": {"when": "steps < 0"}})
+    game.run(game.add_player())
+
+    await log.flush()
+    events = await logged_events()
+    assert [event.kind for event in events] == ["join", "run", "lose"]
+    assert events[2].player_id == 1
+
+@pytest.mark.asyncio
+async def test_batch_size_triggers_flush():
+    log = EventLog(batch_size=3, flush_interval=60)
+    log.start()
+    for _ in range(3):
+        log.append("scene-a", "reset", {"version": 1})
+
+    for _ in range(50):
+        if log.written:
+            break
+        await asyncio.sleep(0.01)
+    assert log.written == 3
+
+    await log.close()
+
+@pytest.mark.asyncio
+async def test_close_flushes_pending_events():
+    log = EventLog(batch_size=100, flush_interval=60)
+    log.start()
+    log.append("scene-a", "reset", {"version": 1})
+
+    await log.close()
+    assert log.pending == 0
+    assert len(await logged_events()) == 1
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_events(monkeypatch):
+    log = EventLog()
+    log.append("scene-a", "reset", {"version": 1})
+
+    async def unavailable(rows):
+        raise ConnectionError("database is down")
+
+    monkeypatch.setattr(arse.db, "write_events", unavailable)
+    with pytest.raises(ConnectionError):
+        await log.flush()
+    assert log.pending == 1
+
+def test_lifespan_flushes_events_on_shutdown(app_with_templates):
+    with TestClient(app_with_templates) as client:
+        client.post("/game/lifespan/create-player")
+        client.post("/game/lifespan/player/1/run")
+
+    async def count_events():
+        async with arse.db.async_session() as session:
+            statement = select(func.count(GameEvent.id)).where(GameEvent.game_id == "lifespan")
+            return (await session.execute(statement)).scalar()
+
+    assert asyncio.run(count_events()) == 2
@@ -0,0 +1,64 @@
+from arse.game import Game, GameRegistry, GAME_OVER, MOVED, WINNING_STEPS, WON
+
+
+def test_registry_get_or_create():
+    registry = GameRegistry()
+    assert registry.get("scene-a") is None
+
+    game = registry.get_or_create("scene-a")
+    assert registry.get_or_create("scene-a") is game
+    assert "scene-a" in registry
+    assert len(registry) == 1
+
+    registry.remove("scene-a")
+    assert registry.get("scene-a") is None
+
+def test_games_have_independent_state():
+    registry = GameRegistry()
+    first = registry.get_or_create("scene-a")
+    second = registry.get_or_create("scene-b")
+
+    first.add_player()
+    assert len(first.players) == 1
+    assert len(second.players) == 0
+    assert first.lock is not second.lock
+
+def test_run_until_win_bumps_version():
+    game = Game("scene-a")
+    player = game.add_player()
+    version = game.version
+
+    for _ in range(WINNING_STEPS - 1):
+        assert game.run(player) == MOVED
+    assert game.run(player) == WON
+    assert game.winner == player["id"]
+    assert game.game_over
+    assert game.version == version + WINNING_STEPS
+
+def test_reset_keeps_version_increasing():
+    game = Game("scene-a")
+    game.add_player()
+    version = game.version
+
+    game.reset()
+    assert len(game.players) == 0
+    assert game.winner is None
+    assert game.version > version
+
+def test_run_after_game_over_takes_no_step():
+    game = Game("scene-a")
+    winner = game.add_player()
+    loser = game.add_player()
+    for _ in range(WINNING_STEPS):
+        game.run(winner)
+    version = game.version
+
+    assert game.run(loser) == GAME_OVER
+    assert loser["steps"] == 0
+    assert game.version == version
+
+def test_claim_winner_only_once():
+    game = Game("scene-a")
+    assert game.claim_winner(1)
+    assert not game.claim_winner(2)
+    assert game.winner == 1
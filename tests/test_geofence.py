@@ -0,0 +1,116 @@
+import pytest
+
+from arse.game import Game, GAME_OVER, MOVED, WINNING_STEPS, WON
+from arse.geofence import Zone, ZoneIndex
+
+ORIGIN = (52.52, 13.405)
+
+# Roughly 100 m north of ORIGIN, about 11 m across
+GATE = {"id": "gate", "kind": "circle", "lat": 52.5209, "lon": 13.405, "radius": 10}
+CASTLE = {
+    "id": "castle",
+    "kind": "polygon",
+    "points": [[52.5220, 13.4040], [52.5220, 13.4060], [52.5230, 13.4060], [52.5230, 13.4040]],
+    "wins": True,
+}
+
+
+def test_zone_contains():
+    gate = Zone(GATE)
+    assert gate.contains(52.5209, 13.405)
+    assert gate.contains(52.52098, 13.405)
+    assert not gate.contains(52.5211, 13.405)
+
+    castle = Zone(CASTLE)
+    assert castle.wins
+    assert castle.contains(52.5225, 13.405)
+    assert not castle.contains(52.5225, 13.407)
+
+    with pytest.raises(ValueError):
+        Zone({"id": "x", "kind": "polygon", "points": [[0, 0], [1, 1]]})
+    with pytest.raises(ValueError):
+        Zone({"id": "x", "kind": "hexagon"})
+
+def test_enter_and_exit_are_incremental():
+    index = ZoneIndex()
+    index.add(Zone(GATE))
+    index.add(Zone(CASTLE))
+
+    assert index.locate(1, *ORIGIN) == (set(), set())
+    assert index.locate(1, 52.5209, 13.405) == ({"gate"}, set())
+    assert index.locate(1, 52.52091, 13.405) == (set(), set())
+    assert index.locate(1, 52.5225, 13.405) == ({"castle"}, {"gate"})
+    assert index.inside(1) == {"castle"}
+
+    index.remove("castle")
+    assert index.inside(1) == set()
+    assert index.winning == set()
+
+def test_only_nearby_zones_are_tested(monkeypatch):
+    index = ZoneIndex(cell_meters=100)
+    for i in range(200):
+        # A row of small zones stretching about 20 km east
+        index.add(Zone({"id": f"z{i}", "kind": "circle", "lat": ORIGIN[0], "lon": ORIGIN[1] + i * 0.0015, "radius": 20}))
+
+    tested = []
+    original = Zone.contains
+    monkeypatch.setattr(Zone, "contains", lambda zone, lat, lon: tested.append(zone.id) or original(zone, lat, lon))
+    assert index.locate(1, *ORIGIN) == ({"z0"}, set())
+    assert len(tested) <= 2
+
+def test_large_zones_are_not_registered_per_cell():
+    index = ZoneIndex(cell_meters=100)
+    # 50 km across: about a million cells
+    index.add(Zone({"id": "region", "kind": "circle", "lat": ORIGIN[0], "lon": ORIGIN[1], "radius": 50_000}))
+    index.add(Zone({"id": "z0", "kind": "circle", "lat": ORIGIN[0], "lon": ORIGIN[1], "radius": 20}))
+    assert len(index._cells) <= 4
+
+    assert index.locate(1, *ORIGIN) == ({"region", "z0"}, set())
+    assert index.locate(1, 53.1, 13.405) == (set(), {"region", "z0"})
+    index.remove("region")
+    assert index.locate(1, *ORIGIN) == ({"z0"}, set())
+
+def test_winning_zone_replaces_the_step_rule():
+    game = Game("hunt")
+    first, second = game.add_player(), game.add_player()
+    game.define_zone(CASTLE)
+    assert not game.wins_by_steps
+
+    for _ in range(WINNING_STEPS):
+        assert game.run(first) == MOVED
+    assert game.winner is None
+
+    assert game.move(second, *ORIGIN) == MOVED
+    assert game.move(second, 52.5225, 13.405) == WON
+    assert game.winner == second["id"]
+    assert game.move(first, 52.5225, 13.405) == MOVED
+    assert game.run(first) == GAME_OVER
+
+def test_enter_and_exit_events_are_published():
+    game = Game("hunt")
+    player = game.add_player()
+    game.define_zone(GATE)
+    subscriber = game.events.subscribe()
+
+    game.move(player, 52.5209, 13.405)
+    game.move(player, *ORIGIN)
+    events = [subscriber.queue.get_nowait().split(b"\n")[0] for _ in range(subscriber.queue.qsize())]
+    assert events == [b"event: move", b"event: enter", b"event: move", b"event: exit"]
+
+def test_zones_survive_snapshot_and_replay():
+    logged = []
+    game = Game("hunt")
+    game.publish = lambda event, data, log=True: log and logged.append((event, {"version": game.version, **data}))
+    player = game.add_player()
+    game.define_zone(GATE)
+    game.move(player, 52.5209, 13.405)
+
+    restored = Game("hunt")
+    restored.restore(game.snapshot())
+    assert restored.zones.inside(player["id"]) == {"gate"}
+
+    replayed = Game("hunt")
+    for kind, data in logged:
+        replayed.apply(kind, data)
+    assert replayed.zones.inside(player["id"]) == {"gate"}
+    assert [event for event, _ in logged] == ["join", "zone", "move"]
@@ -0,0 +1,26 @@
+import pytest
+
+from arse.ingest import HEADER, POSITION, RECORD, RUN, BatchError, decode_batch, encode_batch
+
+
+def test_round_trip():
+    records = [(POSITION, 1, 52.52, 13.405), (RUN, 2, 0.0, 0.0)]
+    body = encode_batch(records)
+    assert len(body) == HEADER.size + 2 * RECORD.size
+    assert decode_batch(body) == records
+
+@pytest.mark.parametrize("body", [
+    b"",
+    b"NOPE\x01\x00\x00\x00",
+    encode_batch([(RUN, 1, 0, 0)])[:-1],
+    encode_batch([(7, 1, 0, 0)]),
+    encode_batch([(POSITION, 1, 91, 0)]),
+    encode_batch([(POSITION, 1, float("nan"), 0)]),
+])
+def test_rejects_malformed_batches(body):
+    with pytest.raises(BatchError):
+        decode_batch(body)
+
+def test_record_limit():
+    with pytest.raises(BatchError):
+        decode_batch(encode_batch([(RUN, 1, 0, 0)] * 3), max_records=2)
@@ -0,0 +1,85 @@
+import random
+
+from arse import leaderboard as leaderboard_module
+from arse.game import Game
+from arse.leaderboard import Leaderboard, SortedIds
+
+
+def test_matches_a_full_sort():
+    rng = random.Random(3)
+    board = Leaderboard(size=8)
+    steps = {}
+    for _ in range(5000):
+        if not steps or rng.random() < 0.1:
+            player_id = len(steps) + 1
+            steps[player_id] = rng.randint(-5, 5)
+            board.add(player_id, steps[player_id])
+        else:
+            # Mostly small steps up, with jumps far outside the tree to make it grow
+            player_id = rng.randint(1, len(steps))
+            new = steps[player_id] + rng.choice((1, 1, 1, -2, 3, 200, -300))
+            board.move(player_id, steps[player_id], new)
+            steps[player_id] = new
+
+    expected = sorted(steps.items(), key=lambda item: (-item[1], item[0]))
+    for k in (1, 10, len(steps), len(steps) + 5):
+        assert board.top(k) == expected[:k]
+    for player_id, player_steps in steps.items():
+        assert board.rank(player_steps) == 1 + sum(other > player_steps for other in steps.values())
+    assert len(board) == len(steps)
+
+def test_sorted_ids_stay_sorted_across_blocks(monkeypatch):
+    monkeypatch.setattr(leaderboard_module, "BLOCK_SIZE", 4)
+    rng = random.Random(5)
+    ids, present = SortedIds(), set()
+    for _ in range(3000):
+        player_id = rng.randint(1, 300)
+        if player_id in present:
+            ids.remove(player_id)
+            present.discard(player_id)
+        else:
+            ids.add(player_id)
+            present.add(player_id)
+        assert len(ids) == len(present)
+    assert list(ids.smallest(len(present) + 1)) == sorted(present)
+    assert list(ids.smallest(7)) == sorted(present)[:7]
+    assert max(len(block) for block in ids._blocks) < 8
+
+def test_ties_share_a_rank():
+    game = Game("ties")
+    for steps in (2, 5, 5, 1):
+        game.add_player()["steps"] = steps
+
+    assert game.leaders(3) == [
+        {"id": 2, "steps": 5, "rank": 1},
+        {"id": 3, "steps": 5, "rank": 1},
+        {"id": 1, "steps": 2, "rank": 3},
+    ]
+    assert [game.rank(player_id) for player_id in (1, 2, 3, 4)] == [3, 1, 1, 4]
+    assert game.rank(5) is None
+
+    game.run(game.get_player(4))
+    assert game.rank(4) == 3
+    assert game.rank(1) == 3
+
+def test_leaderboard_endpoint(client):
+    for _ in range(2):
+        client.post("/game/podium/create-player")
+    client.post("/game/podium/player/2/run")
+
+    response = client.get("/game/podium/leaderboard?k=1")
+    assert response.json() == {"players": [{"id": 2, "steps": 1, "rank": 1}], "total": 2}
+    assert client.get("/game/podium/leaderboard", headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+    assert client.get("/game/podium/leaderboard/1").json() == {"id": 1, "steps": 0, "rank": 2}
+    assert client.get("/game/podium/leaderboard/9").status_code == 404
+
+    assert response.headers["Vary"] == "HX-Request"
+    htmx = {"HX-Request": "true"}
+    fragment = client.get("/game/podium/leaderboard", headers={**htmx, "If-None-Match": response.headers["ETag"]})
+    assert fragment.status_code == 200
+    assert fragment.headers["ETag"] != response.headers["ETag"]
+    assert fragment.headers["Vary"] == "HX-Request"
+    fragment = fragment.text
+    assert fragment.startswith('<div id="leaderboard"')
+    assert "Player 2" in fragment
+    assert 'id="leaderboard"' in client.get("/game/podium/admin").text
@@ -0,0 +1,54 @@
+from arse import metrics
+from arse.metrics import Counter, Histogram, MetricsRegistry
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency", "Latency", ["route"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, "/run")
+
+    assert list(histogram.samples()) == [
+        'latency_bucket{route="/run",le="0.1"} 2',
+        'latency_bucket{route="/run",le="1.0"} 3',
+        'latency_bucket{route="/run",le="+Inf"} 4',
+        'latency_sum{route="/run"} 3.65',
+        'latency_count{route="/run"} 4',
+    ]
+    assert histogram.count("/run") == 4
+    assert histogram.count("/admin") == 0
+
+def test_registry_renders_text_format():
+    registry = MetricsRegistry()
+    events = registry.counter("events_total", "Events", ["game_id"])
+    registry.gauge("games", "Games", lambda: 2)
+    events.inc('scene "a"')
+    events.inc('scene "a"')
+
+    assert registry.render() == (
+        "# HELP events_total Events\n"
+        "# TYPE events_total counter\n"
+        'events_total{game_id="scene \\"a\\""} 2\n'
+        "# HELP games Games\n"
+        "# TYPE games gauge\n"
+        "games 2\n"
+    )
+
+def test_counter_value():
+    counter = Counter("taps", "Taps")
+    counter.inc(amount=3)
+    assert counter.value() == 3
+
+def test_metrics_endpoint(client):
+    client.post("/game/metered/create-player")
+    client.post("/game/metered/player/1/run")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    # Routes are labelled by their template, not the concrete path
+    assert 'route="/game/{game_id}/player/{player_id}/run"' in text
+    assert 'arse_game_events_total{game_id="metered",kind="run"} 1' in text
+    assert "arse_template_render_seconds_count" in text
+    assert "arse_active_games " in text
+    assert metrics.request_seconds.count("POST", "/game/{game_id}/create-player", 303) >= 1
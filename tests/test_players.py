@@ -0,0 +1,70 @@
+import pytest
+
+from arse import players as players_module
+from arse.geofence import Zone
+from arse.players import PlayerTable
+
+
+@pytest.fixture(params=["python", "numpy"])
+def backend(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(players_module, "np", None)
+    return request.param
+
+def test_views_read_and_write_the_columns():
+    table = PlayerTable()
+    player = table.add()
+    player["steps"] += 2
+    player["lat"], player["lon"] = 52.52, 13.405
+
+    assert table.get(1).steps == 2
+    assert table[1] == {"id": 1, "steps": 2, "lat": 52.52, "lon": 13.405}
+    assert table.add().to_dict() == {"id": 2, "steps": 0}
+    assert table.get(3) is None
+    assert len(table) == 2
+
+def test_out_of_order_ids_leave_gaps():
+    table = PlayerTable()
+    table.upsert({"id": 3, "steps": 1})
+    assert len(table) == 1
+    assert table.get(2) is None
+    assert [player.id for player in table.values()] == [3]
+    table.upsert({"id": 1, "steps": 0})
+    assert table.to_list() == [{"id": 1, "steps": 0}, {"id": 3, "steps": 1}]
+
+def test_columns_are_compact():
+    table = PlayerTable()
+    for _ in range(1000):
+        table.add()
+    assert table.nbytes() == 21 * 1000
+
+def test_leaders(backend):
+    table = PlayerTable()
+    for steps in (3, 7, 7, 1):
+        table.add()["steps"] = steps
+    table.upsert({"id": 6, "steps": 9})
+
+    assert table.leaders(3) == [(6, 9), (2, 7), (3, 7)]
+    assert table.leaders(0) == []
+    assert PlayerTable().leaders(3) == []
+    # No view into the columns outlives the query, so they can still grow
+    assert table.add().id == 7
+
+def test_count_by_zone(backend):
+    table = PlayerTable()
+    for lat in (52.5200, 52.5201, 52.5300):
+        player = table.add()
+        player["lat"], player["lon"] = lat, 13.405
+    table.add()
+    zones = [
+        Zone({"id": "near", "kind": "circle", "lat": 52.52, "lon": 13.405, "radius": 50}),
+        Zone({"id": "empty", "kind": "circle", "lat": 10, "lon": 10, "radius": 50}),
+        Zone({
+            "id": "strip",
+            "kind": "polygon",
+            "points": [[52.51995, 13.404], [52.52005, 13.404], [52.52005, 13.406], [52.51995, 13.406]],
+        }),
+    ]
+    assert table.count_by_zone(zones) == {"near": 2, "empty": 0, "strip": 1}
@@ -0,0 +1,64 @@
+import time
+from types import SimpleNamespace
+
+import arse.api
+from arse.profiler import OUTSIDE_ROUTES, SamplingProfiler
+
+
+def busy_endpoint(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+def test_samples_are_attributed_to_routes():
+    profiler = SamplingProfiler()
+    route = SimpleNamespace(endpoint=busy_endpoint, path="/busy")
+    profiler.start([route], seconds=5, interval_ms=1)
+    busy_endpoint(0.2)
+    time.sleep(0.05)
+    profiler.stop()
+
+    routes = profiler.status()["routes"]
+    assert routes["/busy"] > 10
+    assert set(routes) <= {"/busy", OUTSIDE_ROUTES}
+    for line in profiler.collapsed("/busy").splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert stack.startswith("/busy;busy_endpoint (test_profiler.py:")
+        assert int(count) > 0
+
+def test_request_limit_stops_the_profiler():
+    profiler = SamplingProfiler()
+    profiler.start([], requests=2)
+    profiler.request_finished()
+    assert profiler.running
+    profiler.request_finished()
+    assert not profiler.running
+
+def test_time_window_stops_the_profiler():
+    profiler = SamplingProfiler()
+    profiler.start([], seconds=0.05, interval_ms=1)
+    time.sleep(0.2)
+    assert not profiler.running
+    assert profiler.status()["seconds_left"] == 0
+
+def test_profiler_endpoints(client, monkeypatch):
+    assert client.get("/admin/profiler").status_code == 404
+
+    monkeypatch.setattr(arse.api, "ADMIN_TOKEN", "secret")
+    assert client.get("/admin/profiler").status_code == 403
+    headers = {"Authorization": "Bearer secret"}
+
+    response = client.post("/admin/profiler/start", params={"requests": 3, "interval_ms": 1}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["running"]
+    assert client.post("/admin/profiler/start", headers=headers).status_code == 409
+
+    client.post("/game/profiled/create-player")
+    client.post("/game/profiled/player/1/run")
+    status = client.get("/admin/profiler", headers=headers).json()
+    assert not status["running"]
+    assert status["requests"] == 3
+
+    response = client.get("/admin/profiler/profile.txt", headers=headers)
+    assert response.status_code == 200
+    assert "attachment" in response.headers["content-disposition"]
@@ -0,0 +1,92 @@
+import pytest
+from sqlalchemy import select
+
+import arse.db
+import arse.game
+import arse.rules
+from arse.eventlog import EventLog
+from arse.game import GameRegistry
+from arse.models import GameSnapshot
+from arse.recovery import Snapshotter, recover
+from arse.timers import TimerWheel
+
+
+def play(game, steps):
+    player = game.get_player(1) or game.add_player()
+    for _ in range(steps):
+        game.run(player)
+
+@pytest.mark.asyncio
+async def test_recover_by_replaying_events():
+    log = EventLog()
+    games = GameRegistry(on_event=log.append)
+    play(games.get_or_create("scene-a"), 3)
+    play(games.get_or_create("scene-b"), 1)
+    await log.flush()
+
+    restarted = GameRegistry()
+    assert await recover(restarted) == 7
+    assert restarted.get("scene-a").snapshot() == games.get("scene-a").snapshot()
+    assert restarted.get("scene-b").snapshot() == games.get("scene-b").snapshot()
+
+@pytest.mark.asyncio
+async def test_recover_from_snapshot_replays_only_newer_events():
+    log = EventLog()
+    games = GameRegistry(on_event=log.append)
+    snapshotter = Snapshotter(games, log)
+    play(games.get_or_create("scene-a"), 1)
+    play(games.get_or_create("scene-b"), 1)
+    assert await snapshotter.snapshot() == 2
+
+    # Only scene A moves on; a second snapshot skips the unchanged scene B
+    play(games.get_or_create("scene-a"), 1)
+    assert await snapshotter.snapshot() == 1
+    play(games.get_or_create("scene-a"), 1)
+    await log.flush()
+
+    restarted = GameRegistry()
+    assert await recover(restarted) == 2
+    for game_id in ("scene-a", "scene-b"):
+        assert restarted.get(game_id).snapshot() == games.get(game_id).snapshot()
+    assert restarted.get("scene-a").winner == 1
+
+@pytest.mark.asyncio
+async def test_snapshot_includes_unflushed_events():
+    log = EventLog()
+    games = GameRegistry(on_event=log.append)
+    snapshotter = Snapshotter(games, log)
+    play(games.get_or_create("scene-a"), 2)
+
+    await snapshotter.snapshot()
+    assert log.pending == 0
+
+    async with arse.db.async_session() as session:
+        snapshot = (await session.execute(select(GameSnapshot))).scalar_one()
+    assert snapshot.state["players"] == [{"id": 1, "steps": 2}]
+
+    restarted = GameRegistry()
+    assert await recover(restarted) == 0
+    assert restarted.get("scene-a").get_player(1)["steps"] == 2
+
+@pytest.mark.asyncio
+async def test_recover_a_round_that_ran_out_of_time(tmp_path, monkeypatch):
+    (tmp_path / "default.toml").write_text("time_limit = 60\n\n[actions.run]\nsteps = 1\n")
+    monkeypatch.setattr(arse.rules, "RULES_DIR", tmp_path)
+    now = [0.0]
+    wheel = TimerWheel(tick=0.01, clock=lambda: now[0])
+    monkeypatch.setattr(arse.game, "wheel", wheel)
+
+    log = EventLog()
+    games = GameRegistry(on_event=log.append)
+    game = games.get_or_create("scene-a")
+    game.add_player()
+    game.start_clock(game.time_up)
+    now[0] = 60.0
+    assert wheel.advance() == 1
+    assert game.game_over
+    await log.flush()
+
+    restarted = GameRegistry()
+    assert await recover(restarted) == 2
+    assert restarted.get("scene-a").game_over
+    assert restarted.get("scene-a").winner is None
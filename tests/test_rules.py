@@ -0,0 +1,126 @@
+import pytest
+
+import arse.rules
+from arse.game import Game, GameRegistry, COOLDOWN, GAME_OVER, LOST, MOVED, WINNING_STEPS, WON
+from arse.rules import LOSE, WIN, Rules, RulesError, load_rules
+from arse.store import PostgresStore
+
+RACE = """
+[actions.run]
+steps = 1
+
+[actions.sprint]
+steps = 3
+cooldown = 60
+
+[actions.stumble]
+steps = -2
+
+[[win]]
+when = "steps >= 5"
+
+[[lose]]
+when = "steps < -1"
+"""
+
+
+@pytest.fixture
+def rules_dir(tmp_path, monkeypatch):
+    (tmp_path / "race.toml").write_text(RACE)
+    monkeypatch.setattr(arse.rules, "RULES_DIR", tmp_path)
+    return tmp_path
+
+
+def test_default_rules_match_the_original_game():
+    rules = Rules(arse.rules.DEFAULT_RULES)
+    assert list(rules.actions) == ["run"]
+    assert rules.actions["run"].steps == 1
+    assert rules.settle(WINNING_STEPS - 1) is None
+    assert rules.settle(WINNING_STEPS) == WIN
+
+def test_conditions_are_checked_in_order():
+    rules = Rules({
+        "actions": {"run": {}},
+        "win": [{"when": "steps == 4"}],
+        "lose": {"when": "steps != 0"},
+    })
+    assert rules.settle(0) is None
+    assert rules.settle(4) == WIN
+    assert rules.settle(2) == LOSE
+
+@pytest.mark.parametrize("spec", [
+    {"actions": {"sprint": {"steps": 1}}},
+    {"actions": {"run": {"steps": "one"}}},
+    {"actions": {"run": {"steps": 1, "cooldown": -1}}},
+    {"actions": {"run": {"steps": 1, "bonus": 2}}},
+    {"actions": {"run": {}}, "win": [{"when": "score >= 3"}]},
+    {"actions": {"run": {}}, "win": [{"when": "steps => 3"}]},
+])
+def test_invalid_rules(spec):
+    with pytest.raises(RulesError):
+        Rules(spec)
+
+def test_rules_files(rules_dir):
+    assert load_rules("race").source == str(rules_dir / "race.toml")
+    assert load_rules("other").source == "built-in"
+    assert load_rules("../race").source == "built-in"
+
+    (rules_dir / "default.toml").write_text("[actions.run]\nsteps = 2\n")
+    assert load_rules("other").actions["run"].steps == 2
+
+    (rules_dir / "broken.toml").write_text("[actions.run\n")
+    assert load_rules("broken").source == "built-in"
+
+def test_actions_follow_the_rules(rules_dir):
+    game = Game("race")
+    player = game.add_player()
+    assert game.act(player, game.rules.action("sprint")) == MOVED
+    assert player["steps"] == 3
+    assert game.act(player, game.rules.action("sprint")) == COOLDOWN
+    assert player["steps"] == 3
+    assert game.run(player) == MOVED
+    assert game.run(player) == WON
+    assert game.winner == player["id"]
+
+def test_losing_ends_the_game_without_a_winner(rules_dir):
+    game = Game("race")
+    player, other = game.add_player(), game.add_player()
+    assert game.act(player, game.rules.action("stumble")) == LOST
+    assert game.game_over and game.winner is None
+    assert game.run(other) == GAME_OVER
+
+    game.reset()
+    assert not game.game_over
+    assert game.act(game.add_player(), game.rules.action("sprint")) == MOVED
+
+def test_reset_reloads_the_rules(rules_dir):
+    game = Game("race")
+    assert game.rules.action("sprint") is not None
+    (rules_dir / "race.toml").write_text("[actions.run]\nsteps = 1\n")
+    game.reset()
+    assert game.rules.action("sprint") is None
+
+@pytest.mark.asyncio
+async def test_shared_game_can_be_lost(rules_dir):
+    store = PostgresStore(GameRegistry())
+    game = await store.load_game("race-shared")
+    game.rules = Rules({"actions": {"run": {"steps": -1}}, "lose": {"when": "steps < 0"}})
+    player = await store.join(game)
+    assert await store.run(game, player) == LOST
+    assert game.game_over and game.winner is None
+    state = await store.load("race-shared")
+    assert state["game_over"] and state["winner"] is None
+
+def test_action_endpoint(rules_dir, client):
+    (rules_dir / "relay.toml").write_text(RACE)
+    client.post("/game/relay/create-player")
+    response = client.post("/game/relay/player/1/action/sprint")
+    assert response.status_code == 200
+    assert "Steps: 3" in response.text
+    assert "Sprint!" in response.text
+
+    response = client.post("/game/relay/player/1/action/sprint", headers={"HX-Request": "true"})
+    assert "Wait a moment" in response.text
+    assert client.post("/game/relay/player/1/action/fly").status_code == 404
+
+    assert client.get("/game/relay/rules").json()["actions"]["sprint"] == {"steps": 3, "cooldown": 60}
@@ -0,0 +1,91 @@
+import hashlib
+import os
+
+import pytest
+
+from arse.scenes import SceneAssets, parse_range
+
+
+@pytest.fixture
+def scenes(tmp_path, monkeypatch):
+    import arse.api
+
+    game_dir = tmp_path / "scene-a"
+    (game_dir / "models").mkdir(parents=True)
+    (game_dir / "models" / "tree.glb").write_bytes(bytes(range(256)) * 40)
+    (game_dir / "anchors.json").write_text('{"anchors": []}')
+    (game_dir / ".partial").write_text("ignored")
+    (tmp_path / "secret.txt").write_text("not a scene asset")
+    scenes = SceneAssets(tmp_path, chunk_size=4096)
+    monkeypatch.setattr(arse.api, "scene_assets", scenes)
+    return scenes
+
+
+def test_parse_range():
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=90-500", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=-500", 100) == (0, 99)
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    assert parse_range("bytes=9-2", 100) is None
+    with pytest.raises(ValueError):
+        parse_range("bytes=100-", 100)
+
+def test_manifest_lists_chunk_hashes(scenes, client):
+    body = (scenes.directory / "scene-a" / "models" / "tree.glb").read_bytes()
+    response = client.get("/game/scene-a/assets")
+    assert response.status_code == 200
+    manifest = response.json()
+    assert manifest["chunk_size"] == 4096
+    assert [asset["path"] for asset in manifest["assets"]] == ["anchors.json", "models/tree.glb"]
+    tree = manifest["assets"][1]
+    assert tree["size"] == len(body)
+    assert tree["chunks"] == [hashlib.sha256(body[i:i + 4096]).hexdigest() for i in range(0, len(body), 4096)]
+
+    assert client.get("/game/scene-a/assets", headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+    assert client.get("/game/scene-b/assets").json()["assets"] == []
+
+def test_manifest_changes_only_for_changed_chunks(scenes):
+    path = scenes.directory / "scene-a" / "models" / "tree.glb"
+    before = scenes.manifest("scene-a")
+    body = bytearray(path.read_bytes())
+    body[5000] ^= 0xFF
+    replacement = path.with_name("tree.glb.tmp")
+    replacement.write_bytes(bytes(body))
+    os.replace(replacement, path)
+
+    after = scenes.manifest("scene-a")
+    assert after["version"] != before["version"]
+    old, new = before["assets"][1]["chunks"], after["assets"][1]["chunks"]
+    assert [i for i, (a, b) in enumerate(zip(old, new)) if a != b] == [1]
+
+def test_range_requests_resume_downloads(scenes, client):
+    body = (scenes.directory / "scene-a" / "models" / "tree.glb").read_bytes()
+    whole = client.get("/game/scene-a/assets/models/tree.glb")
+    assert whole.status_code == 200
+    assert whole.content == body
+    assert whole.headers["accept-ranges"] == "bytes"
+
+    part = client.get("/game/scene-a/assets/models/tree.glb", headers={"Range": "bytes=4096-8191", "If-Range": whole.headers["etag"]})
+    assert part.status_code == 206
+    assert part.headers["content-range"] == f"bytes 4096-8191/{len(body)}"
+    assert part.content == body[4096:8192]
+
+    stale = client.get("/game/scene-a/assets/models/tree.glb", headers={"Range": "bytes=0-9", "If-Range": '"old"'})
+    assert stale.status_code == 200
+    assert stale.content == body
+
+    past_end = client.get("/game/scene-a/assets/models/tree.glb", headers={"Range": f"bytes={len(body)}-"})
+    assert past_end.status_code == 416
+    assert past_end.headers["content-range"] == f"bytes */{len(body)}"
+
+    head = client.head("/game/scene-a/assets/models/tree.glb")
+    assert head.headers["content-length"] == str(len(body))
+
+def test_assets_stay_inside_the_game_directory(scenes, client):
+    assert client.get("/game/scene-a/assets/missing.glb").status_code == 404
+    assert client.get("/game/scene-a/assets/..%2Fsecret.txt").status_code == 404
+    assert scenes.resolve("scene-a", "../secret.txt") is None
+    assert scenes.resolve("..", "tmp") is None
@@ -0,0 +1,70 @@
+import random
+
+import pytest
+
+from arse.game import Game
+from arse.spatial import GridIndex, distance_meters
+
+# Roughly a city park
+ORIGIN = (52.52, 13.405)
+
+
+def scatter(count, spread=0.01, seed=1):
+    rng = random.Random(seed)
+    return {
+        player_id: (ORIGIN[0] + rng.uniform(-spread, spread), ORIGIN[1] + rng.uniform(-spread, spread))
+        for player_id in range(1, count + 1)
+    }
+
+def brute_force(points, lat, lon):
+    return sorted((distance_meters(lat, lon, *point), player_id) for player_id, point in points.items())
+
+def test_distance_meters():
+    # One degree of latitude is about 111 km everywhere
+    assert distance_meters(0, 0, 1, 0) == pytest.approx(111_195, rel=1e-3)
+    assert distance_meters(*ORIGIN, *ORIGIN) == 0
+
+@pytest.mark.parametrize("radius", [5, 80, 400, 5000])
+def test_within_matches_brute_force(radius):
+    points = scatter(3000)
+    index = GridIndex(cell_meters=50)
+    for player_id, (lat, lon) in points.items():
+        index.update(player_id, lat, lon)
+
+    expected = [player_id for distance, player_id in brute_force(points, *ORIGIN) if distance <= radius]
+    assert [player_id for player_id, _ in index.within(*ORIGIN, radius)] == expected
+
+@pytest.mark.parametrize("k", [1, 10, 3000, 5000])
+def test_nearest_matches_brute_force(k):
+    points = scatter(3000)
+    index = GridIndex(cell_meters=50)
+    for player_id, (lat, lon) in points.items():
+        index.update(player_id, lat, lon)
+
+    query = (ORIGIN[0] + 0.003, ORIGIN[1] - 0.004)
+    expected = [player_id for _, player_id in brute_force(points, *query)[:k]]
+    assert [player_id for player_id, _ in index.nearest(*query, k)] == expected
+
+def test_moving_and_removing_players():
+    index = GridIndex(cell_meters=50)
+    index.update(1, *ORIGIN)
+    index.update(1, ORIGIN[0] + 0.01, ORIGIN[1])
+    assert index.within(*ORIGIN, 100) == []
+    assert [player_id for player_id, _ in index.nearest(*ORIGIN, 1)] == [1]
+
+    index.remove(1)
+    assert len(index) == 0
+    assert index.nearest(*ORIGIN, 1) == []
+
+def test_game_positions_survive_restore():
+    game = Game("scene")
+    player = game.add_player()
+    game.move(player, *ORIGIN)
+    assert [found["id"] for found in game.within(*ORIGIN, 10)] == [player["id"]]
+
+    restored = Game("scene")
+    restored.restore(game.snapshot())
+    assert restored.nearest(*ORIGIN, 1)[0]["distance"] == 0
+
+    restored.reset()
+    assert restored.within(*ORIGIN, 10) == []
@@ -0,0 +1,191 @@
+import asyncio
+import os
+import random
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from arse.game import GameRegistry, DEFAULT_MAX_PLAYERS as MAX_PLAYERS, GAME_OVER, MOVED, WINNING_STEPS, WON
+from arse.models import Base
+from arse.store import MemoryStore, PostgresStore, create_store
+
+TAPS = 1000
+
+
+@pytest.fixture
+async def file_engine(tmp_path):
+    """SQLite file shared by several connections, with writers queued like row locks."""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/shared.db", connect_args={"timeout": 60})
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine.sync_engine, "begin")
+    def begin(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+def test_create_store():
+    registry = GameRegistry()
+    assert isinstance(create_store(registry, "memory"), MemoryStore)
+    assert isinstance(create_store(registry, "postgres"), PostgresStore)
+    with pytest.raises(ValueError):
+        create_store(registry, "redis")
+
+@pytest.mark.asyncio
+async def test_shared_game_round_trip():
+    store = PostgresStore(GameRegistry())
+    game = await store.load_game("scene-a")
+
+    players = [await store.join(game) for _ in range(MAX_PLAYERS)]
+    assert [player["id"] for player in players] == list(range(1, MAX_PLAYERS + 1))
+    assert await store.join(game) is None
+
+    for _ in range(WINNING_STEPS - 1):
+        assert await store.run(game, players[0]) == MOVED
+    assert await store.run(game, players[0]) == WON
+    assert await store.run(game, players[1]) == GAME_OVER
+    assert game.winner == players[0]["id"]
+    assert await store.load("scene-a") == {
+        "winner": 1,
+        "game_over": True,
+        "max_players": MAX_PLAYERS,
+        "zones": [],
+        "players": [{"id": 1, "steps": WINNING_STEPS}, {"id": 2, "steps": 0}],
+    }
+
+    await store.reset(game)
+    assert len(game.players) == 0
+    assert await store.load("scene-a") == {
+        "winner": None, "game_over": False, "max_players": MAX_PLAYERS, "zones": [], "players": []
+    }
+
+@pytest.mark.asyncio
+async def test_workers_share_state(file_engine):
+    first = PostgresStore(GameRegistry(), file_engine)
+    second = PostgresStore(GameRegistry(), file_engine)
+
+    player = await first.join(await first.load_game("scene-a"))
+    await first.run(first.registry.get("scene-a"), player)
+
+    # The second worker has never seen the game and loads it on demand
+    game, cached = await second.find_player("scene-a", player["id"])
+    assert cached == {"id": player["id"], "steps": 1}
+
+    # Once the first worker ends the game, a stale cache still loses the race
+    for _ in range(WINNING_STEPS - 1):
+        await first.run(first.registry.get("scene-a"), player)
+    assert await first.join(first.registry.get("scene-a")) is None
+    assert await second.run(game, cached) == GAME_OVER
+    assert game.winner == player["id"]
+
+@pytest.mark.asyncio
+async def test_unknown_players_do_not_resync_the_game(file_engine):
+    first = PostgresStore(GameRegistry(), file_engine)
+    second = PostgresStore(GameRegistry(), file_engine)
+    await first.join(await first.load_game("scene-a"))
+
+    assert await second.find_game("scene-b") is None
+    game = await second.find_game("scene-a")
+    version = game.version
+    assert await second.find_player("scene-a", 99) == (game, None)
+    assert game.version == version
+
+@pytest.mark.asyncio
+async def test_positions_are_shared(file_engine):
+    first = PostgresStore(GameRegistry(), file_engine)
+    second = PostgresStore(GameRegistry(), file_engine)
+
+    game = await first.load_game("park")
+    player = await first.join(game)
+    await first.move(game, player, 52.52, 13.405)
+    assert [found["id"] for found in game.within(52.52, 13.405, 1)] == [player["id"]]
+
+    cached = await second.load_game("park")
+    assert cached.get_player(player["id"]) == {"id": player["id"], "steps": 0, "lat": 52.52, "lon": 13.405}
+    assert cached.nearest(52.52, 13.405, 1)[0]["id"] == player["id"]
+
+@pytest.mark.asyncio
+async def test_shared_winning_zone(file_engine):
+    first = PostgresStore(GameRegistry(), file_engine)
+    second = PostgresStore(GameRegistry(), file_engine)
+    zone = {"id": "goal", "kind": "circle", "lat": 52.52, "lon": 13.405, "radius": 20, "wins": True}
+
+    game = await first.load_game("hunt")
+    runner, walker = await first.join(game), await first.join(game)
+    await first.define_zone(game, zone)
+    for _ in range(WINNING_STEPS):
+        assert await first.run(game, runner) == MOVED
+
+    cached = await second.load_game("hunt")
+    assert cached.zones.specs() == [zone]
+    assert await second.move(cached, cached.get_player(walker["id"]), 52.52, 13.405) == WON
+    assert (await first.load("hunt"))["winner"] == walker["id"]
+
+@pytest.mark.asyncio
+async def test_concurrent_bulk_joins_never_overfill(file_engine):
+    workers = [PostgresStore(GameRegistry(), file_engine) for _ in range(4)]
+    await workers[0].configure(await workers[0].load_game("checkin"), 100)
+
+    async def join(worker):
+        return await worker.join_many(await worker.load_game("checkin"), 30)
+
+    joined = [players for players in await asyncio.gather(*(join(worker) for worker in workers)) if players]
+    assert len(joined) == 3
+    ids = sorted(player["id"] for players in joined for player in players)
+    assert ids == list(range(1, 91))
+
+    state = await workers[0].load("checkin")
+    assert state["max_players"] == 100
+    assert len(state["players"]) == 90
+
+@pytest.mark.asyncio
+async def test_concurrent_workers_have_one_winner(file_engine):
+    workers = [PostgresStore(GameRegistry(), file_engine) for _ in range(4)]
+    await workers[0].join(await workers[0].load_game("race"))
+    await workers[0].join(workers[0].registry.get("race"))
+
+    async def tap(worker):
+        game, player = await worker.find_player("race", random.choice([1, 2]))
+        return await worker.run(game, player)
+
+    outcomes = await asyncio.gather(*(tap(random.choice(workers)) for _ in range(TAPS)))
+    assert outcomes.count(WON) == 1
+    assert outcomes.count(MOVED) <= 2 * (WINNING_STEPS - 1)
+
+    state = await workers[0].load("race")
+    steps = {player["id"]: player["steps"] for player in state["players"]}
+    assert steps[state["winner"]] == WINNING_STEPS
+    assert min(steps.values()) < WINNING_STEPS
+
+@pytest.mark.asyncio
+@pytest.mark.skipif("ARSE_TEST_POSTGRES_URL" not in os.environ, reason="needs a PostgreSQL server")
+async def test_notify_updates_other_workers():
+    engine = create_async_engine(os.environ["ARSE_TEST_POSTGRES_URL"])
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    first = PostgresStore(GameRegistry(), engine)
+    second = PostgresStore(GameRegistry(), engine)
+    await first.start()
+    await second.start()
+    try:
+        game = await first.load_game("notify")
+        await first.reset(game)
+        cached = await second.load_game("notify")
+
+        player = await first.join(game)
+        await first.run(game, player)
+        for _ in range(50):
+            if cached.get_player(player["id"]) == {"id": player["id"], "steps": 1}:
+                break
+            await asyncio.sleep(0.05)
+        assert cached.get_player(player["id"]) == {"id": player["id"], "steps": 1}
+    finally:
+        await first.close()
+        await second.close()
+        await engine.dispose()
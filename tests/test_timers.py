@@ -0,0 +1,146 @@
+import asyncio
+import random
+
+import pytest
+
+import arse.game
+import arse.rules
+from arse.game import Game, GameRegistry, GAME_OVER
+from arse.store import MemoryStore, PostgresStore
+from arse.timers import SLOTS, TimerWheel
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+@pytest.fixture
+def wheel(clock, monkeypatch):
+    wheel = TimerWheel(tick=0.01, clock=clock)
+    monkeypatch.setattr(arse.game, "wheel", wheel)
+    return wheel
+
+@pytest.fixture
+def timed_rules(tmp_path, monkeypatch):
+    (tmp_path / "default.toml").write_text("time_limit = 60\n\n[actions.run]\nsteps = 1\n")
+    monkeypatch.setattr(arse.rules, "RULES_DIR", tmp_path)
+
+
+def test_timers_fire_in_order_and_never_early(wheel, clock):
+    rng = random.Random(7)
+    fired = []
+    # Spread over every level: ticks, seconds, hours and months
+    delays = [rng.choice((0.5, 30, 3600, 2_000_000)) * rng.random() for _ in range(5000)]
+    for delay in delays:
+        wheel.schedule(delay, lambda delay=delay: fired.append((delay, clock.now)))
+    assert len(wheel) == 5000
+
+    while len(wheel):
+        clock.now += rng.choice((0.004, 0.5, 40, 5000))
+        wheel.advance()
+    assert sorted(delay for delay, _ in fired) == sorted(delays)
+    assert all(now >= delay for delay, now in fired)
+
+def test_cancelled_timers_do_not_fire(wheel, clock):
+    fired = []
+    keep = wheel.schedule(1, fired.append, "keep")
+    drop = wheel.schedule(1, fired.append, "drop")
+    assert drop.cancel()
+    assert not drop.cancel()
+    assert len(wheel) == 1
+
+    clock.now = 0.99
+    assert wheel.advance() == 0
+    clock.now = 1.0
+    assert wheel.advance() == 1
+    assert fired == ["keep"]
+    assert not keep.pending and not keep.cancel()
+
+def test_callbacks_can_reschedule(wheel, clock):
+    fired = []
+
+    def repeat(count):
+        fired.append(clock.now)
+        if count:
+            wheel.schedule(0, repeat, count - 1)
+
+    wheel.schedule(0, repeat, 2)
+    for _ in range(3):
+        clock.now += 0.01
+        wheel.advance()
+    assert len(fired) == 3
+
+def test_idle_wheel_catches_up(wheel, clock):
+    clock.now = 10_000.0
+    fired = []
+    wheel.schedule(SLOTS * 0.01, fired.append, True)
+    clock.now += SLOTS * 0.01 - 0.01
+    wheel.advance()
+    assert fired == []
+    # Up to a tick late
+    clock.now += 0.02
+    wheel.advance()
+    assert fired == [True]
+
+@pytest.mark.asyncio
+async def test_driver_task_fires_timers():
+    wheel = TimerWheel(tick=0.001)
+    wheel.start()
+    done = asyncio.Event()
+
+    async def finish():
+        done.set()
+
+    wheel.schedule(0.01, finish)
+    await asyncio.wait_for(done.wait(), 1)
+    await wheel.close()
+    assert wheel.fired == 1
+
+@pytest.mark.asyncio
+async def test_round_ends_when_time_runs_out(timed_rules, wheel, clock):
+    store = MemoryStore(GameRegistry())
+    game = await store.load_game("timed")
+    player = await store.join(game)
+    clock.now = 59.0
+    wheel.advance()
+    assert not game.game_over
+
+    clock.now = 60.0
+    wheel.advance()
+    assert game.game_over and game.winner is None
+    assert await store.run(game, player) == GAME_OVER
+
+    game.reset()
+    await store.join(game)
+    assert len(wheel) == 1
+
+def test_ending_the_game_cancels_its_timers(timed_rules, wheel):
+    game = Game("timed")
+    game.start_clock(game.time_up)
+    game.after("respawn", 5, lambda: None)
+    assert len(wheel) == 2
+    player = game.add_player()
+    player["steps"] = 2
+    game.rules = arse.rules.Rules(arse.rules.DEFAULT_RULES)
+    game.run(player)
+    assert game.winner == player["id"]
+    assert len(wheel) == 0
+
+@pytest.mark.asyncio
+async def test_shared_round_ends_once(timed_rules, wheel, clock):
+    store = PostgresStore(GameRegistry())
+    game = await store.load_game("timed-shared")
+    await store.join(game)
+    clock.now = 60.0
+    wheel.advance()
+    await asyncio.gather(*wheel._running)
+    assert game.game_over and game.winner is None
+    assert (await store.load("timed-shared"))["game_over"]